@@ -0,0 +1,314 @@
+# 导入必要的模块
+import io  # 用于在内存中编码单帧
+import os  # 用于处理文件扩展名
+import struct  # 用于按文件格式规范打包整数
+import zlib  # 用于计算PNG数据块的CRC
+import numpy as np  # 用于把BGRX帧转换为ffmpeg需要的RGB数组
+from frame_convert import frame_to_image  # BGRX帧 → Pillow图像
+from gif_writer import DISPOSAL_NONE, GifWriter  # 增量GIF写入器及其处置方法：不处置
+
+'''
+可插拔的输出格式（后端）。
+
+StreamingEncoder 的写入线程按顺序把帧交给后端，后端逐帧写入文件，内存中不保留历史帧。
+每个后端提供：
+  - 类属性：name / extension / file_filter（文件对话框的过滤器）；
+    paletted：是否需要量化为调色板图像（只有GIF需要）；
+    offsets：是否接受只包含变化区域的子图（带偏移量），offset_align：偏移量需要对齐的像素数；
+    duration_step / min_duration：帧时长（毫秒）的取整步长和最小值；
+  - encode(arr, **options)：在量化线程中把（裁剪后的）BGRX帧编码为后端需要的形式，可以并行执行；
+    只有 paletted 为 False 的后端提供 encode，paletted 的后端由流水线量化后直接交给 append；
+  - 构造函数 (path, size, first, **options)：打开文件，first 为第一帧编码后的结果；
+  - append(frame, duration, offset)：按顺序追加一帧；close()：写完文件；
+    tell()（可选）：返回已写入的字节数，目标文件大小模式需要（见 supports_target_size）。
+
+APNG 和 WebP 与 GifWriter 的做法相同：容器（文件头、帧控制块）自己写，
+每帧的像素数据交给 Pillow 编码（PNG的 IDAT、WebP的 VP8/VP8L），然后重新包装成动画帧，
+因此每追加一帧就能立即写入磁盘；MP4 通过 imageio 的 ffmpeg 插件以固定帧率写入，
+帧时长通过重复帧来体现。
+'''
+
+
+class GifBackend:
+    """
+    GIF输出：量化后的调色板图像交给 GifWriter，变化区域以带偏移量的子图写入，
+    optimize 为 True（默认）时由 GifWriter 把与上一帧合成结果相同的像素替换为透明色。
+    """
+    name = 'gif'
+    extension = '.gif'
+    file_filter = 'GIF文件 (*.gif)'
+    paletted = True
+    offsets = True
+    offset_align = 1
+    # GIF的时长单位是10毫秒，多数浏览器会把短于20毫秒的延迟当作100毫秒播放
+    duration_step = 10
+    min_duration = 20
+
+    def __init__(self, path, size, first, optimize=True, **options):
+        # 第一帧的调色板作为全局颜色表（共享调色板模式下所有帧都不再写局部颜色表）
+        self.fp = open(path, 'wb')
+        self.writer = GifWriter(self.fp, size, palette=first.getpalette(), optimize=optimize)
+
+    def append(self, frame, duration, offset):
+        '''函数功能:追加一帧调色板图像'''
+        self.writer.append(frame, duration, offset, DISPOSAL_NONE)
+
+    def tell(self):
+        '''函数功能:返回已写入文件的字节数'''
+        return self.fp.tell()
+
+    def close(self):
+        '''函数功能:写入结束符并关闭文件'''
+        try:
+            self.writer.close()
+        finally:
+            self.fp.close()
+
+
+def _png_chunk(kind, data):
+    '''函数功能:打包一个PNG数据块(长度 + 类型 + 数据 + CRC)'''
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+class ApngBackend:
+    """
+    APNG输出：全彩无损，支持带偏移量的子图。
+
+    每帧由 Pillow 编码为一张独立的PNG，取出其中的 IDAT 数据：第一帧原样作为 IDAT，
+    之后的帧加上序号改写为 fdAT。动画控制块 acTL 中的总帧数在 close 时回填。
+    """
+    name = 'apng'
+    extension = '.png'
+    file_filter = 'APNG文件 (*.png *.apng)'
+    paletted = False
+    offsets = True
+    offset_align = 1
+    duration_step = 1
+    min_duration = 20
+
+    def __init__(self, path, size, first, loop=0, **options):
+        width, height = size
+        self.fp = open(path, 'wb')
+        # 已写入的帧数和下一个 fcTL/fdAT 序号
+        self.frame_count = 0
+        self.sequence = 0
+        # PNG签名和文件头（8位RGB）
+        self.fp.write(b'\x89PNG\r\n\x1a\n')
+        self.fp.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        # 动画控制块，总帧数先写0，close 时回填
+        self.actl_position = self.fp.tell()
+        self.loop = loop
+        self.fp.write(_png_chunk(b'acTL', struct.pack('>II', 0, loop)))
+
+    @staticmethod
+    def encode(arr, compress_level=6, **options):
+        '''函数功能:把BGRX帧编码为PNG,返回((宽, 高), 压缩后的图像数据)'''
+        image = frame_to_image(arr)
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG', compress_level=compress_level)
+        data = buffer.getvalue()
+        # 依次取出所有 IDAT 数据块的内容
+        parts, position = [], 8
+        while position < len(data):
+            length, kind = struct.unpack('>I4s', data[position:position + 8])
+            if kind == b'IDAT':
+                parts.append(data[position + 8:position + 8 + length])
+            position += 12 + length
+        return image.size, b''.join(parts)
+
+    def append(self, frame, duration, offset):
+        '''函数功能:追加一帧(帧控制块 + 图像数据)'''
+        (width, height), data = frame
+        # 时长超过 65535 毫秒时改用1/100秒为单位
+        numerator, denominator = (duration, 1000) if duration <= 0xffff else (min(0xffff, duration // 10), 100)
+        # 帧控制块：不处置、直接覆盖（帧不透明）
+        self.fp.write(_png_chunk(b'fcTL', struct.pack('>IIIIIHHBB', self.sequence, width, height, offset[0],
+                                                       offset[1], numerator, denominator, 0, 0)))
+        self.sequence += 1
+        if self.frame_count == 0:
+            # 第一帧的数据作为默认图像
+            self.fp.write(_png_chunk(b'IDAT', data))
+        else:
+            self.fp.write(_png_chunk(b'fdAT', struct.pack('>I', self.sequence) + data))
+            self.sequence += 1
+        self.frame_count += 1
+
+    def tell(self):
+        '''函数功能:返回已写入文件的字节数'''
+        return self.fp.tell()
+
+    def close(self):
+        '''函数功能:写入结束块,回填总帧数并关闭文件'''
+        try:
+            self.fp.write(_png_chunk(b'IEND', b''))
+            self.fp.seek(self.actl_position)
+            self.fp.write(_png_chunk(b'acTL', struct.pack('>II', self.frame_count, self.loop)))
+        finally:
+            self.fp.close()
+
+
+def _riff_chunk(kind, data):
+    '''函数功能:打包一个RIFF数据块(类型 + 长度 + 数据,奇数长度补一个0字节)'''
+    return kind + struct.pack('<I', len(data)) + data + b'\x00' * (len(data) & 1)
+
+
+def _uint24(value):
+    '''函数功能:按小端打包24位无符号整数'''
+    return struct.pack('<I', value)[:3]
+
+
+class WebPBackend:
+    """
+    动画WebP输出：每帧由 Pillow 编码为一张独立的WebP，取出其中的 VP8/VP8L 数据块，
+    包装为带偏移量和时长的 ANMF 帧。WebP要求帧偏移量为偶数，所以 offset_align 为2。
+    RIFF 总长度和画布信息在 close 时回填。
+    """
+    name = 'webp'
+    extension = '.webp'
+    file_filter = 'WebP文件 (*.webp)'
+    paletted = False
+    offsets = True
+    offset_align = 2
+    duration_step = 1
+    min_duration = 20
+
+    def __init__(self, path, size, first, loop=0, **options):
+        width, height = size
+        self.fp = open(path, 'wb')
+        # RIFF文件头，总长度在 close 时回填
+        self.fp.write(b'RIFF\x00\x00\x00\x00WEBP')
+        # 扩展格式头：动画标志和画布尺寸
+        self.fp.write(_riff_chunk(b'VP8X', b'\x02\x00\x00\x00' + _uint24(width - 1) + _uint24(height - 1)))
+        # 动画参数：背景色（白色不透明）和循环次数（0为无限循环）
+        self.fp.write(_riff_chunk(b'ANIM', b'\xff\xff\xff\xff' + struct.pack('<H', loop)))
+
+    @staticmethod
+    def encode(arr, quality=80, lossless=False, method=0, **options):
+        '''函数功能:把BGRX帧编码为WebP,返回((宽, 高), 图像数据块)'''
+        image = frame_to_image(arr)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=quality, lossless=lossless, method=method)
+        data = buffer.getvalue()
+        # 取出 ALPH / VP8 / VP8L 数据块（含块头和填充字节）
+        parts, position = [], 12
+        while position < len(data):
+            kind = data[position:position + 4]
+            length = struct.unpack('<I', data[position + 4:position + 8])[0]
+            end = position + 8 + length + (length & 1)
+            if kind in (b'ALPH', b'VP8 ', b'VP8L'):
+                parts.append(data[position:end])
+            position = end
+        return image.size, b''.join(parts)
+
+    def append(self, frame, duration, offset):
+        '''函数功能:追加一帧ANMF动画帧'''
+        (width, height), data = frame
+        header = (_uint24(offset[0] // 2) + _uint24(offset[1] // 2) + _uint24(width - 1) + _uint24(height - 1)
+                  + _uint24(min(duration, 0xffffff)))
+        # 标志字节：不混合（帧不透明，直接覆盖），不处置
+        self.fp.write(_riff_chunk(b'ANMF', header + b'\x02' + data))
+
+    def tell(self):
+        '''函数功能:返回已写入文件的字节数'''
+        return self.fp.tell()
+
+    def close(self):
+        '''函数功能:回填RIFF总长度并关闭文件'''
+        try:
+            size = self.fp.tell()
+            self.fp.seek(4)
+            self.fp.write(struct.pack('<I', size - 8))
+        finally:
+            self.fp.close()
+
+
+class Mp4Backend:
+    """
+    MP4（H.264）输出：通过 imageio 的 ffmpeg 插件以固定帧率 fps 写入完整帧。
+    MP4 不支持逐帧时长，所以按时长重复帧（取整误差带到下一帧）；重复的帧在 H.264 中几乎不占空间。
+    yuv420p 要求宽高为偶数，奇数时复制最后一行/列补齐。
+    """
+    name = 'mp4'
+    extension = '.mp4'
+    file_filter = 'MP4视频 (*.mp4)'
+    paletted = False
+    offsets = False
+    offset_align = 1
+    duration_step = 1
+    min_duration = 1
+
+    def __init__(self, path, size, first, fps=30, quality=7, **options):
+        # 输出帧率和每帧的毫秒数
+        self.fps = fps
+        self.frame_ms = 1000.0 / fps
+        # 帧数换算的累积误差（毫秒）
+        self.carry = 0.0
+        # 输出的帧数
+        self.frame_count = 0
+        # imageio 导入较慢，只在输出MP4时才导入
+        import imageio  # 用于通过ffmpeg插件写入MP4
+        # 尺寸已经补齐为偶数，不需要 imageio 再缩放
+        self.writer = imageio.get_writer(path, format='FFMPEG', mode='I', fps=fps, codec='libx264',
+                                         quality=quality, pixelformat='yuv420p', macro_block_size=1,
+                                         ffmpeg_log_level='error')
+
+    @staticmethod
+    def encode(arr, **options):
+        '''函数功能:把BGRX帧转换为宽高为偶数的连续RGB数组(一次复制完成通道交换和去掉行跨度)'''
+        height, width = arr.shape[:2]
+        out = np.empty((height + height % 2, width + width % 2, 3), np.uint8)
+        out[:height, :width] = arr[..., 2::-1]
+        if height % 2:
+            out[height] = out[height - 1]
+        if width % 2:
+            out[:, width] = out[:, width - 1]
+        return out
+
+    def append(self, frame, duration, offset):
+        '''函数功能:按时长把一帧重复写入若干次'''
+        exact = duration / self.frame_ms + self.carry
+        # 第一帧至少写一次，保证视频不为空
+        repeat = max(int(round(exact)), 1 if self.frame_count == 0 else 0)
+        self.carry = exact - repeat
+        for _ in range(repeat):
+            self.writer.append_data(frame)
+        self.frame_count += repeat
+
+    def close(self):
+        '''函数功能:结束ffmpeg进程并关闭文件'''
+        self.writer.close()
+
+
+# 所有输出后端，键为格式名
+BACKENDS = {backend.name: backend for backend in (GifBackend, Mp4Backend, WebPBackend, ApngBackend)}
+# 扩展名 → 格式名（.apng 也按 APNG 写入）
+_EXTENSIONS = {'.gif': 'gif', '.mp4': 'mp4', '.webp': 'webp', '.png': 'apng', '.apng': 'apng'}
+
+
+def backend_for_path(path, default=GifBackend):
+    '''函数功能:按文件扩展名选择输出后端,无法识别时返回default'''
+    name = _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    return BACKENDS[name] if name else default
+
+
+def backend_for_filter(file_filter, default=GifBackend):
+    '''函数功能:按文件对话框中选择的过滤器返回输出后端'''
+    for backend in BACKENDS.values():
+        if backend.file_filter == file_filter:
+            return backend
+    return default
+
+
+def supports_target_size(backend):
+    '''函数功能:返回输出格式是否支持目标文件大小模式(后端能报告已写入的字节数)'''
+    return hasattr(backend, 'tell')
+
+
+def backend_options(backend, frame_rate, speed_multiplier):
+    """
+    返回后端的默认参数：MP4 的输出帧率取录制帧率乘以播放速度倍数（限制在1~60之间），
+    这样每个录制帧在播放时大约对应一个视频帧；其他格式不需要额外参数。
+    """
+    if backend is Mp4Backend:
+        return {'fps': min(60, max(1, round(frame_rate * speed_multiplier)))}
+    return {}
@@ -0,0 +1,378 @@
+# 导入必要的模块
+import argparse  # 用于解析命令行参数
+import io  # 用于在内存中测量GIF写入（不受磁盘速度影响）
+import json  # 用于输出结果和读写基准数据
+import os  # 用于获取临时目录和文件大小
+import platform  # 用于记录运行环境
+import resource  # 用于读取进程的峰值内存（RSS）
+import sys  # 用于设置退出码
+import tempfile  # 用于端到端测试的临时目录
+import time  # 用于计时
+import numpy as np  # 用于生成合成帧序列
+import PIL  # 用于记录Pillow版本
+from PyQt5 import QtCore, QtGui  # 用于把合成帧包装为与截图相同格式的QImage
+from frame_convert import qimage_to_frame  # 帧转换
+from frame_diff import FrameDiffer  # 相邻帧差异检测
+from frame_scale import FrameScaler  # 截图后缩小
+from dither import DEFAULT_MATRIX_SIZE, DITHER_FLOYD_STEINBERG, DITHER_ORDERED  # 抖动方式
+from gif_writer import DISPOSAL_NONE, GifWriter  # 增量GIF写入器
+from palette import (MAX_FRAME_COLORS, PALETTE_ADAPTIVE, PALETTE_GLOBAL, PALETTE_SCENE, PaletteMapper,
+                     build_palette, sample_frames)  # 调色板
+from pipeline import StreamingEncoder, quantize_frame  # 编码流水线
+
+'''
+可重复的性能基准测试。
+
+在没有显示器的 Linux 机器上生成几种合成帧序列（静止画面、滚动文字、全屏噪声、小范围光标移动），
+在多种分辨率下分别计时流水线的各个阶段：
+  - convert：QImage → NumPy 帧数组（qimage_to_frame，零拷贝）；
+    convert_copy：原来的转换方式（转换为 RGBA8888 再用 np.array 复制，忽略行跨度），作为对照；
+  - diff：相邻帧差异检测（FrameDiffer）；
+  - scale_half / scale_fit：缩小到一半（NumPy 区域平均）和缩小到75%（Pillow BOX 重采样）；
+  - quantize：每帧自适应调色板量化；quantize_lut：共享调色板查表量化；
+    quantize_ordered：有序抖动后查表量化；quantize_fs：Pillow 误差扩散抖动量化（自适应调色板）；
+  - gif_write：GIF序列化（GifWriter，写入内存，帧间透明优化）；gif_write_plain：同上但不做透明优化；
+    pillow_save：同样的量化帧交给 Pillow 的 save(save_all=True, optimize=True)，作为对照；
+  - end_to_end：完整的 StreamingEncoder 流水线（写入临时文件）。
+另外在奇数宽度的 1921x1080 帧上比较两种转换方式每帧复制的字节数和耗时（frame_convert），
+同时验证零拷贝转换按行跨度读取。
+结果（吞吐量、峰值内存、输出大小）以JSON输出，并可与保存的基准数据比较，
+吞吐量下降、输出变大或内存增长超过容差时标记为退化并以退出码1结束。
+
+用法：
+    python benchmark.py                              # 运行并输出JSON
+    python benchmark.py --save-baseline base.json    # 保存为基准数据
+    python benchmark.py --baseline base.json         # 与基准数据比较
+'''
+
+# 合成序列的种类
+SEQUENCES = ('static', 'scroll', 'noise', 'cursor')
+# 默认测试的分辨率 (宽, 高)
+DEFAULT_SIZES = ((640, 480), (1280, 720), (1920, 1080))
+# 吞吐量低于基准的 (1 - 容差) 倍、峰值内存高于基准的 (1 + 容差) 倍时视为退化
+DEFAULT_TOLERANCE = 0.2
+# 输出文件大小的容差（合成序列是确定的，输出大小应当稳定）
+SIZE_TOLERANCE = 0.05
+
+
+def _desktop(width, height, rng):
+    '''函数功能:生成一张类似桌面/窗口界面的BGRX背景(渐变+若干纯色块)'''
+    frame = np.empty((height, width, 4), np.uint8)
+    # 水平和垂直方向的平滑渐变
+    frame[..., 0] = np.linspace(60, 200, width, dtype=np.uint8)[None, :]
+    frame[..., 1] = np.linspace(80, 160, height, dtype=np.uint8)[:, None]
+    frame[..., 2] = 120
+    frame[..., 3] = 255
+    # 若干纯色矩形（窗口、按钮）
+    for _ in range(12):
+        x, y = rng.integers(0, width - 8), rng.integers(0, height - 8)
+        w, h = rng.integers(8, max(9, width // 3)), rng.integers(8, max(9, height // 3))
+        frame[y:y + h, x:x + w, :3] = rng.integers(0, 256, 3, dtype=np.uint8)
+    return frame
+
+
+def _text_page(width, height, rng):
+    '''函数功能:生成白底、由深色小矩形"字形"组成多行文字的BGRX页面'''
+    page = np.full((height, width, 4), 255, np.uint8)
+    # 每行高16像素,字形 6x10,字距8像素,随机留出空格
+    for top in range(4, height - 12, 16):
+        glyphs = rng.random(width // 8) < 0.8
+        for column in np.flatnonzero(glyphs):
+            x = column * 8 + 1
+            page[top:top + 10, x:x + 6, :3] = rng.integers(0, 80)
+    return page
+
+
+def make_sequence(kind, width, height, count, seed=0):
+    """
+    生成 count 帧 kind 类型的合成序列，返回 Format_RGB32 的 QImage 列表（与屏幕截图格式相同）。
+    相同的参数和 seed 总是生成相同的帧。
+    """
+    rng = np.random.default_rng(seed)
+    if kind == 'static':
+        # 静止画面：每帧完全相同
+        base = _desktop(width, height, rng)
+        arrays = [base] * count
+    elif kind == 'scroll':
+        # 滚动文字：在一张更高的页面上每帧向下滚动4像素
+        page = _text_page(width, height + count * 4, rng)
+        arrays = [page[i * 4:i * 4 + height] for i in range(count)]
+    elif kind == 'noise':
+        # 全屏噪声：每帧的每个像素都不同（最坏情况）
+        arrays = [rng.integers(0, 256, (height, width, 4), dtype=np.uint8) for _ in range(count)]
+    elif kind == 'cursor':
+        # 光标移动：静止背景上一个16x16的"光标"沿对角线移动
+        base = _desktop(width, height, rng)
+        arrays = []
+        for i in range(count):
+            frame = base.copy()
+            x, y = (i * 7) % (width - 16), (i * 5) % (height - 16)
+            frame[y:y + 16, x:x + 16, :3] = 0
+            frame[y + 2:y + 14, x + 2:x + 8, :3] = 255
+            arrays.append(frame)
+    else:
+        raise ValueError(f'未知的序列类型：{kind}')
+    images = []
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        # copy() 让 QImage 拥有自己的缓冲区，与截图得到的 QImage 一样
+        images.append(QtGui.QImage(arr.data, width, height, width * 4, QtGui.QImage.Format_RGB32).copy())
+    return images
+
+
+def _copying_qimage_to_array(image):
+    '''函数功能:原来的转换方式(仅作对照):Qt格式转换和np.array各完整复制一次,且忽略行跨度'''
+    image = image.convertToFormat(QtGui.QImage.Format_RGBA8888)
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    return np.array(ptr).reshape(image.height(), image.width(), 4), image.sizeInBytes()
+
+
+def compare_conversions(width=1921, height=1080, repeat=5):
+    """
+    比较原来的转换方式与零拷贝转换每帧复制的字节数和耗时。
+    宽度默认取奇数，stride_correct 同时验证零拷贝转换的像素与源数据一致。
+    """
+    # 构造一帧与屏幕截图格式相同的测试图像
+    source = np.random.default_rng(0).integers(0, 255, (height, width, 4), dtype=np.uint8)
+    image = QtGui.QImage(source.data, width, height, width * 4, QtGui.QImage.Format_ARGB32).copy()
+
+    # 原来的方式：Qt格式转换一次 + np.array 复制一次
+    start = time.perf_counter()
+    for _ in range(repeat):
+        arr, converted_bytes = _copying_qimage_to_array(image)
+    copy_seconds = (time.perf_counter() - start) / repeat
+
+    # 零拷贝方式：只包装缓冲区；与 QImage 共享内存时复制字节数为0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        frame = qimage_to_frame(image)
+    zero_copy_seconds = (time.perf_counter() - start) / repeat
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    shared = np.shares_memory(frame, np.frombuffer(ptr, np.uint8))
+
+    # 行尾有填充的图像：零拷贝转换跳过填充字节，像素与源数据一致
+    padded = np.zeros((height, width * 4 + 12), np.uint8)
+    padded[:, :width * 4] = source.reshape(height, -1)
+    padded_image = QtGui.QImage(padded.data, width, height, width * 4 + 12, QtGui.QImage.Format_ARGB32)
+
+    return {
+        'size': [width, height],
+        'copy_bytes_copied': converted_bytes + arr.nbytes,
+        'copy_ms': round(copy_seconds * 1000, 3),
+        'zero_copy_bytes_copied': 0 if shared else frame.nbytes,
+        'zero_copy_ms': round(zero_copy_seconds * 1000, 3),
+        'stride_correct': bool(np.array_equal(qimage_to_frame(padded_image), source)),
+    }
+
+
+def _stage(seconds, frames, pixels):
+    '''函数功能:把一个阶段的总耗时换算为吞吐量统计'''
+    return {
+        'seconds': round(seconds, 6),
+        'fps': round(frames / seconds, 2) if seconds > 0 else None,
+        'mpix_per_s': round(pixels / seconds / 1e6, 2) if seconds > 0 else None,
+    }
+
+
+def _peak_rss_mb():
+    '''函数功能:返回本进程(及已结束的子进程)的峰值内存(MB)'''
+    # Linux 上 ru_maxrss 的单位是KB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(peak, children) / 1024, 1)
+
+
+def run_case(kind, width, height, count, palette_mode=PALETTE_ADAPTIVE, processes=0):
+    """
+    对一个合成序列分别计时各个阶段，返回该用例的结果字典。
+    """
+    images = make_sequence(kind, width, height, count)
+    pixels = width * height * count
+    stages = {}
+
+    # QImage → NumPy 帧数组
+    start = time.perf_counter()
+    frames = [qimage_to_frame(image) for image in images]
+    stages['convert'] = _stage(time.perf_counter() - start, count, pixels)
+    start = time.perf_counter()
+    for image in images:
+        _copying_qimage_to_array(image)
+    stages['convert_copy'] = _stage(time.perf_counter() - start, count, pixels)
+
+    # 相邻帧差异检测
+    differ = FrameDiffer()
+    start = time.perf_counter()
+    for frame in frames:
+        differ.diff(frame)
+    stages['diff'] = _stage(time.perf_counter() - start, count, pixels)
+
+    # 截图后缩小：整数倍走 NumPy 区域平均，其他比例走 Pillow
+    for stage, scale in (('scale_half', 0.5), ('scale_fit', 0.75)):
+        scaler = FrameScaler(scale)
+        start = time.perf_counter()
+        for frame in frames:
+            scaler(frame)
+        stages[stage] = _stage(time.perf_counter() - start, count, pixels)
+
+    # 每帧自适应调色板量化（整帧，不受差异检测影响）
+    start = time.perf_counter()
+    quantized = [quantize_frame(frame) for frame in frames]
+    stages['quantize'] = _stage(time.perf_counter() - start, count, pixels)
+
+    # 共享调色板查表量化（不含生成调色板和查找表的一次性开销）
+    mapper = PaletteMapper(build_palette(sample_frames(frames), MAX_FRAME_COLORS))
+    start = time.perf_counter()
+    for frame in frames:
+        mapper.quantize(frame)
+    stages['quantize_lut'] = _stage(time.perf_counter() - start, count, pixels)
+
+    # 两种抖动：有序抖动 + 查表，误差扩散 + 自适应调色板
+    for stage, dither, stage_mapper in (('quantize_ordered', DITHER_ORDERED, mapper),
+                                        ('quantize_fs', DITHER_FLOYD_STEINBERG, None)):
+        start = time.perf_counter()
+        for frame in frames:
+            quantize_frame(frame, stage_mapper, dither, DEFAULT_MATRIX_SIZE)
+        stages[stage] = _stage(time.perf_counter() - start, count, pixels)
+
+    # GIF序列化：把量化好的整帧写入内存，分别测量有无帧间透明优化
+    written_bytes = {}
+    for stage, optimize in (('gif_write', True), ('gif_write_plain', False)):
+        buffer = io.BytesIO()
+        start = time.perf_counter()
+        writer = GifWriter(buffer, (width, height), optimize=optimize)
+        for image in quantized:
+            writer.append(image, 100, (0, 0), DISPOSAL_NONE)
+        writer.close()
+        stages[stage] = _stage(time.perf_counter() - start, count, pixels)
+        written_bytes[stage] = buffer.tell()
+    # 对照：Pillow 一次性保存全部帧（需要所有帧都在内存中）
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    quantized[0].save(buffer, 'GIF', save_all=True, append_images=quantized[1:], duration=100, loop=0,
+                      disposal=DISPOSAL_NONE, optimize=True)
+    stages['pillow_save'] = _stage(time.perf_counter() - start, count, pixels)
+    written_bytes['pillow_save'] = buffer.tell()
+    del quantized, frames
+
+    # 端到端：与录制时相同的流水线，时间戳按10帧/秒
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        encoder = StreamingEncoder(directory=directory, palette_mode=palette_mode, processes=processes)
+        for i, image in enumerate(images):
+            encoder.submit(image, i * 0.1)
+        encoder.finish(count * 0.1)
+        stages['end_to_end'] = _stage(time.perf_counter() - start, count, pixels)
+        output_bytes = os.path.getsize(encoder.temp_path)
+        encoder.discard()
+
+    return {
+        'sequence': kind,
+        'size': [width, height],
+        'frames': count,
+        'stages': stages,
+        'gif_write_bytes': written_bytes['gif_write'],
+        'gif_write_plain_bytes': written_bytes['gif_write_plain'],
+        'pillow_save_bytes': written_bytes['pillow_save'],
+        'output_bytes': output_bytes,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def run_suite(sequences=SEQUENCES, sizes=DEFAULT_SIZES, count=30, palette_mode=PALETTE_ADAPTIVE, processes=0):
+    '''函数功能:运行全部用例,返回包含运行环境和各用例结果的字典'''
+    cases = {}
+    for width, height in sizes:
+        for kind in sequences:
+            cases[f'{kind}@{width}x{height}'] = run_case(kind, width, height, count, palette_mode, processes)
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pillow': PIL.__version__,
+            'qt': QtCore.QT_VERSION_STR,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'settings': {'frames': count, 'palette_mode': palette_mode, 'processes': processes},
+        'frame_convert': compare_conversions(),
+        'cases': cases,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def compare(result, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    与基准数据比较，返回退化说明的列表（为空表示没有退化）。
+    只比较两边都存在的用例：吞吐量下降超过 tolerance、输出文件大小增长超过 SIZE_TOLERANCE、
+    峰值内存增长超过 tolerance 时记为退化。
+    """
+    regressions = []
+    for name, case in result['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if base is None:
+            continue
+        # 各阶段吞吐量
+        for stage, stats in case['stages'].items():
+            base_fps = base['stages'].get(stage, {}).get('fps')
+            if base_fps and stats['fps'] is not None and stats['fps'] < base_fps * (1 - tolerance):
+                regressions.append(f'{name} {stage}: {stats["fps"]} fps < 基准 {base_fps} fps')
+        # 输出文件大小
+        if case['output_bytes'] > base['output_bytes'] * (1 + SIZE_TOLERANCE):
+            regressions.append(f'{name} 输出大小: {case["output_bytes"]} 字节 > 基准 {base["output_bytes"]} 字节')
+    # 峰值内存
+    base_rss = baseline.get('peak_rss_mb')
+    if base_rss and result['peak_rss_mb'] > base_rss * (1 + tolerance):
+        regressions.append(f'峰值内存: {result["peak_rss_mb"]} MB > 基准 {base_rss} MB')
+    return regressions
+
+
+def parse_size(text):
+    '''函数功能:把"宽x高"解析为(宽, 高)'''
+    try:
+        width, height = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'分辨率格式应为 宽x高：{text}')
+    if width < 32 or height < 32:
+        raise argparse.ArgumentTypeError(f'分辨率至少为 32x32：{text}')
+    return width, height
+
+
+def main(argv=None):
+    '''函数功能:命令行入口,输出JSON结果,有退化时返回1'''
+    parser = argparse.ArgumentParser(description='屏幕录制转GIF的性能基准测试')
+    parser.add_argument('--sequences', nargs='+', choices=SEQUENCES, default=list(SEQUENCES), help='合成序列的种类')
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=list(DEFAULT_SIZES),
+                        help='分辨率列表，如 640x480 1920x1080')
+    parser.add_argument('--frames', type=int, default=30, help='每个序列的帧数，默认30')
+    parser.add_argument('--palette', choices=[PALETTE_ADAPTIVE, PALETTE_GLOBAL, PALETTE_SCENE],
+                        default=PALETTE_ADAPTIVE, help='端到端测试使用的调色板模式')
+    parser.add_argument('--processes', type=int, default=0, help='端到端测试的量化进程数，默认0（线程）')
+    parser.add_argument('--out', help='把JSON结果写入文件（默认输出到标准输出）')
+    parser.add_argument('--baseline', help='与该基准数据文件比较，有退化时退出码为1')
+    parser.add_argument('--save-baseline', help='把本次结果保存为基准数据文件')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='吞吐量和内存的容差，默认0.2')
+    args = parser.parse_args(argv)
+
+    result = run_suite(args.sequences, args.sizes, args.frames, args.palette, args.processes)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            result['regressions'] = compare(result, json.load(f), args.tolerance)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    # 有退化时在标准错误中列出并返回1
+    for line in result.get('regressions', []):
+        print(f'退化：{line}', file=sys.stderr)
+    return 1 if result.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
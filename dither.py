@@ -0,0 +1,90 @@
+# 导入必要的模块
+import threading  # 用于保护平铺阈值表的缓存（多个量化线程同时使用）
+import numpy as np  # 用于生成 Bayer 矩阵和向量化的有序抖动
+
+'''
+量化前的抖动。
+
+Pillow 的 Floyd–Steinberg 误差扩散逐像素串行计算，大画面上很慢；误差沿扫描方向传播，
+画面中任何一处变化都会改变它之后的抖动图案，相邻帧之间出现"爬行"的噪点，
+既难看，又破坏了帧间透明优化和 LZW 能利用的重复。
+有序抖动（Bayer 矩阵）给每个像素加上一个只取决于它在画布中位置的偏移，
+整帧只需要几次 NumPy 广播运算：相同位置的相同像素总是得到相同的输出，时间上是稳定的。
+
+  - DITHER_NONE：不抖动，直接映射到最近色（默认，与原有行为相同）；
+  - DITHER_ORDERED：Bayer 有序抖动，矩阵边长为 2/4/8/16，越大渐变的层次越多；
+  - DITHER_FLOYD_STEINBERG：Pillow 的误差扩散，作为对照保留。
+偏移按画布坐标计算（子图传入自己在画布中的偏移），裁剪后的变化区域与整帧的抖动图案完全对齐。
+'''
+
+# 抖动方式
+DITHER_NONE = 'none'
+DITHER_ORDERED = 'ordered'
+DITHER_FLOYD_STEINBERG = 'floyd-steinberg'
+DITHER_MODES = (DITHER_NONE, DITHER_ORDERED, DITHER_FLOYD_STEINBERG)
+# 可选的 Bayer 矩阵边长和默认值
+MATRIX_SIZES = (2, 4, 8, 16)
+DEFAULT_MATRIX_SIZE = 4
+# 偏移的总幅度（0~255 的颜色值）：像素最多被推动半个幅度，大致是 256 色调色板中相邻颜色的间距
+DITHER_SPREAD = 32
+
+# 平铺阈值表的缓存，键为矩阵边长
+_tables = {}
+# 保护上面的缓存
+_tables_lock = threading.Lock()
+
+
+def bayer_matrix(size):
+    '''函数功能:返回size×size(size为2的幂)的Bayer矩阵,元素为0 ~ size²-1的阈值序号'''
+    if size < 1 or size & (size - 1):
+        raise ValueError(f'Bayer 矩阵的边长必须是2的幂：{size}')
+    matrix = np.zeros((1, 1), np.int32)
+    # 递归构造：M(2n) = [[4M, 4M+2], [4M+3, 4M+1]]
+    while matrix.shape[0] < size:
+        matrix = np.block([[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]])
+    return matrix
+
+
+def _tiled_tables(size, width):
+    """
+    返回至少覆盖 (2 × size) 行、(width + size) 列的平铺表 (下限, 上限, 偏移)，形状为 (行, 列, 4)。
+    每个位置的偏移 d 在 [-SPREAD/2, SPREAD/2) 之间；先把像素限制在 [下限, 上限] 内再加上 d，
+    结果不会越出 0~255，所以偏移可以按 uint8 的补码存储，用不溢出检查的加法完成。
+    表只有两个矩阵周期那么高（图案在垂直方向上重复），四个通道各存一份，让广播的内层循环保持连续。
+    """
+    with _tables_lock:
+        tables = _tables.get(size)
+        if tables is not None and tables[0].shape[1] >= width + size:
+            return tables
+        # 阈值序号换算为以0为中心的偏移
+        offsets = (bayer_matrix(size) * 2 + 1) * DITHER_SPREAD // (2 * size * size) - DITHER_SPREAD // 2
+        tiled = np.repeat(np.tile(offsets, (2, -(-(width + size) // size)))[..., None], 4, axis=2)
+        lower = np.maximum(-tiled, 0).astype(np.uint8)
+        upper = (255 - np.maximum(tiled, 0)).astype(np.uint8)
+        tables = _tables[size] = (lower, upper, tiled.astype(np.int8).view(np.uint8))
+        return tables
+
+
+def ordered_dither(arr, size=DEFAULT_MATRIX_SIZE, offset=(0, 0)):
+    """
+    对BGRX帧数组（可以是带行跨度的子图）做 Bayer 有序抖动，返回新的 (高, 宽, 4) 数组。
+    offset 为子图左上角在画布中的位置，使抖动图案与画布对齐。
+    """
+    height, width = arr.shape[:2]
+    lower, upper, delta = _tiled_tables(size, width)
+    # 从平铺表中取出与画布位置对齐的一个矩阵周期（size 行，视图，不复制）
+    y, x = offset[1] % size, offset[0] % size
+    region = (slice(y, y + size), slice(x, x + width))
+    lower, upper, delta = lower[region], upper[region], delta[region]
+    out = np.empty((height, width, 4), np.uint8)
+    # 行数按矩阵边长分成 (块数, size) 两个维度（只是视图），表在块这一维上广播：
+    # 两次比较完成限幅、一次加法加上偏移，就处理完整帧；不足一个周期的最后几行单独处理
+    main = height - height % size
+    parts = [(arr[:main].reshape(-1, size, width, 4), out[:main].reshape(-1, size, width, 4), size)] if main else []
+    if main < height:
+        parts.append((arr[main:], out[main:], height - main))
+    for source, target, rows in parts:
+        np.maximum(source, lower[:rows], out=target)
+        np.minimum(target, upper[:rows], out=target)
+        target += delta[:rows]
+    return out
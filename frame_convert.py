@@ -0,0 +1,82 @@
+# 导入必要的模块
+import sys  # 用于判断本机字节序
+import numpy as np  # 用于零拷贝地访问图像数据
+from PyQt5 import QtGui  # 用于读取QImage的原始缓冲区
+from PIL import Image  # 用于把帧交给Pillow做颜色量化
+
+'''
+帧转换层：QImage → NumPy 数组。
+
+原来的做法是 convertToFormat(Format_RGBA8888) → bits() → np.array(ptr) → reshape，
+每帧至少完整复制两次；而且当 bytesPerLine() != width*4（奇数宽度、HiDPI截图等行尾有填充时）
+reshape 会把填充字节当成像素，画面发生错位。
+
+这里直接用 np.frombuffer 包装 QImage 的缓冲区，按真实的行跨度（bytesPerLine）构造视图，不做任何复制。
+屏幕截图的原生格式 Format_RGB32 / ARGB32 在小端机器上的内存排列是 B,G,R,A，
+所以整个流水线统一使用这种 "BGRX" 排列的 (高, 宽, 4) uint8 视图：
+  - 比较两帧时可以把每个像素看作一个 uint32（frame_diff）；
+  - 交给 Pillow 时用 'BGRX' 原始解码器一次完成通道交换和去掉 alpha（frame_to_image），
+    这也是整条流水线中唯一一次必要的复制。
+'''
+
+# 小端机器上，这些格式的内存排列就是 B,G,R,A（或 B,G,R,X），可以零拷贝使用
+_NATIVE_BGRX_FORMATS = (
+    QtGui.QImage.Format_RGB32,
+    QtGui.QImage.Format_ARGB32,
+    QtGui.QImage.Format_ARGB32_Premultiplied,
+) if sys.byteorder == 'little' else ()
+
+
+class FrameArray(np.ndarray):
+    """
+    持有 QImage 引用的 ndarray 视图。
+    零拷贝视图直接指向 QImage 的缓冲区，必须保证 QImage 在数组使用期间不被释放；
+    对它的切片等派生视图会通过 base 链保持对本对象（进而对 QImage）的引用。
+    """
+    # 被包装的 QImage
+    qimage = None
+
+
+def qimage_to_frame(image):
+    """
+    把 QImage 转换为 (高, 宽, 4) 的 BGRX 排列 uint8 数组。
+
+    对于屏幕截图的原生格式，返回的是直接指向 QImage 缓冲区的只读视图（行跨度为 bytesPerLine），
+    不复制任何数据；其他格式先由 Qt 转换为 Format_RGB32（复制一次）。
+    """
+    # 空图像（例如在没有屏幕的平台上截图失败）没有可包装的缓冲区
+    if image.isNull():
+        raise ValueError('无法转换空图像（截图失败）')
+    if image.format() not in _NATIVE_BGRX_FORMATS:
+        # 非原生格式：转换为 RGB32；大端机器上再用 NumPy 调整为 B,G,R,X 的内存排列
+        image = image.convertToFormat(QtGui.QImage.Format_RGB32)
+        if sys.byteorder != 'little':
+            return np.ascontiguousarray(_wrap(image)[..., ::-1])
+    return _wrap(image)
+
+
+def _wrap(image):
+    '''函数功能:按真实行跨度把QImage的缓冲区包装为(高, 宽, 4)的只读数组视图(不复制)'''
+    width, height, stride = image.width(), image.height(), image.bytesPerLine()
+    # constBits 不会触发隐式共享的深拷贝
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    # 每行 stride 字节，只取前 width*4 字节作为像素，行尾填充字节被跳过
+    rows = np.frombuffer(ptr, np.uint8, count=height * stride).reshape(height, stride)
+    frame = rows[:, :width * 4].reshape(height, width, 4).view(FrameArray)
+    # 保持对 QImage 的引用，避免缓冲区被提前释放
+    frame.qimage = image
+    return frame
+
+
+def frame_to_image(frame):
+    """
+    把 BGRX 帧（可以是带行跨度的视图或裁剪后的子视图）转换为 Pillow 的 RGB 图像。
+    Pillow 的 'BGRX' 原始解码器在C层完成通道交换并丢弃 alpha，只复制一次。
+    """
+    height, width = frame.shape[:2]
+    row_stride = frame.strides[0]
+    # 构造一个从首个像素开始、覆盖到最后一行末尾的一维字节视图（不复制），供 frombuffer 按行跨度读取
+    length = row_stride * (height - 1) + width * 4
+    flat = np.lib.stride_tricks.as_strided(frame, shape=(length,), strides=(1,))
+    return Image.frombuffer('RGB', (width, height), flat, 'raw', 'BGRX', row_stride, 1)
@@ -0,0 +1,104 @@
+# 导入必要的模块
+import numpy as np  # 用于向量化比较相邻两帧
+
+'''
+相邻帧差异检测。
+
+屏幕录制的大部分时间画面是静止的，或者只有一小块区域在变化（光标、输入框等）。
+FrameDiffer 用 NumPy 一次性比较当前帧和上一帧的全部像素：
+  - 完全相同的帧直接丢弃，上一帧的显示时长自然延长到下一个不同帧的时间戳；
+  - 有变化的帧只保留变化像素的外接矩形，作为GIF中带偏移量的子图写入，
+    配合"不处置"(disposal=1)，未变化的部分继续显示上一帧的内容。
+'''
+
+
+class FrameDiffer:
+    """
+    逐帧比较并裁剪BGRX帧，同时统计被省去的帧数和像素数。
+    """
+
+    def __init__(self):
+        # 上一个保留帧的完整数组
+        self.previous = None
+        # 输入的总帧数
+        self.frames_total = 0
+        # 因与上一帧相同而合并掉的帧数
+        self.frames_merged = 0
+        # 输入的总像素数
+        self.pixels_total = 0
+        # 因未变化而省去编码的像素数
+        self.pixels_skipped = 0
+
+    def diff(self, arr):
+        """
+        与上一帧比较。
+        返回 None 表示与上一帧完全相同（应与上一帧合并）；
+        否则返回 (x, y, sub)，sub 为变化区域的子数组，(x, y) 为它在画布中的偏移。
+        """
+        height, width = arr.shape[:2]
+        # 更新统计
+        self.frames_total += 1
+        self.pixels_total += height * width
+
+        # 第一帧或尺寸变化时保留整帧
+        if self.previous is None or self.previous.shape != arr.shape:
+            self.previous = arr
+            return 0, 0, arr
+
+        # 把每个像素的4个字节看作一个32位整数，一次比较完一个像素
+        changed = _as_pixels(arr) != _as_pixels(self.previous)
+        # 找出包含变化像素的行
+        rows = np.flatnonzero(changed.any(axis=1))
+        if rows.size == 0:
+            # 与上一帧完全相同
+            self.frames_merged += 1
+            self.pixels_skipped += height * width
+            return None
+        # 找出包含变化像素的列
+        cols = np.flatnonzero(changed.any(axis=0))
+        # 变化区域的外接矩形
+        top, bottom = int(rows[0]), int(rows[-1]) + 1
+        left, right = int(cols[0]), int(cols[-1]) + 1
+        self.pixels_skipped += height * width - (bottom - top) * (right - left)
+        # 记住当前帧，供下一帧比较
+        self.previous = arr
+        return left, top, arr[top:bottom, left:right]
+
+
+class MotionDetector:
+    """
+    只看稀疏网格上的像素，快速判断画面相对上一次是否变化，供自适应帧率的录制线程决定截图频率。
+
+    每次比较间隔为 step 的网格（约 1/step² 的像素），并且每次换一个网格相位，
+    step² 次之后所有像素位置都被检查过，长时间存在的小变化（如光标闪烁）最终也能被发现。
+    这里只用于选择截图频率，帧本身仍完整交给 FrameDiffer 精确比较。
+    """
+
+    def __init__(self, step=4):
+        # 网格间隔（像素），不小于该尺寸的变化总能被发现
+        self.step = step
+        # 上一次检测的帧（零拷贝视图只是一个引用，不复制像素）
+        self.previous = None
+        # 当前网格相位，0 ~ step²-1
+        self.phase = 0
+
+    def changed(self, arr):
+        '''函数功能:返回当前帧在本次网格上是否与上一帧不同(第一帧或尺寸变化时为True)'''
+        previous, self.previous = self.previous, arr
+        if previous is None or previous.shape != arr.shape:
+            return True
+        step = self.step
+        # 本次网格的行、列起点
+        dy, dx = divmod(self.phase, step)
+        self.phase = (self.phase + 1) % (step * step)
+        return bool((_as_pixels(arr)[dy::step, dx::step] != _as_pixels(previous)[dy::step, dx::step]).any())
+
+
+def count_changed(arr, previous):
+    '''函数功能:返回两个尺寸相同的BGRX帧之间不同的像素数'''
+    return int(np.count_nonzero(_as_pixels(arr) != _as_pixels(previous)))
+
+
+def _as_pixels(arr):
+    '''函数功能:把(高, 宽, 4)的uint8数组视为(高, 宽)的uint32数组(按原有行跨度,不复制)'''
+    return arr.view(np.uint32)[..., 0]
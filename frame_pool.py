@@ -0,0 +1,108 @@
+# 导入必要的模块
+import sys  # 用于判断本机字节序
+import threading  # 用于在录制线程和编码线程之间同步空闲槽
+import numpy as np  # 用于预先分配帧缓冲区
+from PyQt5 import QtGui  # 用于把截图直接绘制进缓冲区
+from frame_convert import qimage_to_frame  # 零拷贝帧转换
+
+'''
+可复用的帧缓冲池。
+
+原来每截一帧，grabWindow 产生一个新的 QPixmap，toImage() 再分配一个同样大小的 QImage，
+大区域、高帧率录制时频繁分配和释放几十MB的内存块，内存占用出现尖峰，也会干扰截图的节奏。
+FramePool 在收到第一帧时按帧尺寸一次性分配固定数量的槽（(槽数, 高, 宽, 4) 的 BGRX 数组），
+录制线程用 QPainter 把截图直接复制进一个空闲槽（copy_pixmap），不再调用 toImage()；
+槽随帧在编码流水线中传递，用引用计数记录仍在使用它的阶段，全部用完后回到空闲列表。
+稳定录制时，除 grabWindow 本身返回的 QPixmap 外，每帧不再分配大块内存。
+'''
+
+# 默认槽数：足够填满流水线的输入队列和工作队列，都在使用时录制线程等待（与队列满时的背压相同）
+DEFAULT_POOL_SLOTS = 16
+
+
+class FramePool:
+    """
+    固定数量、可复用的帧缓冲槽。
+
+    acquire(shape) 取出一个空闲槽（都在使用时阻塞），返回槽号，引用计数为1；
+    frame(slot) 返回该槽的 (高, 宽, 4) 数组；retain / release 增减引用计数，减到0时槽回到空闲列表。
+    所有方法都可以在多个线程中同时调用。
+    """
+
+    def __init__(self, slots=DEFAULT_POOL_SLOTS):
+        # 槽数
+        self.slots = slots
+        # 所有槽的缓冲区，形状为 (槽数, 高, 宽, 4)，由第一帧的尺寸确定
+        self.buffers = None
+        # 每个槽的引用计数
+        self.refs = [0] * slots
+        # 空闲槽（后进先出：最近归还的槽最先复用，它的内存页还在缓存中）
+        self.free = list(range(slots))
+        # 分配缓冲区的次数（稳定录制时应为1）和因没有空闲槽而等待的次数
+        self.allocations = 0
+        self.waits = 0
+        # 保护上面的状态，并在归还槽时唤醒等待的录制线程
+        self.condition = threading.Condition()
+
+    def acquire(self, shape):
+        '''函数功能:取出一个空闲槽(没有时等待归还),返回槽号;第一次调用时按shape=(高, 宽, 4)分配缓冲区'''
+        with self.condition:
+            if self.buffers is None or self.buffers.shape[1:] != shape:
+                # 尺寸变化时只能在所有槽都空闲时重新分配
+                if len(self.free) != self.slots:
+                    raise ValueError('帧缓冲池中的帧尺寸必须相同')
+                self.buffers = np.empty((self.slots,) + tuple(shape), np.uint8)
+                self.allocations += 1
+            if not self.free:
+                self.waits += 1
+                self.condition.wait_for(lambda: self.free)
+            slot = self.free.pop()
+            self.refs[slot] = 1
+            return slot
+
+    def frame(self, slot):
+        '''函数功能:返回槽的帧数组(视图,不复制)'''
+        return self.buffers[slot]
+
+    def retain(self, slot):
+        '''函数功能:槽多了一个使用者,引用计数加1'''
+        with self.condition:
+            self.refs[slot] += 1
+
+    def release(self, slot):
+        '''函数功能:一个使用者用完了槽,引用计数减到0时归还到空闲列表'''
+        with self.condition:
+            self.refs[slot] -= 1
+            if self.refs[slot] == 0:
+                self.free.append(slot)
+                self.condition.notify()
+
+    def stats(self):
+        '''函数功能:返回槽数、分配次数和等待次数'''
+        with self.condition:
+            return {'slots': self.slots, 'allocations': self.allocations, 'waits': self.waits}
+
+
+def copy_pixmap(pixmap, frame):
+    """
+    把截图 QPixmap 复制进 (高, 宽, 4) 的 BGRX 帧数组（通常是帧缓冲池中的一个槽）。
+    在小端机器上用一个指向数组内存的 QImage 作为绘制目标，由 QPainter 直接写入，不产生中间的 QImage；
+    其他情况退回 toImage() 后再复制。
+    """
+    # 空截图（例如在没有屏幕的平台上）无法复制
+    if pixmap.isNull():
+        raise ValueError('无法转换空图像（截图失败）')
+    height, width = frame.shape[:2]
+    if sys.byteorder != 'little':
+        frame[...] = qimage_to_frame(pixmap.toImage())
+        return frame
+    # Format_RGB32 在小端机器上的内存排列就是 B,G,R,X，与帧数组相同；按数组的行跨度包装，不复制
+    target = QtGui.QImage(frame.ctypes.data, width, height, frame.strides[0], QtGui.QImage.Format_RGB32)
+    # HiDPI 截图的逻辑尺寸是像素尺寸除以 devicePixelRatio，目标设置相同的比例才会按像素一一复制
+    target.setDevicePixelRatio(pixmap.devicePixelRatio())
+    painter = QtGui.QPainter(target)
+    # 直接覆盖目标像素，不做 alpha 混合
+    painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+    painter.drawPixmap(0, 0, pixmap)
+    painter.end()
+    return frame
@@ -0,0 +1,84 @@
+# 导入必要的模块
+import numpy as np  # 用于整数倍缩小的向量化区域平均
+from PIL import Image  # 用于任意比例缩放
+
+'''
+截图后立即缩小帧。
+
+录制4K区域却只需要半尺寸的GIF时，后面每一个阶段（差异检测、帧存储、量化、写入）
+都在处理四倍的像素。FrameScaler 在截图之后、进入帧存储或编码流水线之前把帧缩小到输出尺寸：
+  - 缩小倍数为整数（2倍、3倍……）时用 NumPy 做区域平均（box filter）：
+    把 k×k 个间隔为 k 的切片累加到一个 uint16 数组中再除以 k²，结果与逐块求平均相同；
+  - 其他比例交给 Pillow 的 BOX 重采样（同样是按面积加权的平均）。
+输入输出都是 (高, 宽, 4) 的 BGRX 帧数组，四个通道独立计算，不需要转换颜色顺序。
+
+输出尺寸以选区的逻辑像素（屏幕坐标）为基准：HiDPI 屏幕上 grabWindow 返回的截图是
+逻辑尺寸的 devicePixelRatio 倍，缩放 100% 时会被缩小回逻辑尺寸（2倍屏幕上正好走整数倍的快速路径）。
+'''
+
+
+def box_downscale(arr, factor):
+    '''函数功能:把BGRX帧数组按整数倍factor做区域平均缩小(多余的右侧列和底部行被丢弃)'''
+    height, width = arr.shape[0] // factor, arr.shape[1] // factor
+    # k×k 个像素的和：k不超过16时 uint16 足够（256×255 + 舍入 < 65536）
+    acc = np.zeros((height, width, arr.shape[2]), np.uint16 if factor <= 16 else np.uint32)
+    for dy in range(factor):
+        for dx in range(factor):
+            # 每个切片取每个 k×k 块中同一位置的像素，按步长取视图，不复制
+            acc += arr[dy:height * factor:factor, dx:width * factor:factor]
+    # 四舍五入后求平均
+    acc += factor * factor // 2
+    acc //= factor * factor
+    return acc.astype(np.uint8)
+
+
+def resample_frame(arr, size):
+    '''函数功能:用Pillow的BOX重采样把BGRX帧数组缩放到size=(宽, 高)'''
+    height, width = arr.shape[:2]
+    row_stride = arr.strides[0]
+    # 与 frame_to_image 相同：构造覆盖所有行的一维字节视图，按原有行跨度读取，不复制
+    flat = np.lib.stride_tricks.as_strided(arr, shape=(row_stride * (height - 1) + width * 4,), strides=(1,))
+    # 解码为四通道图像（通道顺序不影响逐通道的重采样；RGBX 模式缩放时不做 alpha 预乘）
+    image = Image.frombytes('RGBX', (width, height), flat, 'raw', 'RGBX', row_stride, 1)
+    return np.asarray(image.resize(size, Image.Resampling.BOX))
+
+
+class FrameScaler:
+    """
+    按输出缩放比例（scale，相对于选区的逻辑尺寸）和最大边长（max_dimension，0表示不限制）
+    缩小截到的帧。device_pixel_ratio 为截图的 devicePixelRatio，由录制线程在第一帧时设置。
+    调用 scaler(arr) 返回缩小后的帧；输出尺寸与截图尺寸相同时直接返回原数组，不产生任何开销。
+    """
+
+    def __init__(self, scale=1.0, max_dimension=0, device_pixel_ratio=1.0):
+        # 输出尺寸相对于选区逻辑尺寸的比例
+        self.scale = scale
+        # 输出的最大边长（像素），0表示不限制
+        self.max_dimension = max_dimension
+        # 截图的设备像素比（HiDPI 屏幕上大于1）
+        self.device_pixel_ratio = device_pixel_ratio
+
+    def targetSize(self, width, height):
+        '''函数功能:返回截图尺寸为(width, height)时的输出尺寸(宽, 高)'''
+        # 先换算回逻辑像素再乘以缩放比例
+        factor = self.scale / (self.device_pixel_ratio or 1.0)
+        # 限制最大边长（保持宽高比）
+        if self.max_dimension and max(width, height) * factor > self.max_dimension:
+            factor = self.max_dimension / max(width, height)
+        # 只缩小不放大
+        if factor >= 1.0:
+            return width, height
+        return max(1, round(width * factor)), max(1, round(height * factor))
+
+    def __call__(self, arr):
+        '''函数功能:把BGRX帧数组缩小到输出尺寸,尺寸不变时返回原数组'''
+        height, width = arr.shape[:2]
+        size = self.targetSize(width, height)
+        if size == (width, height):
+            return arr
+        # 两个方向的缩小倍数是同一个整数时走 NumPy 的快速路径
+        factor = width // size[0]
+        if factor >= 2 and height // size[1] == factor and width // factor == size[0] \
+                and height // factor == size[1]:
+            return box_downscale(arr, factor)
+        return resample_frame(arr, size)
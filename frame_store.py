@@ -0,0 +1,171 @@
+# 导入必要的模块
+import os  # 用于调整和删除暂存文件
+import tempfile  # 用于在本地磁盘上创建暂存文件
+import threading  # 用于保护录制线程与读取方之间共享的状态
+import numpy as np  # 用于内存映射暂存文件
+from frame_convert import qimage_to_frame  # 零拷贝帧转换
+
+'''
+带内存上限的帧存储。
+
+录制结束后才编码时，原来所有帧都以全分辨率 QImage 保存在一个不断增长的列表里，
+全屏4K、50帧/秒的录制在15秒之内就会耗尽内存。FrameStore 代替这个列表：
+最近的帧仍以 QImage（或截图后缩小得到的帧数组）形式保存在内存中，总大小超过上限后，最旧的帧被转存到本地磁盘上
+一个固定步长的 np.memmap 暂存文件中（每帧占用 高×宽×4 字节的一格）。
+按帧序号随机访问仍然可用，编码器可以逐帧读取而不必把整个存储载入内存。
+'''
+
+# 默认内存上限：1GB
+DEFAULT_MEMORY_BUDGET = 1 << 30
+
+
+class FrameStore:
+    """
+    按帧序号访问的帧存储，用法与列表相同：append / len / store[i] / for frame in store。
+
+    append 接受 QImage 或 BGRX 帧数组。
+    store[i] 返回 (高, 宽, 4) 的 BGRX 帧数组：仍在内存中的帧为指向 QImage 的零拷贝视图（或原数组），
+    已转存的帧为暂存文件的内存映射视图。所有帧的尺寸必须相同（固定步长）。
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, directory=None):
+        # 内存中保存的帧的总字节数上限
+        self.memory_budget = memory_budget
+        # 暂存文件所在目录，None表示系统临时目录
+        self.directory = directory
+        # 仍在内存中的帧：帧序号 → QImage或帧数组（按插入顺序，即从旧到新）
+        self.ram = {}
+        # 内存中的帧占用的字节数
+        self.ram_bytes = 0
+        # 帧总数
+        self.count = 0
+        # 已转存到磁盘的帧数（总是最旧的 spooled 帧，序号为 0 ~ spooled-1）
+        self.spooled = 0
+        # 每帧的数组形状 (高, 宽, 4) 和字节数，由第一次转存的帧确定
+        self.frame_shape = None
+        self.frame_bytes = 0
+        # 暂存文件路径和内存映射（形状为 (容量, 高, 宽, 4)）
+        self.spool_path = None
+        self.spool = None
+        # 保护 ram 字典和统计量
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def __getitem__(self, index):
+        '''函数功能:按帧序号返回BGRX帧数组'''
+        # 支持负数序号
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('帧序号超出范围')
+        with self.lock:
+            image = self.ram.get(index)
+        # 仍在内存中的帧直接包装QImage，否则从暂存文件读取
+        if image is not None:
+            return _as_frame(image)
+        return self.spool[index]
+
+    @property
+    def spool_bytes(self):
+        '''函数功能:返回已转存到磁盘的帧数据字节数'''
+        return self.spooled * self.frame_bytes
+
+    def append(self, image):
+        '''函数功能:追加一帧QImage或BGRX帧数组,内存占用超过上限时把最旧的帧转存到磁盘'''
+        with self.lock:
+            self.ram[self.count] = image
+            self.ram_bytes += _size_in_bytes(image)
+            self.count += 1
+        # 超过内存上限时依次转存最旧的帧（至少保留最新的一帧在内存中）
+        while self.ram_bytes > self.memory_budget and len(self.ram) > 1:
+            self._spillOldest()
+
+    def _spillOldest(self):
+        '''函数功能:把内存中最旧的一帧复制到暂存文件中'''
+        index, image = next(iter(self.ram.items()))
+        frame = _as_frame(image)
+        # 第一次转存时确定每帧的形状
+        if self.frame_shape is None:
+            self.frame_shape = frame.shape
+            self.frame_bytes = int(np.prod(frame.shape))
+        elif frame.shape != self.frame_shape:
+            raise ValueError('帧存储中所有帧的尺寸必须相同')
+        # 确保暂存文件有足够的格子，然后写入（按行跨度读取，紧凑写入）
+        self._ensureCapacity(index + 1)
+        self.spool[index] = frame
+        # 写入完成后再从内存中移除，读取方总能拿到完整的帧
+        with self.lock:
+            del self.ram[index]
+            self.ram_bytes -= _size_in_bytes(image)
+            self.spooled = index + 1
+
+    def _ensureCapacity(self, frames):
+        '''函数功能:确保暂存文件至少能容纳frames帧,不够时容量翻倍并重新映射'''
+        capacity = len(self.spool) if self.spool is not None else 0
+        if frames <= capacity:
+            return
+        capacity = max(frames, capacity * 2, 16)
+        if self.spool_path is None:
+            # 在本地磁盘上创建暂存文件
+            fd, self.spool_path = tempfile.mkstemp(suffix='.spool', dir=self.directory)
+            os.close(fd)
+        else:
+            # 把已写入的数据刷到文件，再扩大文件
+            self.spool.flush()
+        os.truncate(self.spool_path, capacity * self.frame_bytes)
+        self.spool = np.memmap(self.spool_path, np.uint8, 'r+', shape=(capacity,) + self.frame_shape)
+
+    def close(self):
+        '''函数功能:释放内存中的帧并删除暂存文件'''
+        with self.lock:
+            self.ram.clear()
+            self.ram_bytes = 0
+        self.spool = None
+        if self.spool_path is not None and os.path.exists(self.spool_path):
+            os.remove(self.spool_path)
+        self.spool_path = None
+
+
+class FrameRange:
+    """
+    帧存储中一段连续帧（如剪辑时选中的起点到终点）的视图，用法与 FrameStore 相同：len / view[i] / 迭代。
+    view[i] 为底层存储的第 indices[i] 帧；不复制任何帧。
+    close 释放整个底层存储（剪辑后其余的帧不再需要）。
+    """
+
+    def __init__(self, frames, indices):
+        # 底层帧存储
+        self.frames = frames
+        # 选中的帧在底层存储中的序号（range）
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        for index in self.indices:
+            yield self.frames[index]
+
+    def __getitem__(self, index):
+        '''函数功能:返回视图中第index帧(底层存储的第indices[index]帧)'''
+        return self.frames[self.indices[index]]
+
+    def close(self):
+        '''函数功能:释放底层帧存储'''
+        self.frames.close()
+
+
+def _as_frame(image):
+    '''函数功能:把内存中保存的一帧(QImage或帧数组)转换为BGRX帧数组'''
+    return image if isinstance(image, np.ndarray) else qimage_to_frame(image)
+
+
+def _size_in_bytes(image):
+    '''函数功能:返回内存中保存的一帧(QImage或帧数组)占用的字节数'''
+    return image.nbytes if isinstance(image, np.ndarray) else image.sizeInBytes()
@@ -0,0 +1,252 @@
+# 导入必要的模块
+from collections import OrderedDict  # 用于按最近使用的顺序淘汰缩略图
+import numpy as np  # 用于隔行隔列取样缩小帧
+from PyQt5 import QtCore, QtGui, QtWidgets  # 用于时间线模型、对话框和缩略图
+from PyQt5.QtCore import Qt  # Qt 枚举
+
+'''
+录制结束后的剪辑时间线。
+
+录制结束后原来所有帧都直接进入保存对话框并全部编码，开头和结尾等待、切换窗口的几秒
+只能先编码进文件，再用别的工具删掉。TrimDialog 在保存之前显示录制的时间线：
+拖动滑块或点击缩略图预览任意一帧，选定起点和终点后只把这一段交给编码流水线。
+
+缩略图全部懒生成：
+  - 时间线是一个 QListView，模型只在视图请求某一行的图标（即该行滚动到可见区域）时才生成它，
+    打开几千帧的录制也只生成屏幕上看得到的几十张；
+  - 生成时先按整数步长隔行隔列取样（只读取用到的像素，对转存到磁盘的帧同样很快），再平滑缩放到目标尺寸；
+  - 时间线缩略图和大预览图各有一个有上限的 LRU 缓存（ThumbnailCache），
+    来回拖动时看过的帧直接命中，内存占用只取决于缓存容量，与录制长度无关。
+'''
+
+# 时间线缩略图的高度和最大宽度（像素）
+THUMBNAIL_HEIGHT = 54
+THUMBNAIL_MAX_WIDTH = 160
+# 预览图的最大尺寸 (宽, 高)
+PREVIEW_SIZE = (480, 300)
+# 两个缓存最多保存的图像数
+THUMBNAIL_CACHE_SIZE = 512
+PREVIEW_CACHE_SIZE = 64
+
+
+def frame_thumbnail(frame, size):
+    '''函数功能:把BGRX帧数组缩小为不超过size=(宽, 高)、保持宽高比的QImage(不放大)'''
+    height, width = frame.shape[:2]
+    scale = min(size[0] / width, size[1] / height, 1.0)
+    target = QtCore.QSize(max(1, round(width * scale)), max(1, round(height * scale)))
+    # 先隔行隔列取样到目标尺寸的两倍以内，平滑缩放只需处理很少的像素
+    step = max(1, min(width // (2 * target.width()), height // (2 * target.height())))
+    sample = np.ascontiguousarray(frame[::step, ::step])
+    image = QtGui.QImage(sample.data, sample.shape[1], sample.shape[0], sample.strides[0], QtGui.QImage.Format_RGB32)
+    # 复制或缩放得到的新图像不再引用 sample 的缓冲区
+    if image.size() == target:
+        return image.copy()
+    return image.scaled(target, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+
+class ThumbnailCache:
+    """
+    按帧序号懒生成缩略图的 LRU 缓存。
+    get(i) 命中时把该项移到最近使用的一端；未命中时从帧存储读取该帧，生成不超过 size=(宽, 高) 的 QPixmap，
+    超过 capacity 张时淘汰最久未使用的一张。hits / misses 统计命中和生成的次数。
+    QPixmap 只能在界面线程中使用，缓存也只在界面线程中访问。
+    """
+
+    def __init__(self, frames, size, capacity=THUMBNAIL_CACHE_SIZE):
+        # 帧存储（按帧序号访问）
+        self.frames = frames
+        # 缩略图的最大尺寸
+        self.size = size
+        # 最多保存的缩略图数
+        self.capacity = capacity
+        # 帧序号 → QPixmap，按最近使用的顺序排列（最旧的在前）
+        self.items = OrderedDict()
+        # 命中和生成的次数
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, index):
+        '''函数功能:返回第index帧的缩略图,不在缓存中时生成并放入缓存'''
+        pixmap = self.items.get(index)
+        if pixmap is not None:
+            self.items.move_to_end(index)
+            self.hits += 1
+            return pixmap
+        self.misses += 1
+        pixmap = self.items[index] = QtGui.QPixmap.fromImage(frame_thumbnail(self.frames[index], self.size))
+        # 超出容量时淘汰最久未使用的
+        if len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+        return pixmap
+
+
+class TimelineModel(QtCore.QAbstractListModel):
+    """
+    时间线的列表模型，每一行是一帧：图标为缩略图（从 ThumbnailCache 取得），文字为相对第一帧的时间。
+    视图只为可见的行请求数据，缩略图随滚动懒生成。起点到终点之外的帧以深色背景显示。
+    """
+
+    def __init__(self, thumbnails, timestamps, parent=None):
+        super().__init__(parent)
+        # 缩略图缓存
+        self.thumbnails = thumbnails
+        # 每帧的时间戳
+        self.timestamps = timestamps
+        # 保留的范围 [start, stop)
+        self.start = 0
+        self.stop = len(timestamps)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.timestamps)
+
+    def data(self, index, role=Qt.DisplayRole):
+        '''函数功能:返回某一帧的缩略图、时间文字、提示或背景色'''
+        row = index.row()
+        if role == Qt.DecorationRole:
+            return self.thumbnails.get(row)
+        if role == Qt.DisplayRole:
+            return f'{self.timestamps[row] - self.timestamps[0]:.2f}s'
+        if role == Qt.ToolTipRole:
+            return f'第 {row + 1} 帧，{self.timestamps[row] - self.timestamps[0]:.2f} 秒'
+        if role == Qt.BackgroundRole and not self.start <= row < self.stop:
+            return QtGui.QBrush(Qt.darkGray)
+        return None
+
+    def setRange(self, start, stop):
+        '''函数功能:设置保留的范围[start, stop),刷新各行的背景色'''
+        self.start, self.stop = start, stop
+        self.dataChanged.emit(self.index(0), self.index(len(self.timestamps) - 1), [Qt.BackgroundRole])
+
+
+class TrimDialog(QtWidgets.QDialog):
+    """
+    录制结束后的剪辑对话框。
+    拖动滑块、点击时间线上的缩略图或用方向键逐帧浏览，"设为起点"/"设为终点"选定要保留的一段；
+    确定后 selection() 返回选中帧的序号 range，endTime() 返回最后一帧的结束时间（用于计算它的显示时长）。
+    """
+
+    def __init__(self, frames, timestamps, end_time, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('剪辑录制')
+        # 帧存储、每帧的时间戳和录制结束时间
+        self.frames = frames
+        self.timestamps = timestamps
+        self.end_time = end_time
+        # 保留的范围 [start, stop)，默认全部保留
+        self.start = 0
+        self.stop = len(timestamps)
+        # 时间线缩略图按帧的宽高比确定宽度，预览图使用单独的缓存
+        height, width = frames[0].shape[:2]
+        thumbnail_width = min(THUMBNAIL_MAX_WIDTH, max(1, round(THUMBNAIL_HEIGHT * width / height)))
+        self.thumbnails = ThumbnailCache(frames, (thumbnail_width, THUMBNAIL_HEIGHT))
+        self.previews = ThumbnailCache(frames, PREVIEW_SIZE, PREVIEW_CACHE_SIZE)
+
+        # 创建垂直布局 -----------------------------
+        layout = QtWidgets.QVBoxLayout(self)
+
+        # 创建预览图标签 -----------------------------
+        self.previewLabel = QtWidgets.QLabel()
+        self.previewLabel.setAlignment(Qt.AlignCenter)
+        self.previewLabel.setMinimumSize(*PREVIEW_SIZE)
+        layout.addWidget(self.previewLabel)
+
+        # 创建当前帧位置标签 -----------------------------
+        self.positionLabel = QtWidgets.QLabel()
+        layout.addWidget(self.positionLabel)
+
+        # 创建逐帧浏览的滑块 -----------------------------
+        self.slider = QtWidgets.QSlider(Qt.Horizontal)
+        self.slider.setRange(0, len(timestamps) - 1)
+        # 连接滑块值变化事件到showFrame方法（拖动过程中实时预览）
+        self.slider.valueChanged.connect(self.showFrame)
+        layout.addWidget(self.slider)
+
+        # 创建缩略图时间线 -----------------------------
+        self.model = TimelineModel(self.thumbnails, timestamps, self)
+        self.timeline = QtWidgets.QListView()
+        # 横向单行排列，所有项大小相同（视图不必逐行询问尺寸，长录制也能立即布局）
+        self.timeline.setViewMode(QtWidgets.QListView.IconMode)
+        self.timeline.setFlow(QtWidgets.QListView.LeftToRight)
+        self.timeline.setWrapping(False)
+        self.timeline.setMovement(QtWidgets.QListView.Static)
+        self.timeline.setUniformItemSizes(True)
+        self.timeline.setIconSize(QtCore.QSize(thumbnail_width, THUMBNAIL_HEIGHT))
+        self.timeline.setFixedHeight(THUMBNAIL_HEIGHT + 60)
+        self.timeline.setModel(self.model)
+        # 点击缩略图或在时间线上用方向键移动时，滑块跟随
+        self.timeline.selectionModel().currentChanged.connect(lambda current, _: self.slider.setValue(current.row()))
+        layout.addWidget(self.timeline)
+
+        # 创建起点、终点按钮的水平布局 -----------------------------
+        range_layout = QtWidgets.QHBoxLayout()
+        startButton = QtWidgets.QPushButton('设为起点')
+        startButton.clicked.connect(self.setStart)
+        stopButton = QtWidgets.QPushButton('设为终点')
+        stopButton.clicked.connect(self.setStop)
+        resetButton = QtWidgets.QPushButton('全部保留')
+        resetButton.clicked.connect(self.resetRange)
+        range_layout.addWidget(startButton)
+        range_layout.addWidget(stopButton)
+        range_layout.addWidget(resetButton)
+        layout.addLayout(range_layout)
+
+        # 创建保留范围标签 -----------------------------
+        self.rangeLabel = QtWidgets.QLabel()
+        layout.addWidget(self.rangeLabel)
+
+        # 创建确定、取消按钮 -----------------------------
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        buttons.button(QtWidgets.QDialogButtonBox.Ok).setText('保存选中的一段')
+        buttons.button(QtWidgets.QDialogButtonBox.Cancel).setText('放弃录制')
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        # 显示第一帧和默认范围
+        self.showFrame(0)
+        self.updateRange()
+        self.slider.setFocus()
+
+    def showFrame(self, index):
+        '''函数功能:预览第index帧,时间线滚动到该帧'''
+        self.previewLabel.setPixmap(self.previews.get(index))
+        self.positionLabel.setText(f'第 {index + 1}/{len(self.timestamps)} 帧，'
+                                   f'{self.timestamps[index] - self.timestamps[0]:.2f} 秒')
+        # 时间线的当前项跟随（当前项已是该帧时不会再次触发滑块）
+        model_index = self.model.index(index)
+        self.timeline.setCurrentIndex(model_index)
+        self.timeline.scrollTo(model_index)
+
+    def setStart(self):
+        '''函数功能:把当前帧设为起点(终点在它之前时一并移到当前帧)'''
+        index = self.slider.value()
+        self.start, self.stop = index, max(self.stop, index + 1)
+        self.updateRange()
+
+    def setStop(self):
+        '''函数功能:把当前帧设为终点(保留该帧,起点在它之后时一并移到当前帧)'''
+        index = self.slider.value()
+        self.start, self.stop = min(self.start, index), index + 1
+        self.updateRange()
+
+    def resetRange(self):
+        '''函数功能:恢复为保留全部帧'''
+        self.start, self.stop = 0, len(self.timestamps)
+        self.updateRange()
+
+    def updateRange(self):
+        '''函数功能:更新时间线的背景色和保留范围标签'''
+        self.model.setRange(self.start, self.stop)
+        self.rangeLabel.setText(f'保留第 {self.start + 1} ~ {self.stop} 帧，共 {self.stop - self.start} 帧，'
+                                f'{self.endTime() - self.timestamps[self.start]:.2f} 秒')
+
+    def selection(self):
+        '''函数功能:返回选中帧的序号range'''
+        return range(self.start, self.stop)
+
+    def endTime(self):
+        '''函数功能:返回选中的最后一帧的结束时间(下一帧的时间戳,最后一帧为录制结束时间)'''
+        return self.timestamps[self.stop] if self.stop < len(self.timestamps) else self.end_time
@@ -0,0 +1,201 @@
+# 导入必要的模块
+import struct  # 用于按GIF规范的小端格式打包整数
+import numpy as np  # 用于向量化比较帧与画布
+from PIL import GifImagePlugin, Image  # Pillow的GIF插件，这里只借用其单帧LZW编码
+
+'''
+增量GIF写入器。
+
+Pillow 的 save(save_all=True) 需要一次性拿到全部帧才能开始写文件，
+而边录制边编码时帧是一帧一帧到达的。GifWriter 自己写文件头、全局颜色表、循环扩展和结束符，
+每一帧则交给 Pillow 的 GifImagePlugin.getdata 编码，
+这样每追加一帧就能立即写入磁盘，内存中不需要保留任何历史帧。
+
+帧间透明优化：GifWriter 在内存中维护一张按处置方法合成后的画布（每像素一个 0xRRGGBB 整数），
+追加一帧时先用调色板把它还原为颜色，与画布上对应位置比较，颜色相同的像素改写为透明色索引，
+再把帧裁剪到仍需绘制的像素的外接矩形。解码结果与不做优化时完全相同，
+但未变化的像素变成了成片的同一个索引，LZW 可以用很长的串编码它们。
+Pillow 的 save(optimize=True) 只压缩调色板，不做这种替换。
+透明色使用帧中没有用到的调色板索引；流水线量化时最多使用255色（palette.MAX_FRAME_COLORS），
+保证总有一个空闲索引。
+'''
+
+# GIF处置方法：未指定、不处置（保留在画布上）、恢复为背景、恢复为上一状态
+DISPOSAL_UNSPECIFIED = 0
+DISPOSAL_NONE = 1
+DISPOSAL_BACKGROUND = 2
+DISPOSAL_PREVIOUS = 3
+
+# 画布上尚未绘制或已恢复为背景的像素（不是任何 0xRRGGBB 颜色，不会与帧中的颜色相同）
+_BACKGROUND = np.uint32(0xff000000)
+# 帧无法裁剪时，相同像素少于 1/32 就不做透明替换
+MIN_TRANSPARENT_SHARE = 32
+
+
+class GifWriter:
+    """
+    逐帧追加写入的GIF文件写入器。
+
+    用法：
+        writer = GifWriter(fp, (width, height), palette=first_frame.getpalette())
+        writer.append(p_image, duration=100)
+        ...
+        writer.close()
+
+    每帧必须是 'P' 模式（调色板）的 PIL 图像。palette 为全局颜色表，
+    调色板与全局颜色表相同的帧（共享调色板模式下的所有帧）不再重复写入局部颜色表。
+    optimize 为 True 时做帧间透明优化（见模块说明），transparent_pixels 统计被替换为透明的像素数。
+    """
+
+    def __init__(self, fp, size, loop=0, palette=None, optimize=True):
+        # 输出的文件对象（需要以二进制写模式打开）
+        self.fp = fp
+        # 画布尺寸 (宽, 高)
+        self.size = size
+        # 全局颜色表（整数列表），None表示不使用全局颜色表
+        self.palette = palette
+        # 是否做帧间透明优化
+        self.optimize = optimize
+        # 合成后的画布（高, 宽），每像素为 0xRRGGBB，只在优化时维护
+        self.canvas = np.full((size[1], size[0]), _BACKGROUND, np.uint32) if optimize else None
+        # 把帧还原为颜色时复用的缓冲区（按画布大小分配一次）
+        self._colors = np.empty(size[0] * size[1], np.uint32) if optimize else None
+        # 最近一个调色板及其 0xRRGGBB 数组（共享调色板时每帧相同，不必重复换算）
+        self._palette_key = None
+        self._palette_colors = None
+        # 已写入的帧数和被替换为透明的像素数
+        self.frame_count = 0
+        self.transparent_pixels = 0
+        # 写入文件头和循环扩展
+        self._writeHeader(loop)
+
+    def _writeHeader(self, loop):
+        '''函数功能:写入GIF文件头、逻辑屏幕描述符、全局颜色表和NETSCAPE循环扩展'''
+        width, height = self.size
+        # 文件签名和版本（需要图形控制扩展，所以使用89a）
+        self.fp.write(b'GIF89a')
+        if self.palette:
+            # 颜色表的项数必须是2的幂，size_bits 为 log2(项数)
+            entries = len(self.palette) // 3
+            size_bits = max(1, (entries - 1).bit_length())
+            table = bytes(self.palette) + b'\x00' * 3 * ((1 << size_bits) - entries)
+            # 逻辑屏幕描述符：画布宽高、有全局颜色表及其大小、背景色索引0、像素宽高比0
+            self.fp.write(struct.pack('<HHBBB', width, height, 0x80 | (size_bits - 1), 0, 0))
+            self.fp.write(table)
+        else:
+            # 逻辑屏幕描述符：画布宽高、无全局颜色表、背景色索引0、像素宽高比0
+            self.fp.write(struct.pack('<HHBBB', width, height, 0, 0, 0))
+        # NETSCAPE2.0 应用扩展，loop=0 表示无限循环，None 表示不写（只播放一次）
+        if loop is not None:
+            self.fp.write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\x00')
+
+    def append(self, image, duration, offset=(0, 0), disposal=0, transparency=None):
+        """
+        追加一帧。
+
+        image 为 'P' 模式的 PIL 图像；duration 为显示时长（毫秒，GIF 精度为10毫秒）；
+        offset 为该帧左上角在画布中的位置；disposal 为该帧的处置方法；
+        transparency 为透明色的调色板索引（None 表示不透明）。
+        """
+        if self.optimize:
+            image, offset, transparency = self._optimizeFrame(image, offset, disposal, transparency)
+        # 调色板与全局颜色表不同时才写入局部颜色表
+        include_color_table = not self.palette or image.getpalette() != self.palette
+        # 组装该帧的编码参数
+        params = {'duration': duration, 'disposal': disposal, 'include_color_table': include_color_table}
+        if transparency is not None:
+            params['transparency'] = transparency
+        # 编码该帧（图形控制扩展 + 图像描述符 + 局部颜色表 + LZW数据）并直接写入文件
+        for chunk in GifImagePlugin.getdata(image, offset, **params):
+            self.fp.write(chunk)
+        # 更新已写入帧数
+        self.frame_count += 1
+
+    def _paletteColors(self, palette):
+        '''函数功能:返回调色板(整数列表)对应的0xRRGGBB数组,与上一帧相同时直接复用'''
+        if palette != self._palette_key:
+            rgb = np.array(palette, np.uint32).reshape(-1, 3)
+            self._palette_key = palette
+            self._palette_colors = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+        return self._palette_colors
+
+    def _optimizeFrame(self, image, offset, disposal, transparency):
+        """
+        帧间透明优化：与画布颜色相同的像素改为透明色，裁剪到仍需绘制的区域，并按处置方法更新画布。
+        返回 (图像, 偏移, 透明色索引)。
+        """
+        x, y = offset
+        width, height = image.size
+        palette = image.getpalette()
+        indices = np.asarray(image)
+        # 该帧在画布上显示的颜色（调用方指定的透明色不绘制）
+        # mode='clip' 省去越界检查，并写入复用的缓冲区，比花式索引快约三分之一
+        colors = self._colors[:width * height].reshape(height, width)
+        np.take(self._paletteColors(palette), indices, out=colors, mode='clip')
+        drawn = None if transparency is None else indices != transparency
+        region = self.canvas[y:y + height, x:x + width]
+        # 处置方法为"恢复为上一状态"时，显示完后画布回到绘制前的样子
+        saved = region.copy() if disposal == DISPOSAL_PREVIOUS else None
+        # 与画布相同的像素不需要再画
+        same = colors == region
+        if drawn is not None:
+            same |= ~drawn
+        # 更新画布：颜色相同的像素写入后不变，所以只需跳过不绘制的透明像素
+        if drawn is None:
+            region[...] = colors
+        else:
+            np.copyto(region, colors, where=drawn)
+        if disposal == DISPOSAL_PREVIOUS:
+            region[...] = saved
+        elif disposal == DISPOSAL_BACKGROUND:
+            region[...] = _BACKGROUND
+        # 没有可以省去的像素时原样写入（例如第一帧）；"恢复为背景"的帧清除时，
+        # 各解码器对带透明色的帧填充的颜色不一致（透明或背景色），也原样写入
+        if disposal == DISPOSAL_BACKGROUND or not same.any():
+            return image, offset, transparency
+        # 裁剪到需要绘制的像素的外接矩形；全部相同时保留一个透明像素，帧的时长仍然有效
+        changed = ~same
+        rows = np.flatnonzero(changed.any(axis=1))
+        if rows.size == 0:
+            top, bottom, left, right = 0, 1, 0, 1
+        else:
+            cols = np.flatnonzero(changed.any(axis=0))
+            top, bottom, left, right = int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1
+        same_pixels = int(np.count_nonzero(same))
+        # 无法裁剪、相同的像素又只是零星几个（如噪声画面）时，替换为透明色对 LZW 没有帮助，原样写入
+        if (bottom - top, right - left) == (height, width) and same_pixels * MIN_TRANSPARENT_SHARE < height * width:
+            return image, offset, transparency
+        # 选择透明色索引：优先沿用调用方指定的，其次是帧中没有用到的索引
+        if transparency is None:
+            transparency, palette = _free_index(image, palette)
+            if transparency is None:
+                return image, offset, None
+        out = indices[top:bottom, left:right].copy()
+        out[same[top:bottom, left:right]] = transparency
+        self.transparent_pixels += same_pixels
+        optimized = Image.fromarray(out, 'P')
+        optimized.putpalette(palette)
+        return optimized, (x + left, y + top), transparency
+
+    def close(self):
+        '''函数功能:写入GIF结束符并刷新文件'''
+        # 写入文件结束标志
+        self.fp.write(b';')
+        # 刷新缓冲区，确保数据已写入文件
+        self.fp.flush()
+
+
+def _free_index(image, palette):
+    """
+    返回 (透明色索引, 调色板)：优先取调色板中存在但 image 中没有用到的索引；
+    调色板不足256色时在末尾追加一个颜色作为透明色；都不行时返回 (None, palette)。
+    """
+    entries = len(palette) // 3
+    # Pillow 的直方图在C层统计，比 np.bincount（需要先把索引扩展为64位整数）快得多
+    counts = np.array(image.histogram())
+    unused = np.flatnonzero(counts[:entries] == 0)
+    if unused.size:
+        return int(unused[-1]), palette
+    if entries < 256:
+        return entries, palette + [0, 0, 0]
+    return None, palette
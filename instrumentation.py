@@ -0,0 +1,191 @@
+# 导入必要的模块
+import bisect  # 用于把耗时放入直方图的格子
+import json  # 用于导出时间线文件
+import os  # 用于获取进程号和读取内存占用
+import sys  # 用于判断操作系统
+import threading  # 用于保护多个线程同时写入的统计数据
+import time  # 用于高精度计时
+try:
+    import resource  # 用于在没有 /proc 的系统上读取峰值内存（Windows 上没有该模块）
+except ImportError:
+    resource = None
+
+'''
+热路径的分阶段计时。
+
+录制比设定的帧率慢时，瓶颈可能在截图（grabWindow）、转换（toImage）、向界面发信号、
+量化或文件写入中的任何一处。Instrumentation 为每个阶段维护一个耗时直方图，
+记录队列深度、内存等数值（gauge），并保存一份可以在 chrome://tracing 或 Perfetto 中打开的时间线。
+
+热路径上的代码先判断 instrumentation 是否为 None 再计时，关闭时只有一次比较的开销：
+    start = time.perf_counter() if self.instrumentation is not None else 0.0
+    ...
+    if self.instrumentation is not None:
+        self.instrumentation.record('grab', start)
+'''
+
+# 直方图的格子上界（毫秒），最后一格为无穷大
+BUCKET_BOUNDS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float('inf'))
+# 时间线中最多保留的事件数，超过后不再记录新事件（统计数据不受影响）
+MAX_TRACE_EVENTS = 200000
+
+
+def current_rss_bytes():
+    '''函数功能:返回本进程当前的常驻内存(字节),没有 /proc 时返回峰值内存,都无法读取时返回0'''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        if resource is None:
+            return 0
+        # macOS 上 ru_maxrss 的单位是字节，Linux 上是KB
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageStats:
+    """
+    一个阶段的耗时统计：总次数、总耗时、最大值和按 BUCKET_BOUNDS_MS 分格的直方图，
+    另外记录自上次 takeRecent 以来的次数和耗时，供界面显示最近一段时间的平均值。
+    """
+
+    def __init__(self):
+        # 总次数和总耗时（秒）
+        self.count = 0
+        self.total = 0.0
+        # 最大耗时（秒）
+        self.max = 0.0
+        # 直方图，每格的计数
+        self.buckets = [0] * len(BUCKET_BOUNDS_MS)
+        # 最近一段时间的次数和耗时
+        self.recent_count = 0
+        self.recent_total = 0.0
+
+    def add(self, seconds):
+        '''函数功能:加入一次耗时(秒)'''
+        self.count += 1
+        self.total += seconds
+        self.recent_count += 1
+        self.recent_total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, seconds * 1000)] += 1
+
+    def percentile(self, fraction):
+        '''函数功能:由直方图估计分位数(毫秒,在所在格子内线性插值,不超过最大值)'''
+        target = fraction * self.count
+        seen, lower = 0, 0.0
+        for bound, count in zip(BUCKET_BOUNDS_MS, self.buckets):
+            if count and seen + count >= target:
+                # 最后一格没有上界，用最大值代替
+                upper = min(bound, self.max * 1000)
+                return lower + (upper - lower) * (target - seen) / count
+            seen += count
+            lower = bound
+        return self.max * 1000
+
+    def takeRecent(self):
+        '''函数功能:返回并清零最近一段时间的平均耗时(毫秒),这段时间没有记录时返回None'''
+        mean = self.recent_total / self.recent_count * 1000 if self.recent_count else None
+        self.recent_count = 0
+        self.recent_total = 0.0
+        return mean
+
+    def summary(self):
+        '''函数功能:返回该阶段统计的字典(毫秒)'''
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'max_ms': round(self.max * 1000, 3),
+            'histogram': dict(zip([str(bound) for bound in BUCKET_BOUNDS_MS], self.buckets)),
+        }
+
+
+class Instrumentation:
+    """
+    一次录制会话的分阶段计时、数值记录和时间线。
+
+    record(stage, start)：记录从 start（time.perf_counter）到现在的一次阶段耗时；
+    gauge(name, value)：记录一个瞬时数值（队列深度、内存等），同时保留最大值；
+    snapshot()：返回所有统计的字典；exportTrace(path)：导出 Chrome trace 格式的时间线。
+    所有方法都可以在多个线程中同时调用。
+    """
+
+    def __init__(self, trace=True):
+        # 是否保存时间线事件
+        self.trace = trace
+        # 阶段名 → StageStats
+        self.stages = {}
+        # 数值名 → [当前值, 最大值]
+        self.gauges = {}
+        # 时间线事件：(阶段名, 线程号, 开始时间, 耗时) 或 (数值名, None, 时间, 值)
+        self.events = []
+        # 线程号 → 线程名，导出时间线时用于标注
+        self.thread_names = {}
+        # 时间线的零点
+        self.origin = time.perf_counter()
+        # 保护上面的数据
+        self.lock = threading.Lock()
+
+    def record(self, stage, start, end=None):
+        '''函数功能:记录一次阶段耗时,start/end为time.perf_counter的值,end默认为当前时间'''
+        if end is None:
+            end = time.perf_counter()
+        with self.lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.add(end - start)
+            if self.trace and len(self.events) < MAX_TRACE_EVENTS:
+                ident = threading.get_ident()
+                if ident not in self.thread_names:
+                    self.thread_names[ident] = threading.current_thread().name
+                self.events.append((stage, ident, start, end - start))
+
+    def gauge(self, name, value):
+        '''函数功能:记录一个瞬时数值(队列深度、内存等)'''
+        with self.lock:
+            current = self.gauges.get(name)
+            if current is None:
+                self.gauges[name] = [value, value]
+            else:
+                current[0] = value
+                if value > current[1]:
+                    current[1] = value
+            if self.trace and len(self.events) < MAX_TRACE_EVENTS:
+                self.events.append((name, None, time.perf_counter(), value))
+
+    def recentMeans(self):
+        '''函数功能:返回各阶段最近一段时间的平均耗时(毫秒)并开始新的一段'''
+        with self.lock:
+            return {stage: stats.takeRecent() for stage, stats in self.stages.items()}
+
+    def snapshot(self):
+        '''函数功能:返回各阶段的耗时统计和各数值的当前值/最大值'''
+        with self.lock:
+            return {
+                'stages': {stage: stats.summary() for stage, stats in self.stages.items()},
+                'gauges': {name: {'current': value, 'max': peak} for name, (value, peak) in self.gauges.items()},
+            }
+
+    def exportTrace(self, path):
+        """
+        把时间线导出为 Chrome trace（JSON）文件，可在 chrome://tracing 或 ui.perfetto.dev 中打开。
+        阶段耗时为 "X"（完整事件），数值为 "C"（计数器），时间单位为微秒。
+        """
+        pid = os.getpid()
+        with self.lock:
+            events, names = list(self.events), dict(self.thread_names)
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': ident, 'args': {'name': name}}
+                 for ident, name in names.items()]
+        for name, ident, start, value in events:
+            ts = round((start - self.origin) * 1e6, 1)
+            if ident is None:
+                trace.append({'name': name, 'ph': 'C', 'ts': ts, 'pid': pid, 'args': {name: value}})
+            else:
+                trace.append({'name': name, 'cat': 'stage', 'ph': 'X', 'ts': ts, 'dur': round(value * 1e6, 1),
+                              'pid': pid, 'tid': ident})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms', 'otherData': self.snapshot()}, f)
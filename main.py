@@ -1,14 +1,28 @@
 # 导入必要的模块
+import os  # 提供文件路径相关的函数
 import sys  # 提供对Python解释器的一些变量和函数的访问
 import time  # 提供各种时间相关的函数
-import imageio  # 用于读取和写入各种图像和视频格式
-import numpy as np  # 用于科学计算，提供多维数组对象和各种派生对象
+import json  # 用于输出命令行录制的统计信息
+import argparse  # 用于解析命令行录制的参数
 from PyQt5 import QtCore, QtGui, QtWidgets  # PyQt5框架的核心模块，用于创建GUI应用
-from PIL import Image  # Python图像库，用于打开、操作和保存多种格式的图像文件
+from pipeline import DEFAULT_PROCESS_COUNT, EncodingCancelled, StreamingEncoder  # 帧编码流水线
+from frame_convert import qimage_to_frame  # 零拷贝帧转换
+from frame_store import DEFAULT_MEMORY_BUDGET, FrameRange, FrameStore  # 带内存上限的帧存储
+from frame_scale import FrameScaler  # 截图后缩小到输出尺寸
+from frame_diff import MotionDetector  # 自适应帧率的画面变化检测
+from frame_pool import FramePool, copy_pixmap  # 可复用的帧缓冲池
+from backends import (BACKENDS, GifBackend, backend_for_filter, backend_for_path, backend_options,  # 输出格式
+                      supports_target_size)
+from palette import MAX_FRAME_COLORS, PALETTE_ADAPTIVE, PALETTE_GLOBAL, PALETTE_SCENE, sample_frames  # 调色板模式
+from dither import (DEFAULT_MATRIX_SIZE, DITHER_FLOYD_STEINBERG, DITHER_MODES, DITHER_NONE, DITHER_ORDERED,
+                    MATRIX_SIZES)  # 抖动方式
 
 '''
 这些包的用途解释：
 
+0. os：
+   - 提供与操作系统交互的函数
+   - 在本程序中用于处理保存路径
 1. sys：
    - 用于与Python解释器交互
    - 在本程序中主要用于处理命令行参数和退出应用程序
@@ -17,40 +31,145 @@ from PIL import Image  # Python图像库，用于打开、操作和保存多种
    - 在本程序中用于测量录制时间和控制帧率
 3. imageio：
    - 用于读取和写入各种图像和视频格式
+   - 在本程序中由 backends 模块通过其 ffmpeg 插件写入MP4，只在输出MP4时才导入（导入较慢，不拖慢启动）
 4. numpy (np)：
    - 提供大量的数学函数和数组操作功能
-   - 在本程序中用于图像数据的处理和操作
+   - 在本程序中由 pipeline 等模块用于图像数据的处理和操作，本文件不直接使用
 5. PyQt5 (QtCore, QtGui, QtWidgets)：
    - QtCore：提供核心的非GUI功能，��和槽机制、属性系统等
    - QtGui：提供窗口系统集成、事件处理、2D图形、基本图像、字体和文本等类
    - QtWidgets：提供一套UI元素来创建经典的桌面风格用户界面
 6. PIL (Python Imaging Library)：
    - 提供图像处理和图形功能
-   - 在本程序中用于处理和保存捕获的屏幕图像，特别是在创建GIF时
+   - 在本程序中由 pipeline、palette 等模块用于量化和编码捕获的屏幕图像，本文件不直接使用
+7. pipeline：
+   - 本项目的帧编码流水线，支持边录制边编码，录制结束时只需写完剩余几帧
+8. palette：
+   - 本项目的共享调色板模块，用查找表代替逐帧生成调色板
+9. frame_store：
+   - 本项目的帧存储，超过内存上限的旧帧转存到磁盘上的内存映射文件中
+10. instrumentation：
+   - 本项目的分阶段计时模块，记录截图、转换、量化、写入等阶段的耗时直方图并导出时间线；只在启用性能统计或 --trace 时才导入
+11. backends：
+   - 本项目的输出后端，支持 GIF、MP4、WebP 和 APNG，均为逐帧流式写入
+12. json / argparse：
+   - 用于无界面的命令行录制模式（python main.py record ...）：解析参数并输出机器可读的统计信息
+13. frame_scale：
+   - 本项目的帧缩放模块，截图后立即按输出缩放比例或最大边长缩小（整数倍时为 NumPy 区域平均）
+14. frame_pool：
+   - 本项目的帧缓冲池，边录制边编码时截图直接复制进预先分配、可复用的槽中，每帧不再分配大块内存
+15. recorder_daemon / recorderctl：
+   - 常驻录制守护进程（python main.py daemon）及其只依赖标准库的客户端，
+     预先完成导入和预热，脚本多次录制时从 start 到第一帧只需几毫秒；只有守护进程模式才导入 recorder_daemon
+16. dither：
+   - 本项目的抖动模块，提供按画布坐标对齐、整帧向量化的 Bayer 有序抖动（帧间稳定），以及不抖动和误差扩散两种对照
+17. size_target：
+   - 本项目的目标文件大小模式，按候选的抽帧步长、缩放比例和颜色数只编码几段采样帧来估计输出大小，
+     选出放得下的画质最好的设置后只正式编码一次；只在设置了目标文件大小时才导入
+18. frame_timeline：
+   - 本项目的剪辑时间线，录制结束后预览任意一帧并选定起点和终点，只编码选中的一段；
+     缩略图随滚动和拖动懒生成，保存在有上限的 LRU 缓存中；只在录制后剪辑时才导入
 '''
 
 
+def palette_samples(frames, palette_mode, backend):
+    '''函数功能:全局共享调色板时从保存的帧中按固定步长挑选生成调色板的采样帧(只有GIF需要调色板),否则返回None'''
+    return sample_frames(frames) if palette_mode == PALETTE_GLOBAL and backend.paletted else None
+
+
+def stored_frames_encoder(frames, speed_multiplier, palette_mode, processes, directory=None, instrumentation=None,
+                          backend=GifBackend, options=None, dither=DITHER_NONE, dither_size=DEFAULT_MATRIX_SIZE,
+                          scaler=None, colors=MAX_FRAME_COLORS, samples=None):
+    """
+    为录制结束后才编码的帧创建编码流水线，正常保存和目标文件大小模式都由这里创建。
+    samples 为已挑选的全局调色板采样帧，为None时按需从 frames 中采样；
+    scaler 和 colors 为流水线的缩小和颜色数（目标文件大小模式按候选设置传入）。
+    """
+    if samples is None:
+        samples = palette_samples(frames, palette_mode, backend)
+    # 临时文件放在目标目录中,编码完成后只需重命名
+    return StreamingEncoder(speed_multiplier, directory=directory, palette_mode=palette_mode,
+                            palette_samples=samples, processes=processes, instrumentation=instrumentation,
+                            backend=backend, backend_options=options, scaler=scaler, dither=dither,
+                            dither_size=dither_size, colors=colors)
+
+
+def encode_stored_frames(frames, timestamps, speed_multiplier, palette_mode, processes, directory=None,
+                         instrumentation=None, backend=GifBackend, options=None, dither=DITHER_NONE,
+                         dither_size=DEFAULT_MATRIX_SIZE):
+    """
+    录制结束后才编码时，把保存的帧依次送入一条新的编码流水线，返回该流水线。
+    调用方负责 finish / save / discard。
+    """
+    encoder = stored_frames_encoder(frames, speed_multiplier, palette_mode, processes, directory, instrumentation,
+                                    backend, options, dither, dither_size)
+    for frame, timestamp in zip(frames, timestamps):
+        encoder.submit(frame, timestamp)
+    return encoder
+
+
+def abandon_encoder(encoder, end_time):
+    '''函数功能:取消并结束编码流水线,删除临时文件(流水线中的异常一并忽略)'''
+    encoder.cancel()
+    try:
+        encoder.finish(end_time)
+    except Exception:
+        pass
+    encoder.discard()
+
+
+def stored_frames_size_target(frames, target_bytes, frame_rate, speed_multiplier, palette_mode, processes,
+                              backend=GifBackend, dither=DITHER_NONE, dither_size=DEFAULT_MATRIX_SIZE):
+    """
+    为录制结束后才编码的帧创建目标文件大小设置（size_target.SizeTarget）。
+    它的流水线工厂按 (抽帧步长, 输出缩放比例, 颜色数) 创建流水线：MP4 的帧率按抽帧步长降低，
+    缩放比例小于1时由流水线的第一个阶段缩小，全局共享调色板的采样帧只挑选一次，估计和正式编码共用。
+    """
+    from size_target import SizeTarget  # 目标文件大小模式（用到时才导入）
+    samples = palette_samples(frames, palette_mode, backend)
+
+    def make_encoder(settings, directory=None, instrumentation=None):
+        step, scale, colors = settings
+        return stored_frames_encoder(frames, speed_multiplier, palette_mode, processes, directory, instrumentation,
+                                     backend, backend_options(backend, frame_rate / step, speed_multiplier),
+                                     dither, dither_size, scaler=FrameScaler(scale) if scale < 1.0 else None,
+                                     colors=colors or MAX_FRAME_COLORS, samples=samples)
+    return SizeTarget(target_bytes, make_encoder, backend.paletted)
+
+
 class RecorderThread(QtCore.QThread):
     """
 RecorderThread 类实现了以下主要功能：
 1. 屏幕录制：
     它能够在指定的屏幕区域内进行连续的截图，从而实现屏幕录制功能。
 2. 帧率控制：
-    通过设定的帧率（frame_rate）来控制录制的速度，确保录制的流畅性。
+    按设定的帧率（frame_rate）计算单调时钟上的截止时间进行截图，截图耗时不会导致帧率漂移；
+    错过的时刻直接跳过（计入 dropped_ticks），不会堆积补拍。
+    adaptive 为True时按画面变化调整帧率：用 MotionDetector 的稀疏网格判断画面是否变化，
+    画面静止超过 IDLE_DELAY 秒后降到 idle_rate 帧/秒轮询，检测到变化后立即恢复到 frame_rate；
+    每帧仍记录实际的捕获时间戳，播放时长不受影响。grabSkipRatio 为因此省去的截图次数所占的比例。
 3. 时间限制：
-    设置了15秒的录制时间限制，超过这个时间会自动停止录制。
+    录制时长达到 max_duration 秒（默认15秒，0或None表示不限制）时自动停止录制。
 4. 异步操作：
     继承自 QThread，使得录制过程可以在后台线程中进行，不会阻塞主线程。
 5. 状态管理：
     通过 isRecording 标志来管理录制的开始和结束状态。
 6. 数据收集：
-    将捕获的每一帧图像存储在 frames 列表中。
+    将捕获的每一帧图像存储在带内存上限的 frames 帧存储中（或直接提交给 encoder 流水线边录边编码），
+    并在 timestamps 列表中记录每帧的高精度捕获时间。
+    encoder 带有帧缓冲池（frame_pool）时，截图直接复制进池中的空闲槽再连同槽号提交，不再调用 toImage()。
 7. 实时反馈：
     使用 Qt 信号机制（frameCaptured 和 recordingTimeUpdated）来实时通知主线程录制的进度和时间。
 8. 灵活控制：
     提供了 stop 方法允许外部控制录制的结束。
-9. 间记录：
-    记录制的开始和结束时间，便于后续处理（如计算总录制时间）。
+9. 时间记录：
+    记录录制的开始和结束时间，便于后续处理（如计算每帧时长和实际帧率）。
+10. 输出尺寸：
+    传入 scaler（FrameScaler）时，帧在进入帧存储之前缩小到输出尺寸（边录制边编码时由流水线的第一个阶段缩小，
+    应传入同一个 scaler）；第一帧截图时把截图的 devicePixelRatio 告诉 scaler，HiDPI 屏幕上的截图也能得到正确的输出尺寸。
+11. 性能统计：
+    传入 instrumentation 时记录截图、toImage、保存/提交和发信号各阶段的耗时，
+    并每隔 STATS_INTERVAL 秒通过 statsUpdated 信号发送最近的帧率、截图延迟、队列深度和内存占用。
 
 总的来说，这个类封装了一个完整的屏幕录制功能，可以高效地捕获屏幕内容，并提供了必要的控制和反馈机制，使其能够很好地集成到更大的应用程序中。
 
@@ -59,14 +178,27 @@ RecorderThread 类实现了以下主要功能：
     frameCaptured = QtCore.pyqtSignal(int)
     # 定义信号，用于更新录制时间
     recordingTimeUpdated = QtCore.pyqtSignal(float)
+    # 定义信号，用于发送实时性能统计（仅在启用 instrumentation 时发送）
+    statsUpdated = QtCore.pyqtSignal(dict)
+    # 发送实时性能统计的间隔（秒）
+    STATS_INTERVAL = 0.5
+    # 自适应帧率：画面静止超过该时间（秒）后才降低截图频率，避免在连续的动作之间来回切换
+    IDLE_DELAY = 0.5
 
-    def __init__(self, rect, frame_rate):
+    def __init__(self, rect, frame_rate, max_duration=15, encoder=None, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 instrumentation=None, scaler=None, adaptive=False, idle_rate=2.0):
         # 调用父类的初始化方法
         super().__init__()
         # 存储要录制的屏幕区域
         self.rect = rect
-        # 用于存储捕获的帧
-        self.frames = []
+        # 用于存储捕获的帧，超过内存上限的旧帧会转存到磁盘（使用编码流水线时保持为空）
+        self.frames = FrameStore(memory_budget)
+        # 编码流水线，为None时帧保存在 frames 列表中
+        self.encoder = encoder
+        # 最长录制时间（秒），0或None表示不限制
+        self.max_duration = max_duration
+        # 用于存储每一帧的捕获时间戳（time.perf_counter 单调时钟，秒）
+        self.timestamps = []
         # 录制状态标志
         self.isRecording = False
         # 获取主屏幕对象，用于截图
@@ -77,40 +209,191 @@ RecorderThread 类实现了以下主要功能：
         self.start_time = None
         # 用于存储录制结束时间
         self.end_time = None
+        # 因截图耗时过长而跳过的采样时刻数
+        self.dropped_ticks = 0
+        # 分阶段计时（Instrumentation），为None时不计时
+        self.instrumentation = instrumentation
+        # 截图后的缩小（FrameScaler），为None时保持截图尺寸
+        self.scaler = scaler
+        # 自适应帧率：画面静止时的轮询帧率，以及画面变化检测器（固定帧率时为None）
+        self.idle_rate = min(idle_rate, frame_rate)
+        self.motion = MotionDetector() if adaptive else None
+        # 以静止时的低频率截图的次数
+        self.idle_polls = 0
+        # 按低频率轮询而省去的截图次数（按 frame_rate 的采样时刻计，可以是小数）
+        self.skipped_ticks = 0.0
+        # 录制线程消耗的CPU时间（秒）
+        self.capture_cpu = 0.0
+        # 截图或存储出错时录制提前结束，异常保存在这里（正常结束时为None）
+        self.error = None
 
     def run(self):
         # 设置录制状态为True
         self.isRecording = True
-        # 计算每帧之间的睡眠时间，以达到指定帧
-        sleep_time = 1.0 / self.frame_rate
-        # 记录开始时
-        self.start_time = time.time()
-
-        while self.isRecording:
-            # 获取当时间
-            current_time = time.time()
-            # 计算已经录制的时间
-            elapsed_time = current_time - self.start_time
-
-            # 如果录制时间达到或超过15秒，停止录制
-            if elapsed_time >= 15:
-                break
-
-            # 捕获指定区域的屏幕截图
-            pixmap = self.screen.grabWindow(0, self.rect.x(), self.rect.y(), self.rect.width(), self.rect.height())
-            # 将截图转换为QImage并添加到帧列表中
-            self.frames.append(pixmap.toImage())
-            # 发送信号，通知已捕获的帧数
-            self.frameCaptured.emit(len(self.frames))
-            # 发送信号，更新录制时间
-            self.recordingTimeUpdated.emit(elapsed_time)
-            # 根据帧率休眠，控制捕获速度
-            time.sleep(sleep_time)
-
-        # 记录结束时间
-        self.end_time = time.time()
-        # 确保录制状态设置为False
-        self.isRecording = False
+        # 计算相邻两帧之间的间隔，以达到指定帧率
+        interval = active_interval = 1.0 / self.frame_rate
+        # 画面静止时的截图间隔（自适应帧率）
+        idle_interval = 1.0 / self.idle_rate
+        # 记录开始时间（使用单调时钟，不受系统时间调整影响）
+        self.start_time = time.perf_counter()
+        # 上一次检测到画面变化的时间
+        last_motion = self.start_time
+        # 记录录制线程的CPU时间起点
+        cpu_start = time.thread_time()
+        # 边录制边编码时使用流水线的帧缓冲池；画面变化检测器持有的槽
+        frame_pool = self.encoder.frame_pool if self.encoder is not None else None
+        motion_slot = None
+        # 当前的低频率间隔内省去的采样时刻数，到下一次截图时才计入（录制在间隔中途结束时不计）
+        pending_skip = 0.0
+        # 下一帧的截止时间，第一帧立即捕获
+        next_deadline = self.start_time
+        # 分阶段计时，为None时热路径上只有判断的开销
+        instrumentation = self.instrumentation
+        # 下一次发送实时性能统计的时间，以及上一次发送时的帧数和时间
+        next_report = self.start_time + self.STATS_INTERVAL
+        last_report = (0, self.start_time)
+
+        try:
+            while self.isRecording:
+                # 如果还没到截止时间，休眠到截止时间为止
+                current_time = time.perf_counter()
+                if current_time < next_deadline:
+                    time.sleep(next_deadline - current_time)
+                    current_time = time.perf_counter()
+                # 计算已经录制的时间
+                elapsed_time = current_time - self.start_time
+
+                # 如果录制时间达到或超过最长录制时间，停止录制
+                if self.max_duration and elapsed_time >= self.max_duration:
+                    break
+                self.skipped_ticks += pending_skip
+
+                # 捕获指定区域的屏幕截图
+                pixmap = self.screen.grabWindow(0, self.rect.x(), self.rect.y(),
+                                                self.rect.width(), self.rect.height())
+                # 截图失败（如没有可截取的屏幕）时停止录制，不把空图像交给后面的阶段
+                if pixmap.isNull():
+                    raise RuntimeError('截图失败（返回空图像）')
+                if instrumentation is not None:
+                    stage_start = time.perf_counter()
+                    instrumentation.record('grab', current_time, stage_start)
+                # HiDPI 屏幕上截图是选区逻辑尺寸的 devicePixelRatio 倍，由第一帧告诉缩放器
+                if self.scaler is not None and not self.timestamps:
+                    self.scaler.device_pixel_ratio = pixmap.devicePixelRatio()
+                # 有帧缓冲池时把截图直接复制进一个空闲槽（没有空闲槽时等待流水线归还），否则转换为QImage
+                slot = None
+                if frame_pool is not None:
+                    slot = frame_pool.acquire((pixmap.height(), pixmap.width(), 4))
+                    image = copy_pixmap(pixmap, frame_pool.frame(slot))
+                else:
+                    image = pixmap.toImage()
+                # 截图已复制或转换，尽早释放 QPixmap
+                del pixmap
+                if instrumentation is not None:
+                    instrumentation.record('to_image', stage_start)
+                    stage_start = time.perf_counter()
+                # 自适应帧率：按画面是否变化选择下一次截图的间隔
+                if self.motion is not None:
+                    if self.motion.changed(image if slot is not None else qimage_to_frame(image)):
+                        last_motion = current_time
+                    # 检测器保留当前帧作为下一次比较的基准，同时持有它的槽
+                    if slot is not None:
+                        frame_pool.retain(slot)
+                    if motion_slot is not None:
+                        frame_pool.release(motion_slot)
+                    motion_slot = slot
+                    if current_time - last_motion >= self.IDLE_DELAY:
+                        interval = idle_interval
+                        self.idle_polls += 1
+                    else:
+                        interval = active_interval
+                    pending_skip = interval / active_interval - 1
+                    if instrumentation is not None:
+                        instrumentation.record('motion', stage_start)
+                        stage_start = time.perf_counter()
+                if self.encoder is not None:
+                    # 提交给编码流水线（队列满时会阻塞，错过的时刻会被跳过）
+                    self.encoder.submit(image, current_time, slot)
+                else:
+                    # 先缩小到输出尺寸，帧存储（内存和磁盘暂存）只保存输出尺寸的帧
+                    if self.scaler is not None:
+                        image = self.scaler(qimage_to_frame(image))
+                    # 添加到帧存储中
+                    self.frames.append(image)
+                # 记录该帧的捕获时间戳
+                self.timestamps.append(current_time)
+                if instrumentation is not None:
+                    instrumentation.record('store', stage_start)
+                    stage_start = time.perf_counter()
+                # 发送信号，通知已捕获的帧数
+                self.frameCaptured.emit(len(self.timestamps))
+                # 发送信号，更新录制时间
+                self.recordingTimeUpdated.emit(elapsed_time)
+                if instrumentation is not None:
+                    instrumentation.record('emit', stage_start)
+                    # 每隔 STATS_INTERVAL 秒发送一次实时性能统计
+                    if current_time >= next_report:
+                        last_report = self._reportStats(last_report)
+                        next_report = current_time + self.STATS_INTERVAL
+
+                # 截止时间按固定步长前进，避免误差累积（不随截图耗时漂移）
+                next_deadline += interval
+                # 如果截图耗时超过了一个或多个完整间隔，跳过这些错过的时刻而不是连续补拍
+                missed = int((time.perf_counter() - next_deadline) // interval)
+                if missed > 0:
+                    self.dropped_ticks += missed
+                    next_deadline += missed * interval
+        except Exception as e:
+            # QThread.run 中未捕获的异常会终止整个进程：保存下来，由调用方在录制结束后报告
+            self.error = e
+        finally:
+            # 记录结束时间和录制线程消耗的CPU时间
+            self.end_time = time.perf_counter()
+            self.capture_cpu = time.thread_time() - cpu_start
+            # 归还画面变化检测器持有的槽
+            if motion_slot is not None:
+                frame_pool.release(motion_slot)
+            # 确保录制状态设置为False
+            self.isRecording = False
+
+    def _reportStats(self, last_report):
+        """
+        通过 statsUpdated 发送自上次发送以来的帧率、各阶段平均耗时（毫秒）、队列深度和内存占用，
+        返回本次发送时的 (帧数, 时间)，作为下一次的起点。
+        """
+        from instrumentation import current_rss_bytes  # 读取内存占用（只有启用分阶段计时时才用到）
+        instrumentation = self.instrumentation
+        now = time.perf_counter()
+        frames = len(self.timestamps)
+        # 记录内存占用
+        instrumentation.gauge('rss_mb', current_rss_bytes() >> 20)
+        if self.encoder is None:
+            instrumentation.gauge('store_ram_mb', self.frames.ram_bytes >> 20)
+            instrumentation.gauge('store_spool_mb', self.frames.spool_bytes >> 20)
+        gauges = instrumentation.snapshot()['gauges']
+        self.statsUpdated.emit({
+            'fps': (frames - last_report[0]) / (now - last_report[1]),
+            'stages': instrumentation.recentMeans(),
+            'gauges': {name: value['current'] for name, value in gauges.items()},
+        })
+        return frames, now
+
+    def achievedFrameRate(self):
+        '''函数功能:返回实际达到的帧率(帧/秒)'''
+        # 录制尚未结束或时长为0时无法计算
+        if self.start_time is None or self.end_time is None or self.end_time <= self.start_time:
+            return 0.0
+        return len(self.timestamps) / (self.end_time - self.start_time)
+
+    def grabSkipRatio(self):
+        """
+        返回自适应帧率因画面静止省去的截图次数占固定帧率下截图次数的比例（0~1）。
+        只统计按低频率轮询而跳过的采样时刻，截图耗时过长而错过的时刻（dropped_ticks）不计入。
+        这是截图次数之比，不是CPU时间：实测的录制线程CPU时间见 capture_cpu。
+        """
+        grabs = len(self.timestamps)
+        total = grabs + self.skipped_ticks
+        return self.skipped_ticks / total if total else 0.0
 
     def stop(self):
         # 设置录制状态为False，停止录制循环
@@ -119,22 +402,154 @@ RecorderThread 类实现了以下主要功能：
         self.wait()
 
 
+class SaveThread(QtCore.QThread):
+    """
+    在后台线程中完成一次录制的编码和保存，界面线程不会因此卡住。
+
+    1. 录制结束后才编码时（传入 frames），先把帧存储中的帧依次提交给编码流水线；
+    2. 等待流水线写完剩余的帧，把临时文件移动到目标路径，启用性能统计时在旁边导出时间线；
+    3. 每写完一帧通过 progress(已完成帧数, 总帧数) 信号报告进度；
+    4. cancel 可以在界面线程中随时调用：流水线丢弃剩余的帧，临时文件被删除，不会生成目标文件；
+    5. 结束时通过 saveFinished(是否成功, 说明文字) 信号通知界面，并释放帧存储（删除磁盘暂存文件）；
+    6. 传入 size_target（size_target.SizeTarget）时不传 encoder：先在后台用采样帧估计出放得下的设置，
+       再按该设置创建流水线、按抽帧步长挑选帧编码，完成时附上估计值与实际大小的误差。
+    多个 SaveThread 可以同时运行，因此上一次录制还在编码时就可以开始下一次录制。
+    """
+    # 定义信号，用于报告编码进度（已完成帧数, 总帧数）
+    progress = QtCore.pyqtSignal(int, int)
+    # 定义信号，用于通知保存结束（是否成功, 编码统计或错误说明）
+    saveFinished = QtCore.pyqtSignal(bool, str)
+
+    def __init__(self, encoder, filePath, timestamps, end_time, frames=None, instrumentation=None, summary='',
+                 size_target=None):
+        # 调用父类的初始化方法
+        super().__init__()
+        # 编码流水线（目标文件大小模式下为None，估计完成后才创建）
+        self.encoder = encoder
+        # 目标文件路径
+        self.filePath = filePath
+        # 每帧的捕获时间戳和录制结束时间
+        self.timestamps = timestamps
+        self.end_time = end_time
+        # 录制结束后才编码时的帧存储，需要先提交给流水线；边录制边编码时为None
+        self.frames = frames
+        # 分阶段计时，为None时不导出时间线
+        self.instrumentation = instrumentation
+        # 本次录制的帧率统计，完成时与编码统计一起显示
+        self.summary = summary
+        # 是否已请求取消
+        self.cancelled = False
+        # 目标文件大小，为None时直接使用传入的流水线
+        self.size_target = size_target
+        # 目标文件大小模式的估计结果（size_target.SizePlan）
+        self.plan = None
+        # 要编码的帧在帧存储中的序号，为None时编码全部帧
+        self.indices = None
+        # 目标文件大小模式下流水线在估计完成后才创建
+        if encoder is not None:
+            self.setEncoder(encoder)
+
+    def setEncoder(self, encoder):
+        '''函数功能:设置编码流水线,并把它的进度回调转发为信号'''
+        self.encoder = encoder
+        # 在写入线程中调用，信号会排队送到界面线程
+        self.encoder.progress = lambda done: self.progress.emit(done, len(self.timestamps))
+
+    def run(self):
+        try:
+            if self.size_target is not None:
+                # 目标文件大小模式：估计出设置后按抽帧步长挑选帧，再创建正式编码的流水线
+                self.plan = self.size_target.plan(self.frames, self.timestamps, self.end_time,
+                                                  lambda: self.cancelled)
+                self.indices = self.plan.indices(len(self.timestamps))
+                self.timestamps = [self.timestamps[i] for i in self.indices]
+                self.setEncoder(self.size_target.make_encoder(self.plan.settings,
+                                                              os.path.dirname(self.filePath) or None,
+                                                              self.instrumentation))
+                # 创建流水线之前已请求取消时，cancel 没有流水线可以通知
+                if self.cancelled:
+                    self.encoder.cancel()
+            encode_start = time.perf_counter()
+            # 录制结束后才编码时,把保存的帧依次提交给流水线（取消后提交会立即返回）
+            if self.frames is not None:
+                frames = self.frames if self.indices is None else (self.frames[i] for i in self.indices)
+                for frame, timestamp in zip(frames, self.timestamps):
+                    if self.cancelled:
+                        break
+                    self.encoder.submit(frame, timestamp)
+            # 等待剩余帧编码并写入完毕
+            frame_count = self.encoder.finish(self.end_time)
+            if frame_count == 0:
+                ok, message = False, '没有录制到任何帧。'
+            elif self.cancelled:
+                raise EncodingCancelled('编码已取消')
+            else:
+                # 把临时文件移动到目标路径
+                self.encoder.save(self.filePath)
+                # 启用性能统计时,在输出文件旁边导出本次录制的时间线
+                if self.instrumentation is not None:
+                    self.instrumentation.exportTrace(os.path.splitext(self.filePath)[0] + '.trace.json')
+                ok, message = True, self.encoder.summary()
+                # 目标文件大小模式：附上选中的设置和估计误差
+                if self.plan is not None:
+                    message += '，' + self.plan.describe(os.path.getsize(self.filePath),
+                                                       time.perf_counter() - encode_start)
+        except EncodingCancelled:
+            ok, message = False, '已取消保存，未生成文件。'
+        except Exception as e:
+            ok, message = False, f'保存失败：{str(e)}'
+        finally:
+            # 删除未被移动走的临时文件,释放帧存储
+            if self.encoder is not None:
+                self.encoder.discard()
+            if self.frames is not None:
+                self.frames.close()
+        # 通知界面保存结束
+        self.saveFinished.emit(ok, message)
+
+    def cancel(self):
+        '''函数功能:请求取消保存,流水线丢弃剩余的帧,临时文件会被删除'''
+        self.cancelled = True
+        if self.encoder is not None:
+            self.encoder.cancel()
+
+
 class MainWindow(QtWidgets.QWidget):
     def __init__(self):
         # 调用父类QWidget的初始化方法
         super().__init__()
         # 设置窗口标题
         self.setWindowTitle('屏幕录制转GIF v1.1.0')
-        # 设置窗口固定大小为250x250像素
-        self.setFixedSize(250, 250)
+        # 设置窗口固定大小为250x690像素
+        self.setFixedSize(250, 690)
         # 初始化录制区域为None
         self.rect = None
         # 初始化帧列表为空
         self.frames = []
+        # 初始化每帧的捕获时间戳列表为空
+        self.timestamps = []
+        # 初始化录制结束时间为None
+        self.end_time = None
+        # 正在后台编码保存的线程
+        self.saveThreads = []
 
         # 设置默认参数
         self.frame_rate = 10  # 默认帧率为10帧/秒
         self.speed_multiplier = 1.0  # 默认播放速度倍数为1.0倍
+        self.max_duration = 15  # 默认最长录制15秒，0表示不限制
+        self.adaptive = False  # 默认以固定帧率截图
+        self.streaming = True  # 默认边录制边编码
+        self.trim = False  # 默认录制结束后不剪辑，直接保存全部帧
+        self.palette_mode = PALETTE_ADAPTIVE  # 默认每帧单独生成调色板
+        self.dither = DITHER_NONE  # 默认不抖动
+        self.dither_size = DEFAULT_MATRIX_SIZE  # 有序抖动的默认矩阵边长
+        self.processes = DEFAULT_PROCESS_COUNT  # 默认量化进程数，0表示在线程中量化
+        self.memory_budget_mb = DEFAULT_MEMORY_BUDGET >> 20  # 默认帧存储内存上限（MB）
+        self.instrumented = False  # 默认不记录性能统计
+        self.output_format = GifBackend.name  # 默认输出GIF
+        self.output_scale = 100  # 默认输出尺寸为选区尺寸的100%
+        self.max_dimension = 0  # 默认不限制输出的最大边长
+        self.target_kb = 0  # 默认不限制输出文件大小（KB）
 
         # 创建垂直布局 -----------------------------
         self.layout = QtWidgets.QVBoxLayout()
@@ -166,8 +581,19 @@ class MainWindow(QtWidgets.QWidget):
         # 将按钮添加到布局中
         self.layout.addWidget(self.endButton)
 
+        # 创建"取消保存"按钮 ---------------------------
+        self.cancelSaveButton = QtWidgets.QPushButton('取消保存')
+        # 连接按钮点击事件到cancelSaving方法
+        self.cancelSaveButton.clicked.connect(self.cancelSaving)
+        # 没有正在后台保存的录制时禁用
+        self.cancelSaveButton.setEnabled(False)
+        # 将按钮添加到布局中
+        self.layout.addWidget(self.cancelSaveButton)
+
         # 创建状态标签 -----------------------------
         self.statusLabel = QtWidgets.QLabel('请先选择录制范围')
+        # 允许状态文本自动换行，录制统计信息较长
+        self.statusLabel.setWordWrap(True)
         # 将标签添加到布局中
         self.layout.addWidget(self.statusLabel)
 
@@ -176,6 +602,13 @@ class MainWindow(QtWidgets.QWidget):
         # 将标签添加到布局中
         self.layout.addWidget(self.timeLabel)
 
+        # 创建实时性能统计标签（启用性能统计时显示） ----------------------
+        self.statsLabel = QtWidgets.QLabel('')
+        # 允许统计文本自动换行
+        self.statsLabel.setWordWrap(True)
+        # 将标签添加到布局中
+        self.layout.addWidget(self.statsLabel)
+
         # 创建帧率选择的水平布局 ---------------------------------
         frame_rate_layout = QtWidgets.QHBoxLayout()
         # 创建帧率标签
@@ -226,8 +659,232 @@ class MainWindow(QtWidgets.QWidget):
         # 将播放速度倍数布局添加到主布局中
         self.layout.addLayout(speed_multiplier_layout)
 
+        # 创建最长录制时间选择的水平布局 -----------------------------
+        max_duration_layout = QtWidgets.QHBoxLayout()
+        # 创建最长录制时间标签
+        max_duration_label = QtWidgets.QLabel('最长录制 (秒):')
+        # 创建最长录制时间输入框
+        self.max_duration_spinbox = QtWidgets.QSpinBox()
+        # 设置输入框的范围为0-3600秒
+        self.max_duration_spinbox.setRange(0, 3600)
+        # 值为0时显示"不限"
+        self.max_duration_spinbox.setSpecialValueText('不限')
+        # 设置输入框的初始值
+        self.max_duration_spinbox.setValue(self.max_duration)
+        # 连接输入框值变化事件到updateMaxDuration方法
+        self.max_duration_spinbox.valueChanged.connect(self.updateMaxDuration)
+        # 将各个组件添加到最长录制时间布局中
+        max_duration_layout.addWidget(max_duration_label)
+        max_duration_layout.addWidget(self.max_duration_spinbox)
+        # 将最长录制时间布局添加到主布局中
+        self.layout.addLayout(max_duration_layout)
+
+        # 创建"自适应帧率"复选框 -----------------------------
+        self.adaptiveCheckBox = QtWidgets.QCheckBox('自适应帧率（画面静止时降低截图频率）')
+        # 设置复选框的初始状态
+        self.adaptiveCheckBox.setChecked(self.adaptive)
+        # 连接复选框状态变化事件到updateAdaptive方法
+        self.adaptiveCheckBox.toggled.connect(self.updateAdaptive)
+        # 将复选框添加到主布局中
+        self.layout.addWidget(self.adaptiveCheckBox)
+
+        # 创建"边录制边编码"复选框 -----------------------------
+        self.streamingCheckBox = QtWidgets.QCheckBox('边录制边编码（内存占用恒定）')
+        # 设置复选框的初始状态
+        self.streamingCheckBox.setChecked(self.streaming)
+        # 连接复选框状态变化事件到updateStreaming方法
+        self.streamingCheckBox.toggled.connect(self.updateStreaming)
+        # 将复选框添加到主布局中
+        self.layout.addWidget(self.streamingCheckBox)
+
+        # 创建"录制后剪辑"复选框 -----------------------------
+        self.trimCheckBox = QtWidgets.QCheckBox('录制后剪辑首尾（预览时间线）')
+        # 设置复选框的初始状态
+        self.trimCheckBox.setChecked(self.trim)
+        # 剪辑需要保存的帧,选中时录制结束后才编码,提示用户
+        self.trimCheckBox.setToolTip('选中后录制结束才编码：先在时间线上选定起点和终点，只编码选中的一段')
+        # 连接复选框状态变化事件到updateTrim方法
+        self.trimCheckBox.toggled.connect(self.updateTrim)
+        # 将复选框添加到主布局中
+        self.layout.addWidget(self.trimCheckBox)
+
+        # 创建调色板模式选择的水平布局 -----------------------------
+        palette_layout = QtWidgets.QHBoxLayout()
+        # 创建调色板模式标签
+        palette_label = QtWidgets.QLabel('调色板:')
+        # 创建调色板模式下拉框,每一项附带对应的模式名
+        self.paletteComboBox = QtWidgets.QComboBox()
+        self.paletteComboBox.addItem('每帧自适应', PALETTE_ADAPTIVE)
+        self.paletteComboBox.addItem('全局共享', PALETTE_GLOBAL)
+        self.paletteComboBox.addItem('按场景', PALETTE_SCENE)
+        # 连接下拉框选择变化事件到updatePaletteMode方法
+        self.paletteComboBox.currentIndexChanged.connect(self.updatePaletteMode)
+        # 将各个组件添加到调色板模式布局中
+        palette_layout.addWidget(palette_label)
+        palette_layout.addWidget(self.paletteComboBox)
+        # 将调色板模式布局添加到主布局中
+        self.layout.addLayout(palette_layout)
+
+        # 创建抖动方式选择的水平布局 -----------------------------
+        dither_layout = QtWidgets.QHBoxLayout()
+        # 创建抖动方式标签
+        dither_label = QtWidgets.QLabel('抖动:')
+        # 创建抖动方式下拉框,每一项附带对应的抖动方式
+        self.ditherComboBox = QtWidgets.QComboBox()
+        self.ditherComboBox.addItem('不抖动', DITHER_NONE)
+        self.ditherComboBox.addItem('有序', DITHER_ORDERED)
+        self.ditherComboBox.addItem('误差扩散', DITHER_FLOYD_STEINBERG)
+        # 连接下拉框选择变化事件到updateDither方法
+        self.ditherComboBox.currentIndexChanged.connect(self.updateDither)
+        # 创建有序抖动矩阵边长下拉框,只有选择有序抖动时可用
+        self.ditherSizeComboBox = QtWidgets.QComboBox()
+        for size in MATRIX_SIZES:
+            self.ditherSizeComboBox.addItem(f'{size}×{size}', size)
+        self.ditherSizeComboBox.setCurrentIndex(MATRIX_SIZES.index(DEFAULT_MATRIX_SIZE))
+        self.ditherSizeComboBox.setEnabled(False)
+        # 连接下拉框选择变化事件到updateDitherSize方法
+        self.ditherSizeComboBox.currentIndexChanged.connect(self.updateDitherSize)
+        # 将各个组件添加到抖动方式布局中
+        dither_layout.addWidget(dither_label)
+        dither_layout.addWidget(self.ditherComboBox)
+        dither_layout.addWidget(self.ditherSizeComboBox)
+        # 将抖动方式布局添加到主布局中
+        self.layout.addLayout(dither_layout)
+
+        # 创建输出格式选择的水平布局 -----------------------------
+        format_layout = QtWidgets.QHBoxLayout()
+        # 创建输出格式标签
+        format_label = QtWidgets.QLabel('输出格式:')
+        # 创建输出格式下拉框,每一项附带对应的格式名
+        self.formatComboBox = QtWidgets.QComboBox()
+        self.formatComboBox.addItem('GIF', 'gif')
+        self.formatComboBox.addItem('MP4', 'mp4')
+        self.formatComboBox.addItem('WebP', 'webp')
+        self.formatComboBox.addItem('APNG', 'apng')
+        # 连接下拉框选择变化事件到updateOutputFormat方法
+        self.formatComboBox.currentIndexChanged.connect(self.updateOutputFormat)
+        # 将各个组件添加到输出格式布局中
+        format_layout.addWidget(format_label)
+        format_layout.addWidget(self.formatComboBox)
+        # 将输出格式布局添加到主布局中
+        self.layout.addLayout(format_layout)
+
+        # 创建输出缩放比例选择的水平布局 -----------------------------
+        scale_layout = QtWidgets.QHBoxLayout()
+        # 创建输出缩放比例标签
+        scale_label = QtWidgets.QLabel('输出尺寸:')
+        # 创建输出缩放比例下拉框,每一项附带对应的百分比
+        self.scaleComboBox = QtWidgets.QComboBox()
+        for percent in (100, 75, 50, 33, 25):
+            self.scaleComboBox.addItem(f'{percent}%', percent)
+        # 连接下拉框选择变化事件到updateOutputScale方法
+        self.scaleComboBox.currentIndexChanged.connect(self.updateOutputScale)
+        # 将各个组件添加到输出缩放比例布局中
+        scale_layout.addWidget(scale_label)
+        scale_layout.addWidget(self.scaleComboBox)
+        # 将输出缩放比例布局添加到主布局中
+        self.layout.addLayout(scale_layout)
+
+        # 创建最大边长选择的水平布局 -----------------------------
+        max_dimension_layout = QtWidgets.QHBoxLayout()
+        # 创建最大边长标签
+        max_dimension_label = QtWidgets.QLabel('最大边长 (像素):')
+        # 创建最大边长输入框
+        self.max_dimension_spinbox = QtWidgets.QSpinBox()
+        # 设置输入框的范围为0-8192像素,步长64
+        self.max_dimension_spinbox.setRange(0, 8192)
+        self.max_dimension_spinbox.setSingleStep(64)
+        # 值为0时显示"不限"
+        self.max_dimension_spinbox.setSpecialValueText('不限')
+        # 设置输入框的初始值
+        self.max_dimension_spinbox.setValue(self.max_dimension)
+        # 连接输入框值变化事件到updateMaxDimension方法
+        self.max_dimension_spinbox.valueChanged.connect(self.updateMaxDimension)
+        # 将各个组件添加到最大边长布局中
+        max_dimension_layout.addWidget(max_dimension_label)
+        max_dimension_layout.addWidget(self.max_dimension_spinbox)
+        # 将最大边长布局添加到主布局中
+        self.layout.addLayout(max_dimension_layout)
+
+        # 创建目标文件大小选择的水平布局 -----------------------------
+        target_size_layout = QtWidgets.QHBoxLayout()
+        # 创建目标文件大小标签
+        target_size_label = QtWidgets.QLabel('目标大小 (KB):')
+        # 创建目标文件大小输入框
+        self.target_size_spinbox = QtWidgets.QSpinBox()
+        # 设置输入框的范围为0-1048576KB,步长256KB
+        self.target_size_spinbox.setRange(0, 1 << 20)
+        self.target_size_spinbox.setSingleStep(256)
+        # 值为0时显示"不限"
+        self.target_size_spinbox.setSpecialValueText('不限')
+        # 设置输入框的初始值
+        self.target_size_spinbox.setValue(self.target_kb)
+        # 设置目标大小时录制结束后才编码,提示用户
+        self.target_size_spinbox.setToolTip('设置后录制结束才编码：先用采样帧估计，自动选择抽帧、缩放和颜色数（MP4 不支持）')
+        # 连接输入框值变化事件到updateTargetSize方法
+        self.target_size_spinbox.valueChanged.connect(self.updateTargetSize)
+        # 将各个组件添加到目标文件大小布局中
+        target_size_layout.addWidget(target_size_label)
+        target_size_layout.addWidget(self.target_size_spinbox)
+        # 将目标文件大小布局添加到主布局中
+        self.layout.addLayout(target_size_layout)
+
+        # 创建量化进程数选择的水平布局 -----------------------------
+        processes_layout = QtWidgets.QHBoxLayout()
+        # 创建量化进程数标签
+        processes_label = QtWidgets.QLabel('量化进程数:')
+        # 创建量化进程数输入框
+        self.processes_spinbox = QtWidgets.QSpinBox()
+        # 设置输入框的范围为0到CPU核数
+        self.processes_spinbox.setRange(0, os.cpu_count() or 1)
+        # 值为0时显示"不使用"（在线程中量化）
+        self.processes_spinbox.setSpecialValueText('不使用')
+        # 设置输入框的初始值
+        self.processes_spinbox.setValue(self.processes)
+        # 连接输入框值变化事件到updateProcesses方法
+        self.processes_spinbox.valueChanged.connect(self.updateProcesses)
+        # 将各个组件添加到量化进程数布局中
+        processes_layout.addWidget(processes_label)
+        processes_layout.addWidget(self.processes_spinbox)
+        # 将量化进程数布局添加到主布局中
+        self.layout.addLayout(processes_layout)
+
+        # 创建帧存储内存上限选择的水平布局 -----------------------------
+        memory_layout = QtWidgets.QHBoxLayout()
+        # 创建内存上限标签
+        memory_label = QtWidgets.QLabel('内存上限 (MB):')
+        # 创建内存上限输入框
+        self.memory_spinbox = QtWidgets.QSpinBox()
+        # 设置输入框的范围为64MB-64GB,步长64MB
+        self.memory_spinbox.setRange(64, 65536)
+        self.memory_spinbox.setSingleStep(64)
+        # 设置输入框的初始值
+        self.memory_spinbox.setValue(self.memory_budget_mb)
+        # 连接输入框值变化事件到updateMemoryBudget方法
+        self.memory_spinbox.valueChanged.connect(self.updateMemoryBudget)
+        # 将各个组件添加到内存上限布局中
+        memory_layout.addWidget(memory_label)
+        memory_layout.addWidget(self.memory_spinbox)
+        # 将内存上限布局添加到主布局中
+        self.layout.addLayout(memory_layout)
+
+        # 创建"性能统计"复选框 -----------------------------
+        self.instrumentCheckBox = QtWidgets.QCheckBox('性能统计（保存时导出时间线）')
+        # 设置复选框的初始状态
+        self.instrumentCheckBox.setChecked(self.instrumented)
+        # 连接复选框状态变化事件到updateInstrumented方法
+        self.instrumentCheckBox.toggled.connect(self.updateInstrumented)
+        # 将复选框添加到主布局中
+        self.layout.addWidget(self.instrumentCheckBox)
+
         # 初始化录制线程为None
         self.recorderThread = None
+        # 已经处理过（保存或丢弃）的录制线程，结束按钮和 finished 信号不会重复处理同一次录制
+        self.finishedRecorder = None
+        # 初始化编码流水线为None
+        self.encoder = None
+        # 初始化本次录制的分阶段计时为None
+        self.instrumentation = None
 
     def updateFrameRate(self, value):
         '''函数功能:更新帧率设置,并新UI显示'''
@@ -243,6 +900,63 @@ class MainWindow(QtWidgets.QWidget):
         # 更新显示速度倍数的标签文本,保留两位小数
         self.speed_multiplier_value_label.setText(f'{self.speed_multiplier:.2f}')
 
+    def updateMaxDuration(self, value):
+        '''函数功能:更新最长录制时间设置(秒),0表示不限制'''
+        self.max_duration = value
+
+    def updateAdaptive(self, checked):
+        '''函数功能:更新是否按画面变化自适应调整截图频率'''
+        self.adaptive = checked
+
+    def updateStreaming(self, checked):
+        '''函数功能:更新是否边录制边编码'''
+        self.streaming = checked
+
+    def updateTrim(self, checked):
+        '''函数功能:更新录制结束后是否先剪辑再保存'''
+        self.trim = checked
+
+    def updatePaletteMode(self, index):
+        '''函数功能:更新调色板模式'''
+        self.palette_mode = self.paletteComboBox.itemData(index)
+
+    def updateDither(self, index):
+        '''函数功能:更新抖动方式,只有有序抖动时矩阵边长可选'''
+        self.dither = self.ditherComboBox.itemData(index)
+        self.ditherSizeComboBox.setEnabled(self.dither == DITHER_ORDERED)
+
+    def updateDitherSize(self, index):
+        '''函数功能:更新有序抖动的Bayer矩阵边长'''
+        self.dither_size = self.ditherSizeComboBox.itemData(index)
+
+    def updateOutputFormat(self, index):
+        '''函数功能:更新输出格式(边录制边编码时在开始录制前确定,否则也可以在保存对话框中选择)'''
+        self.output_format = self.formatComboBox.itemData(index)
+
+    def updateOutputScale(self, index):
+        '''函数功能:更新输出尺寸相对于选区尺寸的百分比'''
+        self.output_scale = self.scaleComboBox.itemData(index)
+
+    def updateMaxDimension(self, value):
+        '''函数功能:更新输出的最大边长(像素),0表示不限制'''
+        self.max_dimension = value
+
+    def updateTargetSize(self, value):
+        '''函数功能:更新输出文件的目标大小(KB),0表示不限制'''
+        self.target_kb = value
+
+    def updateProcesses(self, value):
+        '''函数功能:更新量化进程数,0表示在线程中量化'''
+        self.processes = value
+
+    def updateMemoryBudget(self, value):
+        '''函数功能:更新帧存储的内存上限(MB)'''
+        self.memory_budget_mb = value
+
+    def updateInstrumented(self, checked):
+        '''函数功能:更新是否记录性能统计'''
+        self.instrumented = checked
+
     def openSelectionWidget(self):
         '''函数功能:打开选择录制区域的窗口'''
         # 隐藏主窗口
@@ -268,12 +982,36 @@ class MainWindow(QtWidgets.QWidget):
     def startRecording(self):
         '''函数功能:开始录制过程,创建并启动录制线程,更新UI状态'''
         if self.rect:
-            # 创建录制线程,传入选择的区域和帧率
-            self.recorderThread = RecorderThread(self.rect, self.frame_rate)
+            # 启用性能统计时为本次录制创建分阶段计时
+            self.instrumentation = None
+            if self.instrumented:
+                from instrumentation import Instrumentation  # 分阶段计时（用到时才导入）
+                self.instrumentation = Instrumentation()
+            # 截图后按输出尺寸设置缩小（录制线程和编码流水线共用同一个缩放器）
+            scaler = FrameScaler(self.output_scale / 100.0, self.max_dimension)
+            # 边录制边编码时按选择的输出格式创建编码流水线,否则帧保存在录制线程的列表中
+            # （剪辑或设置了目标文件大小时,录制结束后需要用保存的帧剪辑、估计设置,不边录制边编码）
+            backend = BACKENDS[self.output_format]
+            streaming = self.streaming and not self.trim and not (self.target_kb and supports_target_size(backend))
+            self.encoder = StreamingEncoder(self.speed_multiplier, palette_mode=self.palette_mode,
+                                            processes=self.processes, instrumentation=self.instrumentation,
+                                            backend=backend,
+                                            backend_options=backend_options(backend, self.frame_rate,
+                                                                            self.speed_multiplier),
+                                            scaler=scaler, frame_pool=FramePool(), dither=self.dither,
+                                            dither_size=self.dither_size) if streaming else None
+            # 创建录制线程,传入选择的区域、帧率、最长录制时间和编码流水线
+            self.recorderThread = RecorderThread(self.rect, self.frame_rate, self.max_duration, self.encoder,
+                                                 self.memory_budget_mb << 20, self.instrumentation, scaler,
+                                                 self.adaptive)
+            # 连接实时性能统计信号到更新统计显示的方法
+            self.recorderThread.statsUpdated.connect(self.updateStats)
             # 连接帧捕获信号到更新状态的方法
             self.recorderThread.frameCaptured.connect(self.updateStatus)
             # 连接录制时间更新信号到更新时间显示的方法
             self.recorderThread.recordingTimeUpdated.connect(self.updateRecordingTime)
+            # 连接录制线程结束信号：达到最长录制时间自行停止或截图出错时同样处理本次录制
+            self.recorderThread.finished.connect(self.onRecorderFinished)
             # 启动录制线程
             self.recorderThread.start()
             # 禁用开始按钮
@@ -288,7 +1026,22 @@ class MainWindow(QtWidgets.QWidget):
     def updateStatus(self, frameCount):
         '''函数功能:更新UI显示的录制状态,包括已捕获的帧数'''
         # 更新状态标签,显示当前捕获的帧数
-        self.statusLabel.setText(f'录制中... 已捕获帧数：{frameCount}')
+        status = f'录制中... 已捕获帧数：{frameCount}'
+        # 帧保存在帧存储中时,同时显示内存占用和磁盘暂存大小
+        if self.encoder is None and self.recorderThread is not None:
+            store = self.recorderThread.frames
+            status += f'\n内存 {store.ram_bytes >> 20}MB，磁盘暂存 {store.spool_bytes >> 20}MB'
+        self.statusLabel.setText(status)
+
+    def updateStats(self, stats):
+        '''函数功能:显示实时性能统计:实际帧率、截图延迟、队列深度和内存占用'''
+        stages, gauges = stats['stages'], stats['gauges']
+        # 截图延迟 = grabWindow + toImage 的平均耗时
+        latency = (stages.get('grab') or 0.0) + (stages.get('to_image') or 0.0)
+        text = f'实际 {stats["fps"]:.1f} f/s，截图 {latency:.1f}ms，内存 {gauges.get("rss_mb", 0)}MB'
+        if 'input_queue' in gauges:
+            text += f'，队列 {gauges["input_queue"]}/{gauges["work_queue"]}/{gauges["result_queue"]}'
+        self.statsLabel.setText(text)
 
     def updateRecordingTime(self, elapsed_time):
         '''函数功能:更新UI显示的录制时间'''
@@ -297,86 +1050,171 @@ class MainWindow(QtWidgets.QWidget):
 
     def endRecording(self):
         """
-        结束录制过程,停止录制线程,保存录制内容,并重置UI
+        结束录制过程,停止录制线程,然后由 finishRecording 在后台保存录制内容并重置UI。
         """
+        recorder = self.recorderThread
         # 检查录制线程是否存在且正在录制
-        if self.recorderThread and self.recorderThread.isRecording:
-            # 停止录制线程
-            self.recorderThread.stop()
-            # 等待线程完全停止
-            self.recorderThread.wait()
-            # 获取录制的帧
-            self.frames = self.recorderThread.frames
-            # 计算总录制时间
-            self.total_recording_time = self.recorderThread.end_time - self.recorderThread.start_time
-            # 保存录制内容
-            self.saveRecording()
-            # 重置UI状态
+        if recorder is not None and recorder.isRecording:
+            # 停止录制线程（等待线程完全停止）
+            recorder.stop()
+        # 录制线程已因达到最长录制时间自行停止时同样保存
+        self.finishRecording(recorder)
+
+    def onRecorderFinished(self):
+        '''函数功能:录制线程结束(结束按钮、达到最长录制时间或截图出错)时处理本次录制'''
+        if self.sender() is self.recorderThread:
+            self.finishRecording(self.recorderThread)
+
+    def finishRecording(self, recorder):
+        """
+        处理已经结束的一次录制，每次录制只处理一次：
+        截图出错时丢弃本次录制并提示，否则获取录制的帧，在后台开始保存并重置UI。
+        """
+        if recorder is None or recorder.isRunning() or recorder is self.finishedRecorder:
+            return
+        self.finishedRecorder = recorder
+        if recorder.error is not None:
+            # 丢弃边录制边编码的流水线和帧存储
+            if self.encoder is not None:
+                abandon_encoder(self.encoder, recorder.end_time)
+                self.encoder = None
+            recorder.frames.close()
             self.resetUI()
+            QtWidgets.QMessageBox.warning(self, '录制失败', f'录制失败：{recorder.error}')
+            return
+        # 获取录制的帧
+        self.frames = recorder.frames
+        # 获取每帧的捕获时间戳和录制结束时间
+        self.timestamps = recorder.timestamps
+        self.end_time = recorder.end_time
+        # 计算总录制时间
+        self.total_recording_time = recorder.end_time - recorder.start_time
+        # 汇总实际帧率与设定帧率、被跳过的采样时刻数
+        summary = (f'录制完成：{len(self.timestamps)}帧，'
+                   f'实际 {recorder.achievedFrameRate():.1f}/{recorder.frame_rate} f/s，'
+                   f'跳过 {recorder.dropped_ticks} 次')
+        # 自适应帧率时显示与固定帧率相比省去的截图次数比例
+        if recorder.motion is not None:
+            summary += f'，自适应帧率省去 {recorder.grabSkipRatio():.0%} 截图'
+        # 在后台保存录制内容
+        saving = self.saveRecording(summary)
+        # 重置UI状态,此时已经可以选择新的区域开始下一次录制
+        self.resetUI()
+        # 在状态标签中显示本次录制的帧率统计
+        self.statusLabel.setText(f'{summary}，后台编码中...' if saving else summary)
 
-    def saveRecording(self):
+    def saveRecording(self, summary=''):
         """
-        保存录制的内容为GIF文件。
-        此函数负责打开文件保存对话框,处理录制的帧,
-        并将它们保存为一个GIF动画文件。
+        保存录制的内容为GIF、MP4、WebP或APNG文件。
+        此函数在界面线程中打开文件保存对话框,然后创建 SaveThread 在后台完成编码和保存,
+        返回是否开始了后台保存。
+        边录制边编码时格式已在开始录制时确定,对话框只提供该格式;
+        否则由对话框中选择的过滤器决定输出格式。
+        选中录制后剪辑时,先打开剪辑时间线(frame_timeline.TrimDialog),只编码选中的一段。
         """
         # 设置文件对话框选项
         options = QtWidgets.QFileDialog.Options()
-        # 打开保存文件对话框,获取保存路径
-        filePath, _ = QtWidgets.QFileDialog.getSaveFileName(self, "保存GIF文件", "", "GIF文件 (*.gif)", options=options)
-
+        # 边录制边编码的流水线交给保存线程
+        encoder, self.encoder = self.encoder, None
+        backend = encoder.backend if encoder is not None else BACKENDS[self.output_format]
+        # 对话框的过滤器：边录制边编码时只有已选择的格式,否则列出全部格式
+        filters = backend.file_filter if encoder is not None else ';;'.join(b.file_filter for b in BACKENDS.values())
+        # 录制结束后才编码时要编码的帧、时间戳和录制结束时间（剪辑后只保留选中的一段）
+        stored, timestamps, end_time = self.frames, self.timestamps, self.end_time
+        filePath = ''
+        trimmed = True
+        if encoder is None and self.trim and len(timestamps) > 1:
+            # 先在剪辑时间线上选定起点和终点,放弃时与取消保存相同
+            from frame_timeline import TrimDialog  # 剪辑时间线（用到时才导入）
+            dialog = TrimDialog(self.frames, timestamps, end_time, self)
+            trimmed = dialog.exec_() == QtWidgets.QDialog.Accepted
+            if trimmed and len(dialog.selection()) < len(timestamps):
+                selection = dialog.selection()
+                stored = FrameRange(self.frames, selection)
+                timestamps = timestamps[selection.start:selection.stop]
+                end_time = dialog.endTime()
+                summary += f'，剪辑保留 {len(selection)}/{len(self.timestamps)} 帧'
+        if trimmed:
+            # 打开保存文件对话框,获取保存路径和选择的过滤器
+            filePath, selectedFilter = QtWidgets.QFileDialog.getSaveFileName(self, "保存录制文件", "", filters,
+                                                                             backend.file_filter, options=options)
         if filePath:
-            # 初始化图像列表
-            images = []
-            # 获取总帧数
-            total_frames = len(self.frames)
-
-            # 检查是否有录制到帧
-            if total_frames == 0:
-                QtWidgets.QMessageBox.warning(self, '警告', '没有录制到任何帧。')
-                return
-
-            # 计算原始每帧持续时间
-            original_duration_per_frame = self.total_recording_time / total_frames
-            # 根据播放速度倍数计算GIF中每帧的持续时间（毫秒）
-            duration_per_frame = (original_duration_per_frame / self.speed_multiplier) * 1000
-
-            # 遍历所有录制的帧
-            for frame in self.frames:
-                # 将 QImage 转换为 RGBA8888 格式
-                frame = frame.convertToFormat(QtGui.QImage.Format_RGBA8888)
-                # 获取图像宽度和高度
-                width = frame.width()
-                height = frame.height()
-                # 获取图像数据指针
-                ptr = frame.bits()
-                # 设置指针大小为图像字节数
-                ptr.setsize(frame.byteCount())
-                # 将图像数据转换为NumPy数组
-                arr = np.array(ptr).reshape(height, width, 4)
-
-                # 将NumPy数组转换为PIL图像
-                img = Image.fromarray(arr, 'RGBA').convert('P', palette=Image.ADAPTIVE)
-                # 将PIL图像添加到图像列表
-                images.append(img)
-
-            # 尝试保存GIF文件
-            try:
-                # 使用第一帧作为基础,保存所有帧为GIF
-                images[0].save(
-                    filePath,
-                    save_all=True,  # 保存所有帧
-                    append_images=images[1:],  # 添加后续帧
-                    duration=duration_per_frame,  # 设置帧持续时间
-                    loop=0,  # 设置循环次数,0表示无限循环
-                    optimize=True  # 优化GIF文件大小
-                )
-            except Exception as e:
-                # 如果保存失败,显示错误消息
-                QtWidgets.QMessageBox.warning(self, '保存失败', f'GIF保存失败：{str(e)}')
+            # 按选择的过滤器确定输出格式,文件名没有对应的扩展名时补上
+            backend = backend_for_filter(selectedFilter, backend) if encoder is None else backend
+            if backend_for_path(filePath, None) is not backend:
+                filePath += backend.extension
+
+        if not filePath:
+            # 用户取消保存:丢弃流水线和帧存储
+            if encoder is not None:
+                abandon_encoder(encoder, self.end_time)
+            self.frames.close()
+            # 显示取消消息
+            QtWidgets.QMessageBox.warning(self, '取消', '未选择保存路径，录制已取消。' if trimmed else '已放弃录制。')
+            return False
+
+        # 录制结束后才编码时,为帧存储中的帧创建编码流水线,由保存线程提交
+        frames = None
+        size_target = None
+        if encoder is None and self.target_kb and supports_target_size(backend):
+            # 设置了目标文件大小：由保存线程在后台估计出设置后再创建流水线（MP4 不支持，按原设置编码）
+            frames = stored
+            size_target = stored_frames_size_target(frames, self.target_kb << 10, self.recorderThread.frame_rate,
+                                                    self.speed_multiplier, self.palette_mode, self.processes,
+                                                    backend, self.dither, self.dither_size)
+        elif encoder is None:
+            frames = stored
+            encoder = stored_frames_encoder(frames, self.speed_multiplier, self.palette_mode, self.processes,
+                                            directory=os.path.dirname(filePath) or None,
+                                            instrumentation=self.instrumentation, backend=backend,
+                                            options=backend_options(backend, self.recorderThread.frame_rate,
+                                                                    self.speed_multiplier),
+                                            dither=self.dither, dither_size=self.dither_size)
+        # 创建并启动保存线程
+        saveThread = SaveThread(encoder, filePath, timestamps, end_time, frames,
+                                self.instrumentation, summary, size_target)
+        # 连接进度信号和保存结束信号
+        saveThread.progress.connect(self.updateSaveProgress)
+        saveThread.saveFinished.connect(self.onSaveFinished)
+        self.saveThreads.append(saveThread)
+        saveThread.start()
+        # 启用取消保存按钮
+        self.cancelSaveButton.setEnabled(True)
+        return True
+
+    def isRecording(self):
+        '''函数功能:返回当前是否正在录制'''
+        return self.recorderThread is not None and self.recorderThread.isRecording
+
+    def updateSaveProgress(self, done, total):
+        '''函数功能:在状态标签中显示后台编码进度(正在录制时不覆盖录制状态)'''
+        if not self.isRecording():
+            self.statusLabel.setText(f'后台编码中：{done}/{total} 帧')
+
+    def onSaveFinished(self, ok, message):
+        '''函数功能:后台保存结束时显示结果,并移除对应的保存线程'''
+        saveThread = self.sender()
+        # 等待线程完全结束后再移除
+        saveThread.wait()
+        self.saveThreads.remove(saveThread)
+        # 没有其他正在保存的录制时禁用取消保存按钮
+        self.cancelSaveButton.setEnabled(bool(self.saveThreads))
+        if ok:
+            # 显示本次录制的帧率统计和编码统计（正在录制时不覆盖录制状态）
+            if not self.isRecording():
+                self.statusLabel.setText(f'{saveThread.summary}，{message}' if saveThread.summary else message)
+        elif saveThread.cancelled:
+            if not self.isRecording():
+                self.statusLabel.setText(message)
         else:
-            # 如果用户取消保存,显示取消消息
-            QtWidgets.QMessageBox.warning(self, '取消', '未选择保存路径，录制已取消。')
+            # 保存失败或没有录制到帧时显示警告
+            QtWidgets.QMessageBox.warning(self, '保存失败', message)
+
+    def cancelSaving(self):
+        '''函数功能:取消所有正在后台进行的保存,删除未完成的文件'''
+        for saveThread in self.saveThreads:
+            saveThread.cancel()
+        self.cancelSaveButton.setEnabled(False)
 
     def resetUI(self):
         """
@@ -394,8 +1232,12 @@ class MainWindow(QtWidgets.QWidget):
         self.statusLabel.setText('请先选择录制范围')
         # 重置录制时间标签,显示初始时间为0秒
         self.timeLabel.setText('录制时间：0秒')
-        # 清空已录制的帧列表
+        # 清空实时性能统计
+        self.statsLabel.setText('')
+        self.instrumentation = None
+        # 清空已录制的帧列表和时间戳（帧存储由保存线程在保存结束后释放）
         self.frames = []
+        self.timestamps = []
 
     def closeEvent(self, event):
         """
@@ -403,12 +1245,26 @@ class MainWindow(QtWidgets.QWidget):
         此函数在用户尝试关闭应用程序窗口时被调用,
         确保在关闭窗口前停止所有正在进行的录制线程。
         """
+        # 关闭时丢弃未保存的录制，录制线程随后发出的 finished 信号不再打开保存对话框
+        self.finishedRecorder = self.recorderThread
         # 检查是否存在录制线程且正在运行
         if self.recorderThread and self.recorderThread.isRunning():
             # 停止录制线程
             self.recorderThread.stop()
             # 等待录制线程完全停止
             self.recorderThread.wait()
+        # 如果还有未保存的编码流水线,取消它并删除临时文件
+        if self.encoder is not None:
+            abandon_encoder(self.encoder, self.recorderThread.end_time)
+            self.encoder = None
+        # 取消正在后台进行的保存,等待保存线程删除未完成的文件后结束
+        for saveThread in self.saveThreads:
+            saveThread.cancel()
+        for saveThread in self.saveThreads:
+            saveThread.wait()
+        # 释放帧存储,删除磁盘暂存文件
+        if self.recorderThread is not None:
+            self.recorderThread.frames.close()
         # 接受关闭事件,允许窗口关闭
         event.accept()
 
@@ -487,7 +1343,235 @@ class SelectionWidget(QtWidgets.QWidget):
         self.close()
 
 
+def parse_rect(text):
+    '''函数功能:把命令行参数"x,y,w,h"解析为QRect'''
+    try:
+        x, y, width, height = (int(part) for part in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'录制区域格式应为 x,y,w,h：{text}')
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f'录制区域的宽高必须大于0：{text}')
+    return QtCore.QRect(x, y, width, height)
+
+
+def positive_float(text):
+    '''函数功能:解析大于0的浮点数参数'''
+    value = float(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f'必须大于0：{text}')
+    return value
+
+
+def parse_byte_size(text):
+    '''函数功能:解析字节数参数,可带 K/M/G 后缀(按1024进位),如 "500K"、"2M"'''
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    number, unit = (text[:-1], units[text[-1].upper()]) if text and text[-1].upper() in units else (text, 1)
+    try:
+        value = round(float(number) * unit)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'大小格式应为字节数或带 K/M/G 后缀：{text}')
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f'必须大于0：{text}')
+    return value
+
+
+def build_arg_parser():
+    '''函数功能:创建命令行参数解析器'''
+    parser = argparse.ArgumentParser(prog='main.py', description='屏幕录制转GIF/MP4/WebP/APNG，不带子命令时启动图形界面')
+    commands = parser.add_subparsers(dest='command', required=True)
+    # record 子命令：不显示任何窗口，录制指定区域并保存
+    record = commands.add_parser('record', help='无界面录制指定区域并保存，结束后输出JSON统计信息')
+    record.add_argument('--rect', type=parse_rect, required=True, help='录制区域 x,y,w,h（全局坐标）')
+    record.add_argument('--fps', type=positive_float, default=10.0, help='帧率，默认10')
+    record.add_argument('--duration', type=positive_float, required=True, help='录制时长（秒）')
+    record.add_argument('--adaptive', action='store_true',
+                        help='自适应帧率：画面静止时降到 --idle-fps 轮询，画面变化时恢复到 --fps')
+    record.add_argument('--idle-fps', type=positive_float, default=2.0, help='自适应帧率时画面静止的截图帧率，默认2')
+    record.add_argument('--speed', type=positive_float, default=1.0, help='播放速度倍数，默认1.0')
+    record.add_argument('--out', required=True, help='输出文件路径')
+    record.add_argument('--format', choices=list(BACKENDS), default=None,
+                        help='输出格式，默认按 --out 的扩展名选择（无法识别时为gif）')
+    record.add_argument('--scale', type=positive_float, default=1.0,
+                        help='输出尺寸相对于录制区域（逻辑像素）的比例，默认1.0，只缩小不放大')
+    record.add_argument('--max-size', type=int, default=0,
+                        help='输出的最大边长（像素），0表示不限制')
+    record.add_argument('--palette', choices=[PALETTE_ADAPTIVE, PALETTE_GLOBAL, PALETTE_SCENE],
+                        default=PALETTE_ADAPTIVE, help='调色板模式，默认每帧自适应')
+    record.add_argument('--dither', choices=DITHER_MODES, default=DITHER_NONE,
+                        help='映射到调色板前的抖动方式：none 不抖动（默认），ordered 为帧间稳定的 Bayer 有序抖动，'
+                             'floyd-steinberg 为 Pillow 的误差扩散')
+    record.add_argument('--dither-size', type=int, choices=MATRIX_SIZES, default=DEFAULT_MATRIX_SIZE,
+                        help='有序抖动的 Bayer 矩阵边长，默认4')
+    record.add_argument('--target-size', type=parse_byte_size, default=None,
+                        help='输出文件的目标大小（如 2M、500K）：录制结束后用采样帧估计，自动选择抽帧步长、'
+                             '缩放比例和颜色数，只编码一次；隐含 --no-streaming，不支持 mp4')
+    record.add_argument('--processes', type=int, default=DEFAULT_PROCESS_COUNT,
+                        help='量化进程数，默认0表示在线程中量化；进程池不一定更快，启用前请用 benchmark.py --processes N 对比')
+    record.add_argument('--no-streaming', dest='streaming', action='store_false',
+                        help='录制结束后再编码（帧先保存在带内存上限的帧存储中）')
+    record.add_argument('--no-frame-pool', dest='frame_pool', action='store_false',
+                        help='边录制边编码时不使用可复用的帧缓冲池（每帧由 toImage() 分配新的QImage）')
+    record.add_argument('--memory-budget', type=int, default=DEFAULT_MEMORY_BUDGET >> 20,
+                        help='录制结束后再编码时帧存储的内存上限（MB）')
+    record.add_argument('--trace', default=None,
+                        help='记录分阶段耗时，把 Chrome trace 时间线导出到该文件，并在JSON中输出各阶段统计')
+    record.add_argument('--platform', default=None,
+                        help='Qt平台插件（如 xcb），默认沿用 QT_QPA_PLATFORM；截图需要真实或虚拟的显示器，'
+                             '没有显示器时请在 Xvfb 下运行（offscreen 平台无法截图）')
+    # daemon 子命令：常驻后台，通过本地套接字接受 recorderctl.py 的命令
+    daemon = commands.add_parser('daemon', help='常驻录制守护进程，由 recorderctl.py 发送 start/stop/status/shutdown 命令')
+    daemon.add_argument('--socket', default=None, help='本地套接字路径（Windows 上为命名管道），默认按用户区分')
+    daemon.add_argument('--processes', type=int, default=DEFAULT_PROCESS_COUNT,
+                        help='量化进程数（启动时预热），默认0表示在线程中量化；启用前请用 benchmark.py --processes N 对比')
+    daemon.add_argument('--platform', default=None,
+                        help='Qt平台插件（如 xcb），默认沿用 QT_QPA_PLATFORM；截图需要真实或虚拟的显示器，'
+                             '没有显示器时请在 Xvfb 下运行（offscreen 平台无法截图）')
+    return parser
+
+
+def headless_application(platform=None):
+    '''函数功能:为不显示窗口的命令行模式选择Qt平台插件并返回QApplication(已存在时直接返回),Linux上没有显示器时报错'''
+    # 选择Qt平台插件：命令行指定优先，其次是环境变量
+    if platform:
+        os.environ['QT_QPA_PLATFORM'] = platform
+    elif (sys.platform.startswith('linux') and 'QT_QPA_PLATFORM' not in os.environ
+          and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY')):
+        # offscreen 平台上 grabWindow 只返回空图像，不能代替显示器：立即报错，而不是录制到第一帧才失败
+        raise RuntimeError('没有显示器：截图需要真实或虚拟的 X 服务器，请在 Xvfb 下运行（如 xvfb-run python main.py ...）')
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+
+
+def record_command(args):
+    """
+    无界面录制：复用 RecorderThread 和编码流水线，不创建任何窗口。
+    录制 args.duration 秒后编码并保存到 args.out，向标准输出打印一行JSON统计信息；
+    成功返回0，失败返回1（JSON中带 error 字段）。
+    """
+    directory = os.path.dirname(os.path.abspath(args.out))
+    result = {'output': os.path.abspath(args.out)}
+    encoder = None
+    recorder = None
+    # 目标文件大小模式的估计结果
+    plan = None
+    # 指定 --trace 时记录分阶段耗时
+    instrumentation = None
+    if args.trace:
+        from instrumentation import Instrumentation  # 分阶段计时（用到时才导入）
+        instrumentation = Instrumentation()
+    # 输出格式：--format 优先，否则按输出文件的扩展名选择
+    backend = BACKENDS[args.format] if args.format else backend_for_path(args.out)
+    options = backend_options(backend, args.fps, args.speed)
+    # 截图后按输出尺寸缩小
+    scaler = FrameScaler(args.scale, args.max_size)
+    result['format'] = backend.name
+    try:
+        # 截图需要 QApplication（用于获取屏幕），但不进入事件循环；函数返回前需保持其存活
+        app = headless_application(args.platform)
+        # 目标文件大小模式需要后端报告已写入的字节数，录制前就检查
+        if args.target_size and not supports_target_size(backend):
+            raise ValueError(f'{backend.name} 格式不支持目标文件大小')
+        # 边录制边编码时先创建编码流水线,临时文件放在目标目录中（指定目标大小时录制结束后才编码）
+        if args.streaming and not args.target_size:
+            encoder = StreamingEncoder(args.speed, directory=directory, palette_mode=args.palette,
+                                       processes=args.processes, instrumentation=instrumentation,
+                                       backend=backend, backend_options=options, scaler=scaler,
+                                       frame_pool=FramePool() if args.frame_pool else None,
+                                       dither=args.dither, dither_size=args.dither_size)
+        # 在后台线程中录制,时长达到 duration 后自动结束
+        recorder = RecorderThread(args.rect, args.fps, args.duration, encoder, args.memory_budget << 20,
+                                  instrumentation, scaler, args.adaptive, args.idle_fps)
+        recorder.start()
+        recorder.wait()
+        # 截图出错时录制提前结束：丢弃已编码的部分，报告错误
+        if recorder.error is not None:
+            if encoder is not None:
+                abandon_encoder(encoder, recorder.end_time)
+            raise RuntimeError(f'录制失败：{recorder.error}')
+        result.update({
+            'frames': len(recorder.timestamps),
+            'target_fps': args.fps,
+            'achieved_fps': round(recorder.achievedFrameRate(), 3),
+            'dropped_ticks': recorder.dropped_ticks,
+            'capture_cpu_seconds': round(recorder.capture_cpu, 3),
+        })
+        # 自适应帧率时输出低频轮询次数和与固定帧率相比省去的截图次数比例
+        if args.adaptive:
+            result['idle_polls'] = recorder.idle_polls
+            result['grab_skip_ratio'] = round(recorder.grabSkipRatio(), 3)
+        # 编码耗时：从录制结束到文件写完为止
+        encode_start = time.perf_counter()
+        if encoder is None and args.target_size:
+            # 目标文件大小：先用采样帧估计设置,再按抽帧步长把挑选的帧交给按该设置创建的流水线
+            size_target = stored_frames_size_target(recorder.frames, args.target_size, args.fps, args.speed,
+                                                    args.palette, args.processes, backend, args.dither,
+                                                    args.dither_size)
+            plan = size_target.plan(recorder.frames, recorder.timestamps, recorder.end_time)
+            encoder = size_target.make_encoder(plan.settings, directory, instrumentation)
+            for index in plan.indices(len(recorder.timestamps)):
+                encoder.submit(recorder.frames[index], recorder.timestamps[index])
+        elif encoder is None:
+            encoder = encode_stored_frames(recorder.frames, recorder.timestamps, args.speed, args.palette,
+                                           args.processes, directory=directory, instrumentation=instrumentation,
+                                           backend=backend, options=options, dither=args.dither,
+                                           dither_size=args.dither_size)
+        frame_count = encoder.finish(recorder.end_time)
+        if frame_count == 0:
+            raise RuntimeError('没有录制到任何帧')
+        encoder.save(args.out)
+        result.update({
+            'size': list(encoder.canvas_size),
+            'encoded_frames': encoder.differ.frames_total - encoder.differ.frames_merged,
+            'encode_seconds': round(time.perf_counter() - encode_start, 3),
+            'output_bytes': os.path.getsize(args.out),
+            'summary': encoder.summary(),
+        })
+        # 目标文件大小模式：选中的设置、估计值及其误差、估计耗时和估计过的候选
+        if plan is not None:
+            step, scale, colors = plan.settings
+            result['target_size'] = {
+                'target_bytes': plan.target_bytes,
+                'step': step,
+                'scale': scale,
+                'colors': colors,
+                'estimated_bytes': plan.estimate,
+                'estimate_error': round(plan.error(result['output_bytes']), 4),
+                'fits': plan.fits,
+                'estimate_seconds': round(plan.seconds, 3),
+                'candidates': [dict(zip(('step', 'scale', 'colors'), settings), estimated_bytes=value)
+                               for settings, value in plan.estimates.items()],
+            }
+        # 帧缓冲池的槽数、分配次数和等待空闲槽的次数
+        if encoder.frame_pool is not None:
+            result['frame_pool'] = encoder.frame_pool.stats()
+        # 导出时间线,并附上各阶段的耗时统计
+        if instrumentation is not None:
+            instrumentation.exportTrace(args.trace)
+            result['stages'] = {stage: {key: value for key, value in stats.items() if key != 'histogram'}
+                                for stage, stats in instrumentation.snapshot()['stages'].items()}
+        exit_code = 0
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+        exit_code = 1
+    finally:
+        # 删除未被移动走的临时文件和磁盘暂存文件
+        if encoder is not None:
+            encoder.discard()
+        if recorder is not None:
+            recorder.frames.close()
+    print(json.dumps(result, ensure_ascii=False))
+    return exit_code
+
+
 if __name__ == '__main__':
+    # 带子命令（如 record、daemon）时以命令行模式运行,不显示任何窗口
+    if len(sys.argv) > 1 and not sys.argv[1].startswith('-'):
+        cli_args = build_arg_parser().parse_args()
+        if cli_args.command == 'daemon':
+            # 守护进程模式才需要 QtNetwork 等模块,图形界面和 record 不导入
+            import recorder_daemon
+            sys.exit(recorder_daemon.serve(cli_args.socket, cli_args.processes, cli_args.platform))
+        sys.exit(record_command(cli_args))
+
     # 创建 QApplication 实例
     # QApplication 管理图形用户界面应用程序的控制流和主要设置
     app = QtWidgets.QApplication(sys.argv)
@@ -0,0 +1,193 @@
+# 导入必要的模块
+import numpy as np  # 用于向量化的查表量化
+from PIL import Image  # 用于生成调色板和构建查找表
+
+'''
+共享调色板与查表量化。
+
+逐帧使用 convert('P', palette=Image.ADAPTIVE) 时，每一帧都要重新生成一次调色板，
+既慢又会让相邻帧的颜色来回跳动（调色板闪烁）。这里提供另一种做法：
+  1. build_palette：从若干采样帧中一次性生成一个调色板；
+  2. PaletteMapper：预先计算 RGB 立方体（每通道取高 bits 位）→ 调色板索引 的查找表，
+     之后每一帧只需要一次 NumPy 花式索引即可完成量化。
+边录制边编码时看不到之后的帧，共享调色板只能先从已经到达的帧生成：
+PaletteSampler 按步长保留已到达的帧作为采样，PaletteMapper.distortion 在稀疏网格上检查当前帧
+有多少像素被映射到相差很远的颜色，超过阈值时由流水线用采样帧和当前帧重新生成调色板，
+中途才出现的颜色不会一直被映射到错误的颜色上。
+'''
+
+# 调色板模式：每帧单独生成调色板（原有行为）
+PALETTE_ADAPTIVE = 'adaptive'
+# 调色板模式：整段录制共享一个调色板
+PALETTE_GLOBAL = 'global'
+# 调色板模式：画面大幅变化（场景切换）时重新生成调色板
+PALETTE_SCENE = 'scene'
+
+# 每帧最多使用的颜色数：GIF的256个索引中留一个给帧间透明优化（gif_writer）使用的透明色
+MAX_FRAME_COLORS = 255
+# 生成调色板时最多使用的采样像素数，避免大画面采样过慢
+MAX_SAMPLE_PIXELS = 1 << 20
+# 颜色分布的变化（直方图距离，0~1）达到该值时视为场景切换
+SCENE_CHANGE_DISTANCE = 0.5
+# 检查映射失真时稀疏网格的最小间隔（像素）和最多检查的像素数
+DISTORTION_STEP = 4
+MAX_DISTORTION_PIXELS = 1 << 15
+# 与映射到的调色板颜色相差超过该值（任一通道，0~255）的像素视为失真
+MAX_CHANNEL_ERROR = 48
+# 失真像素的比例超过该值时重新生成共享调色板
+MAX_DISTORTED_SHARE = 0.002
+# 共享调色板最多保留的采样帧数，以及采样帧的缩小步长（隔行隔列）
+PALETTE_SAMPLE_COUNT = 8
+PALETTE_SAMPLE_STEP = 2
+
+
+def sample_frames(frames, count=8):
+    '''函数功能:按固定步长从帧序列中均匀挑选最多count帧,用于生成全局调色板'''
+    if len(frames) <= count:
+        return list(frames)
+    # 均匀分布的帧序号，包含首帧和末帧
+    indices = np.linspace(0, len(frames) - 1, count).round().astype(int)
+    return [frames[i] for i in indices]
+
+
+def color_histogram(arr, step=4):
+    """
+    计算一帧的粗略颜色分布：每隔 step 个像素取样，每通道取高3位共512个格子，
+    返回归一化的直方图，用于廉价地判断画面的颜色是否发生了大幅变化。
+    """
+    # 按固定步长抽样像素
+    sample = arr[::step, ::step]
+    # 每通道取高3位，拼成 0~511 的格子序号（帧为 B,G,R,X 排列）
+    r = (sample[..., 2] >> 5).astype(np.uint16)
+    g = (sample[..., 1] >> 5).astype(np.uint16)
+    b = (sample[..., 0] >> 5).astype(np.uint16)
+    hist = np.bincount(((r << 6) | (g << 3) | b).reshape(-1), minlength=512).astype(np.float64)
+    return hist / max(hist.sum(), 1.0)
+
+
+def scene_distance(hist_a, hist_b):
+    '''函数功能:返回两个颜色直方图之间的距离(0表示相同,1表示完全不重叠)'''
+    return 0.5 * np.abs(hist_a - hist_b).sum()
+
+
+def build_palette(samples, colors=256):
+    """
+    从采样帧（BGRX帧数组列表）生成调色板。
+    返回长度为 768 的整数列表（256个RGB颜色），不足256色时用最后一个颜色补齐。
+    """
+    # 把所有采样帧的像素按 R,G,B 顺序拼成一列（去掉 X 通道）
+    pixels = np.concatenate([sample[..., 2::-1].reshape(-1, 3) for sample in samples])
+    # 像素过多时等间隔抽样
+    step = max(1, len(pixels) // MAX_SAMPLE_PIXELS)
+    pixels = pixels[::step]
+    # 拼成一张宽1024的图像（单行图像过宽时部分Pillow操作效率很低）
+    width = min(1024, len(pixels))
+    pixels = pixels[:len(pixels) // width * width]
+    image = Image.fromarray(np.ascontiguousarray(pixels.reshape(-1, width, 3)), 'RGB')
+    # 快速八叉树生成调色板（与对RGBA帧使用 Image.ADAPTIVE 时相同的算法）
+    palette = image.quantize(colors, method=Image.Quantize.FASTOCTREE).getpalette()[:colors * 3]
+    # 补齐到256色，保证查表得到的索引都有对应颜色
+    return palette + palette[-3:] * (256 - len(palette) // 3)
+
+
+class PaletteMapper:
+    """
+    用预先计算的查找表把RGB像素映射到固定调色板。
+
+    查找表覆盖每通道高 bits 位组成的 RGB 立方体（bits=6 时共 262144 个格子），
+    每个格子取其中心颜色在调色板中的最近色。格子序号为 b | g << bits | r << 2*bits，
+    正好可以直接从 B,G,R,X 排列的 32 位像素字（小端）中移位取出。查找表只在创建时计算一次，
+    之后量化一帧只需要几次位运算和一次花式索引。
+    """
+
+    def __init__(self, palette, bits=6):
+        # 调色板（长度768的整数列表）
+        self.palette = palette
+        # 每个通道保留的位数
+        self.bits = bits
+        # 每个通道需要右移的位数
+        self.shift = 8 - bits
+        # 每个格子的中心值
+        levels = (np.arange(1 << bits, dtype=np.uint16) << self.shift) + ((1 << self.shift) >> 1)
+        # 按格子序号 b | g << bits | r << 2*bits 的顺序展开整个立方体，共 (2**bits)**3 个颜色
+        r, g, b = np.meshgrid(levels, levels, levels, indexing='ij')
+        cube = np.stack([r, g, b], axis=-1).astype(np.uint8).reshape(-1, 1 << bits, 3)
+        # 借助 Pillow 在C层把立方体中的每个颜色映射到调色板中的最近色（不抖动）
+        palette_image = Image.new('P', (1, 1))
+        palette_image.putpalette(palette)
+        # 保留调色板图像，误差扩散抖动时交给 Pillow 映射
+        self.palette_image = palette_image
+        mapped = Image.fromarray(cube, 'RGB').quantize(palette=palette_image, dither=Image.Dither.NONE)
+        # 调色板中重复的颜色（不足256色时补齐的部分）统一映射到第一次出现的索引，
+        # 补齐的索引从不出现在帧中，可以作为透明色
+        colors = np.array(palette, np.uint8).reshape(-1, 3)
+        _, first, inverse = np.unique(colors, axis=0, return_index=True, return_inverse=True)
+        # 查找表：立方体格子序号 → 调色板索引
+        self.lut = first[inverse.reshape(-1)].astype(np.uint8)[np.asarray(mapped).reshape(-1)]
+        # 调色板颜色按 B,G,R 排列，与帧的通道顺序相同，用于计算映射失真
+        self.colors = colors[:, ::-1].astype(np.int16)
+
+    def quantize(self, arr):
+        '''函数功能:把BGRX帧(可以是带行跨度的视图)映射为使用本调色板的P模式PIL图像'''
+        image = Image.fromarray(self.indices(arr), 'P')
+        image.putpalette(self.palette)
+        return image
+
+    def indices(self, arr):
+        '''函数功能:把BGRX帧(可以是带行跨度的视图)映射为调色板索引数组(uint8)'''
+        bits, mask = self.bits, (1 << self.bits) - 1
+        # 把每个像素看作一个32位整数（小端：B在最低字节）
+        words = arr.view(np.uint32)[..., 0]
+        # 取出 B 的高 bits 位作为格子序号的最低 bits 位
+        index = words >> self.shift
+        index &= mask
+        # 取出 G 的高 bits 位放到中间，R 的高 bits 位放到最高位（原地运算，只分配一个临时数组）
+        part = words >> (8 + self.shift - bits)
+        part &= mask << bits
+        index |= part
+        np.right_shift(words, 16 + self.shift - 2 * bits, out=part)
+        part &= mask << (2 * bits)
+        index |= part
+        # 一次查表得到整帧的调色板索引
+        return np.take(self.lut, index)
+
+    def distortion(self, arr):
+        '''函数功能:返回稀疏网格上映射到的颜色与原色相差超过MAX_CHANNEL_ERROR的像素比例(0~1)'''
+        # 网格间隔至少为 DISTORTION_STEP，大画面上加大间隔，使检查的像素不超过 MAX_DISTORTION_PIXELS
+        step = max(DISTORTION_STEP, int(np.ceil(np.sqrt(arr.shape[0] * arr.shape[1] / MAX_DISTORTION_PIXELS))))
+        sample = np.ascontiguousarray(arr[::step, ::step])
+        mapped = self.colors[self.indices(sample)]
+        error = np.abs(sample[..., :3].astype(np.int16) - mapped).max(axis=-1)
+        return np.count_nonzero(error > MAX_CHANNEL_ERROR) / error.size
+
+
+class PaletteSampler:
+    """
+    边录制边编码时为共享调色板收集采样帧：每 stride 帧保留一帧隔行隔列缩小后的副本，
+    超过 count 帧时隔一个丢弃一个并把步长加倍，采样始终均匀覆盖自上次 reset 以来的所有帧，内存占用固定。
+    """
+
+    def __init__(self, count=PALETTE_SAMPLE_COUNT, step=PALETTE_SAMPLE_STEP):
+        # 最多保留的采样帧数
+        self.count = count
+        # 采样帧的缩小步长
+        self.step = step
+        self.reset()
+
+    def reset(self):
+        '''函数功能:丢弃所有采样帧(如场景切换时),重新从步长1开始采样'''
+        # 保留的采样帧
+        self.frames = []
+        # 采样步长和自上次 reset 以来见过的帧数
+        self.stride = 1
+        self.seen = 0
+
+    def add(self, arr):
+        '''函数功能:见到一帧BGRX帧数组,落在采样步长上时保留它的缩小副本'''
+        if self.seen % self.stride == 0:
+            self.frames.append(arr[::self.step, ::self.step].copy())
+            # 超出数量时保留偶数位置的采样，步长加倍，之后的采样仍与它们对齐
+            if len(self.frames) > self.count:
+                self.frames = self.frames[::2]
+                self.stride *= 2
+        self.seen += 1
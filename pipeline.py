@@ -0,0 +1,611 @@
+# 导入必要的模块
+import multiprocessing  # 用于选择子进程的启动方式
+import os  # 用于删除临时文件和获取CPU核数
+import queue  # 提供线程安全的有界队列，连接流水线的各个阶段
+import shutil  # 用于把临时文件移动（重命名）到最终保存路径
+import tempfile  # 用于创建编码过程中的临时GIF文件
+import threading  # 用于创建转换/量化线程和写入线程
+import time  # 用于统计量化耗时和分阶段计时
+import numpy as np  # 用于图像数据的处理和操作
+from PIL import Image  # 用于颜色量化
+from backends import GifBackend  # 输出后端（GIF/MP4/WebP/APNG）
+from dither import DEFAULT_MATRIX_SIZE, DITHER_FLOYD_STEINBERG, DITHER_NONE, ordered_dither  # 量化前的抖动
+from frame_convert import frame_to_image, qimage_to_frame  # 零拷贝帧转换
+from frame_diff import FrameDiffer  # 相邻帧差异检测
+from palette import (MAX_DISTORTED_SHARE, MAX_FRAME_COLORS, PALETTE_ADAPTIVE, PALETTE_GLOBAL, PALETTE_SAMPLE_STEP,
+                     SCENE_CHANGE_DISTANCE, PaletteMapper, PaletteSampler, build_palette, color_histogram,
+                     scene_distance)  # 共享调色板
+
+'''
+录制帧的编码流水线。
+
+录制线程（生产者）把截到的 QImage 放入有界队列，差异线程把它们转换为数组并与上一帧比较
+（丢弃重复帧、裁剪到变化区域），若干量化线程把结果转换为调色板图像，
+写入线程按原始顺序把结果逐帧追加到临时GIF文件中。
+队列有界，所以无论录制多久，内存中同时存在的帧数都是固定的；
+停止录制时只需要处理队列中剩余的几帧并把临时文件重命名为目标文件。
+
+量化可以放到进程池中执行以利用多个CPU核：帧数据通过共享内存以原始像素字节传给子进程，
+子进程把调色板索引写回同一块共享内存，只有调色板本身需要序列化。
+进程池和共享内存模块只在第一次使用进程池时导入，不使用进程池的录制不必加载它们。
+进程池默认不启用（DEFAULT_PROCESS_COUNT 为0）：每帧都要复制进出共享内存并在进程间派发，
+已有的测量中进程池比在线程中量化慢数倍（单核机器上 benchmark.py --processes 2 的端到端吞吐量约为一半），
+多核机器上的加速尚未得到测量的证实。需要时用 --processes N 显式启用，并先用 benchmark.py 对比。
+'''
+
+# 默认的量化进程数：0表示在线程中量化（进程池需显式启用）
+DEFAULT_PROCESS_COUNT = 0
+# 进程池在多次录制之间共享，避免每次都重新启动子进程
+_process_pool = None
+# 当前进程池的进程数
+_process_pool_size = 0
+# 保护进程池的创建与替换
+_process_pool_lock = threading.Lock()
+# 子进程中缓存的调色板映射器，键为 (调色板字节, 位数)
+_worker_mappers = {}
+
+
+class EncodingCancelled(Exception):
+    '''编码被 StreamingEncoder.cancel 取消时由 finish 抛出'''
+
+
+def compute_frame_durations(timestamps, end_time, speed_multiplier):
+    """
+    根据每帧的捕获时间戳计算GIF中每帧的显示时长（毫秒）。
+
+    第 i 帧的时长为第 i+1 帧与第 i 帧的时间差，最后一帧持续到录制结束，
+    然后按播放速度倍数缩放。GIF 的时长单位是 1/100 秒，这里把误差累积到下一帧，
+    保证总时长不会因为逐帧取整而偏移；同时保证每帧至少 20 毫秒（多数浏览器会把更短的
+    延迟当作 100 毫秒播放）。
+    """
+    # 没有帧时返回空列表
+    if not timestamps:
+        return []
+    # 计算每帧的原始持续时间（秒），最后一帧持续到录制结束
+    raw = [b - a for a, b in zip(timestamps, timestamps[1:])]
+    raw.append(max(end_time - timestamps[-1], 0.0))
+    # 逐帧取整，误差累积到下一帧
+    rounder = DurationRounder(speed_multiplier)
+    return [rounder.round(seconds) for seconds in raw]
+
+
+class DurationRounder:
+    """
+    把以秒为单位的帧时长逐帧换算为输出格式可表示的毫秒数（默认为GIF：10毫秒的整数倍，至少20毫秒），
+    并把取整误差带到下一帧，供一次性计算和流式编码共同使用。
+    """
+
+    def __init__(self, speed_multiplier, step=10, minimum=20):
+        # 播放速度倍数
+        self.speed_multiplier = speed_multiplier
+        # 取整步长和最小时长（毫秒）
+        self.step = step
+        self.minimum = minimum
+        # 取整时累积的误差（毫秒）
+        self.carry = 0.0
+
+    def round(self, seconds):
+        '''函数功能:把一帧的原始时长(秒)换算为输出时长(毫秒)'''
+        # 按播放速度倍数缩放并换算为毫秒，加上之前累积的误差
+        exact = seconds / self.speed_multiplier * 1000 + self.carry
+        # 取整到步长的倍数，且不少于最小时长
+        ms = max(self.minimum, int(round(exact / self.step)) * self.step)
+        # 记录取整误差，留给下一帧
+        self.carry = exact - ms
+        return ms
+
+
+def quantize_frame(arr, mapper=None, dither=DITHER_NONE, matrix_size=DEFAULT_MATRIX_SIZE, offset=(0, 0),
+                   colors=MAX_FRAME_COLORS):
+    """
+    把BGRX帧量化为调色板(P模式)PIL图像（最多 colors 色，不超过255色，留一个索引给透明色）。
+    mapper 为共享调色板映射器，为None时单独生成调色板；dither 为抖动方式（见 dither 模块），
+    有序抖动时 matrix_size 为 Bayer 矩阵边长，offset 为帧（子图）在画布中的位置。
+    抖动时调色板仍由未抖动的像素生成，只在映射到调色板之前抖动。
+    """
+    if mapper is None:
+        # 使用快速八叉树，与原来对RGBA图像 convert('P', palette=Image.ADAPTIVE) 的算法相同
+        image = frame_to_image(arr).quantize(colors, method=Image.Quantize.FASTOCTREE)
+        if dither == DITHER_NONE:
+            return image
+    elif dither == DITHER_NONE:
+        return mapper.quantize(arr)
+    palette_image = image if mapper is None else mapper.palette_image
+    if dither == DITHER_FLOYD_STEINBERG:
+        # Pillow 的误差扩散（串行，作为对照）
+        return frame_to_image(arr).quantize(palette=palette_image, dither=Image.Dither.FLOYDSTEINBERG)
+    # 有序抖动：先按画布位置加上 Bayer 偏移，再映射到最近色
+    dithered = ordered_dither(arr, matrix_size, offset)
+    if mapper is not None:
+        return mapper.quantize(dithered)
+    return frame_to_image(dithered).quantize(palette=palette_image, dither=Image.Dither.NONE)
+
+
+def get_process_pool(processes):
+    '''函数功能:返回(必要时创建)指定进程数的共享进程池'''
+    global _process_pool, _process_pool_size
+    from concurrent.futures import ProcessPoolExecutor  # 多进程量化（用到时才导入）
+    with _process_pool_lock:
+        # 子进程异常退出后进程池不可再用（BrokenProcessPool），同样重新创建
+        if _process_pool is None or _process_pool_size != processes or getattr(_process_pool, '_broken', False):
+            # 进程数变化时关闭旧的进程池
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            # 使用 spawn 方式启动子进程：在已有Qt线程的进程中 fork 并不安全
+            _process_pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+            _process_pool_size = processes
+        return _process_pool
+
+
+def warm_process_pool(processes):
+    '''函数功能:创建进程池并等待每个子进程启动完毕(导入NumPy/Pillow),之后第一帧量化不再等待进程启动'''
+    pool = get_process_pool(processes)
+    for future in [pool.submit(_worker_ready) for _ in range(processes)]:
+        future.result()
+    return pool
+
+
+def _worker_ready():
+    '''函数功能:子进程中执行的空任务,用于预热进程池'''
+    return os.getpid()
+
+
+def _quantize_shared(name, shape, palette, bits, dither=DITHER_NONE, matrix_size=DEFAULT_MATRIX_SIZE,
+                     offset=(0, 0), colors=MAX_FRAME_COLORS):
+    """
+    在子进程中量化共享内存中的一帧。
+    name 为共享内存名，shape 为BGRX帧数组形状；palette 为None时单独生成调色板，否则用查找表映射；
+    dither / matrix_size / offset / colors 与 quantize_frame 相同。
+    量化得到的调色板索引写回同一块共享内存的开头，返回使用的调色板。
+    """
+    from multiprocessing import shared_memory  # 用共享内存在进程间传递帧数据
+    # 附加到父进程创建的共享内存（子进程与父进程共用同一个资源跟踪器，由父进程负责释放）
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        arr = np.ndarray(shape, np.uint8, buffer=block.buf)
+        mapper = None
+        if palette is not None:
+            # 同一个调色板的查找表在子进程中只计算一次
+            key = (bytes(palette), bits)
+            mapper = _worker_mappers.get(key)
+            if mapper is None:
+                if len(_worker_mappers) >= 8:
+                    _worker_mappers.clear()
+                mapper = _worker_mappers[key] = PaletteMapper(palette, bits)
+        image = quantize_frame(arr, mapper, dither, matrix_size, offset, colors)
+        del arr
+        # 帧数据已经用完，把调色板索引写回共享内存，避免再序列化整帧
+        out = np.ndarray(shape[:2], np.uint8, buffer=block.buf)
+        out[...] = np.asarray(image)
+        del out
+        return image.getpalette()
+    finally:
+        block.close()
+
+
+class StreamingEncoder:
+    """
+    边录制边编码的流水线，输出格式由 backend（见 backends 模块，默认为GIF）决定。
+
+    1. submit：录制线程调用，把一帧放入有界输入队列（队列满时阻塞，形成背压）；
+    2. 差异线程：QImage → NumPy 数组（零拷贝视图），传入 scaler（frame_scale.FrameScaler）时先缩小到输出尺寸，
+       再与上一帧比较，重复帧直接丢弃，变化帧裁剪到变化区域；
+    3. 量化线程：GIF把（裁剪后的）数组量化为调色板图像，其他格式调用 backend.encode 编码，结果放入有界结果队列；
+       palette_mode 为 adaptive 时每帧单独生成调色板，global 时整段录制共享一个调色板
+       （由 palette_samples 中的采样帧生成，未提供时由第一帧生成），
+       scene 时在颜色分布大幅变化（场景切换）的帧上开始新的调色板，共享调色板都通过查找表映射；
+       共享调色板对当前帧的映射失真过大（出现了生成时没有的颜色）时，用按步长采样的已到达帧
+       （scene 时只取本场景的帧）和当前帧重新生成；
+       dither 为映射到调色板之前的抖动方式（none / ordered / floyd-steinberg，见 dither 模块），
+       有序抖动的 Bayer 矩阵边长为 dither_size，抖动图案按画布坐标对齐；colors 为调色板的颜色数（最多255）；
+       processes 大于0时，量化在该数量进程的进程池中执行，每个量化线程负责向进程池派发一帧；
+       不接受子图的格式（MP4）始终编码整帧，重复帧仍会合并；
+    4. 写入线程：按帧序号重新排序，等下一帧到达后才知道当前帧的时长，然后追加写入临时文件；
+    5. finish：录制结束后调用，等待剩余帧写完并写入文件结束符；
+    6. save / discard：把临时文件移动到目标路径，或删除临时文件；
+    7. cancel：可以在任意线程中调用，各阶段丢弃剩余的帧，finish 抛出 EncodingCancelled。
+    传入 frame_pool（frame_pool.FramePool）时，录制线程把截图复制进池中的槽并随帧提交槽号，
+    差异线程（作为比较基准）和量化线程（编码完成前）各持有一次引用，用完后把槽归还给缓冲池。
+    设置 progress 回调后，写入线程每写完一帧调用 progress(已完成的输入帧数)。
+    把 frame_sizes 设为空列表后（后端需要提供 tell），写入线程每写完一帧追加 (该帧的输入序号, 已写入的字节数)，
+    与重复帧合并的输入帧不出现在其中。
+    传入 instrumentation 时，各阶段的耗时和队列深度会记录到其中（为None时不计时）。
+    """
+
+    def __init__(self, speed_multiplier=1.0, workers=2, queue_size=8, directory=None,
+                 palette_mode=PALETTE_ADAPTIVE, palette_samples=None, processes=0, instrumentation=None,
+                 backend=GifBackend, backend_options=None, scaler=None, frame_pool=None, dither=DITHER_NONE,
+                 dither_size=DEFAULT_MATRIX_SIZE, colors=MAX_FRAME_COLORS):
+        # 播放速度倍数
+        self.speed_multiplier = speed_multiplier
+        # 输出后端及其参数
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        # 截图后的缩小（FrameScaler），为None时保持原尺寸
+        self.scaler = scaler
+        # 录制线程复制截图用的帧缓冲池（FramePool），为None时提交的是 QImage
+        self.frame_pool = frame_pool
+        # 画布尺寸 (宽, 高)，由第一帧（缩小后）确定
+        self.canvas_size = None
+        # 分阶段计时（Instrumentation），为None时不计时
+        self.instrumentation = instrumentation
+        # 调色板模式
+        self.palette_mode = palette_mode
+        # 抖动方式和有序抖动的矩阵边长
+        self.dither = dither
+        self.dither_size = dither_size
+        # 调色板的颜色数（自适应和共享调色板都不超过该数目）
+        self.colors = colors
+        # 用于生成全局调色板的采样帧（BGRX帧数组列表），为None时由第一帧生成
+        self.palette_samples = palette_samples
+        # 当前使用的共享调色板映射器
+        self.mapper = None
+        # 当前场景第一帧的颜色直方图（按场景模式下用于检测场景切换）
+        self.scene_histogram = None
+        # 已到达的帧（按场景模式下为本场景的帧）的按步长采样，重新生成共享调色板时使用
+        self.palette_sampler = PaletteSampler()
+        # 生成当前调色板时那一帧的映射失真，失真明显超过它时才重新生成（需要多于255色的画面不会每帧都重建）
+        self.palette_distortion = 0.0
+        # 已生成的共享调色板个数
+        self.palettes_built = 0
+        # 量化的帧数和累计耗时（秒），用于计算量化速度
+        self.quantized_frames = 0
+        self.quantize_seconds = 0.0
+        # 保护上面两个统计量（由多个量化线程同时更新）
+        self.stats_lock = threading.Lock()
+        # 使用进程池时，每个进程对应一个负责派发的量化线程（只有需要量化的格式使用进程池）
+        self.pool = get_process_pool(processes) if processes > 0 and backend.paletted else None
+        # 量化线程数
+        self.workers = processes if self.pool is not None else max(1, workers)
+        # 输入队列：录制线程 → 差异线程，元素为 (QImage或帧数组, 时间戳, 缓冲池槽号或None)
+        self.input_queue = queue.Queue(maxsize=queue_size)
+        # 工作队列：差异线程 → 量化线程，元素为 (序号, 偏移, 数组, 时间戳, 调色板映射器, 缓冲池槽号或None)
+        self.work_queue = queue.Queue(maxsize=queue_size)
+        # 结果队列：量化线程 → 写入线程，元素为 (序号, 偏移, 调色板图像, 时间戳)
+        self.result_queue = queue.Queue(maxsize=queue_size)
+        # 相邻帧差异检测器，同时记录省去的帧数和像素数
+        self.differ = FrameDiffer()
+        # 已提交的帧数
+        self.submitted = 0
+        # 进度回调 progress(已完成的输入帧数)，在写入线程中调用，为None时不报告进度
+        self.progress = None
+        # 每帧写完后的输出字节数 [(输入序号, 字节数), ...]，为None时不记录
+        self.frame_sizes = None
+        # 保留帧序号 → 截至该帧已处理的输入帧数（含之前被合并的重复帧），供写入线程报告进度
+        self.input_positions = {}
+        # 录制结束时间，finish 时设置，用于计算最后一帧的时长
+        self.end_time = None
+        # 流水线中发生的第一个异常
+        self.error = None
+        # 创建临时文件（扩展名与输出格式相同，由后端在收到第一帧时打开写入）
+        fd, self.temp_path = tempfile.mkstemp(suffix=backend.extension, dir=directory)
+        os.close(fd)
+        # 启动差异线程
+        self.diff_thread = threading.Thread(target=self._diffLoop, daemon=True)
+        self.diff_thread.start()
+        # 启动量化线程
+        self.worker_threads = [threading.Thread(target=self._quantizeLoop, daemon=True)
+                               for _ in range(self.workers)]
+        for thread in self.worker_threads:
+            thread.start()
+        # 启动写入线程
+        self.writer_thread = threading.Thread(target=self._writeLoop, daemon=True)
+        self.writer_thread.start()
+
+    def submit(self, image, timestamp, slot=None):
+        '''函数功能:提交一帧(QImage或BGRX帧数组,来自帧缓冲池时附带槽号),队列满时阻塞直到有空位'''
+        # 流水线已出错时不再接收新帧
+        if self.error is not None:
+            self._releaseSlot(slot)
+            return
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            self.input_queue.put((image, timestamp, slot))
+        else:
+            # 记录各队列的深度和因背压而阻塞的时间
+            instrumentation.gauge('input_queue', self.input_queue.qsize())
+            instrumentation.gauge('work_queue', self.work_queue.qsize())
+            instrumentation.gauge('result_queue', self.result_queue.qsize())
+            start = time.perf_counter()
+            self.input_queue.put((image, timestamp, slot))
+            instrumentation.record('submit_wait', start)
+        self.submitted += 1
+
+    def _diffLoop(self):
+        '''函数功能:差异线程的主循环,按录制顺序比较相邻帧'''
+        # 保留帧的序号
+        index = 0
+        # 差异检测器中作为比较基准的上一保留帧所在的缓冲池槽
+        previous_slot = None
+        while True:
+            item = self.input_queue.get()
+            # 收到结束标志，归还比较基准的槽，通知每个量化线程结束
+            if item is None:
+                self._releaseSlot(previous_slot)
+                for _ in range(self.workers):
+                    self.work_queue.put(None)
+                return
+            image, timestamp, slot = item
+            # 出错后只消费队列不再处理，避免上游阻塞
+            if self.error is not None:
+                self._releaseSlot(slot)
+                continue
+            instrumentation = self.instrumentation
+            try:
+                start = time.perf_counter() if instrumentation is not None else 0.0
+                arr = image if isinstance(image, np.ndarray) else qimage_to_frame(image)
+                # 流水线的第一个阶段就缩小，后面的差异检测、量化和写入都只处理输出尺寸的像素
+                if self.scaler is not None:
+                    arr = self.scaler(arr)
+                    # 缩小得到的是新数组，不再需要缓冲池中的原图
+                    if arr is not image:
+                        self._releaseSlot(slot)
+                        slot = None
+                    if instrumentation is not None:
+                        instrumentation.record('scale', start)
+                        start = time.perf_counter()
+                result = self.differ.diff(arr)
+                if instrumentation is not None:
+                    instrumentation.record('diff', start)
+                # 与上一帧相同的帧直接丢弃，上一帧的时长会延续到下一个保留帧
+                if result is None:
+                    self._releaseSlot(slot)
+                    continue
+                # 当前帧成为新的比较基准，上一个基准的槽不再被差异检测器使用
+                self._releaseSlot(previous_slot)
+                previous_slot = slot
+                mapper = None
+                if self.backend.paletted:
+                    start = time.perf_counter() if instrumentation is not None else 0.0
+                    mapper = self._selectPalette(arr)
+                    if instrumentation is not None:
+                        instrumentation.record('palette', start)
+            except Exception as e:
+                self.error = e
+                if slot != previous_slot:
+                    self._releaseSlot(slot)
+                continue
+            x, y, sub = self._alignRegion(arr, *result)
+            if index == 0:
+                self.canvas_size = (arr.shape[1], arr.shape[0])
+            self.input_positions[index] = self.differ.frames_total
+            # 量化线程也持有该槽，直到编码完成
+            if slot is not None:
+                self.frame_pool.retain(slot)
+            self.work_queue.put((index, (x, y), sub, timestamp, mapper, slot))
+            index += 1
+
+    def _releaseSlot(self, slot):
+        '''函数功能:归还一次对帧缓冲池槽的引用(slot为None时什么也不做)'''
+        if slot is not None:
+            self.frame_pool.release(slot)
+
+    def _alignRegion(self, arr, x, y, sub):
+        '''函数功能:按后端的要求调整变化区域:不接受子图时返回整帧,偏移量需要对齐时向左上扩展'''
+        if not self.backend.offsets:
+            return 0, 0, arr
+        align = self.backend.offset_align
+        if align > 1 and (x % align or y % align):
+            height, width = sub.shape[:2]
+            left, top = x - x % align, y - y % align
+            return left, top, arr[top:y + height, left:x + width]
+        return x, y, sub
+
+    def _selectPalette(self, arr):
+        '''函数功能:按调色板模式返回当前帧使用的调色板映射器(每帧自适应时返回None)'''
+        if self.palette_mode == PALETTE_ADAPTIVE:
+            return None
+        # 按场景：第一帧，或颜色分布相对场景第一帧变化过大时开始新场景，之前场景的采样不再使用
+        if self.palette_mode != PALETTE_GLOBAL:
+            histogram = color_histogram(arr)
+            if self.mapper is None or scene_distance(histogram, self.scene_histogram) >= SCENE_CHANGE_DISTANCE:
+                self.scene_histogram = histogram
+                self.palette_sampler.reset()
+                self.mapper = None
+        self.palette_sampler.add(arr)
+        # 全局共享时预先提供的采样帧始终参与生成
+        presampled = self.palette_samples if self.palette_mode == PALETTE_GLOBAL and self.palette_samples else []
+        if self.mapper is None:
+            # 第一帧（或场景的第一帧）：只有预先采样的帧和当前帧可用
+            self._buildPalette(presampled or [arr], arr)
+        elif self.mapper.distortion(arr) > max(MAX_DISTORTED_SHARE, 2 * self.palette_distortion):
+            # 出现了调色板中没有的颜色：用采样帧和当前帧重新生成
+            current = arr[::PALETTE_SAMPLE_STEP, ::PALETTE_SAMPLE_STEP]
+            self._buildPalette(presampled + self.palette_sampler.frames + [current], arr)
+        return self.mapper
+
+    def _buildPalette(self, samples, arr):
+        '''函数功能:由采样帧生成共享调色板和查找表,记录当前帧在新调色板下的映射失真'''
+        self.mapper = PaletteMapper(build_palette(samples, self.colors))
+        self.palette_distortion = self.mapper.distortion(arr)
+        self.palettes_built += 1
+
+    def _quantizeLoop(self):
+        '''函数功能:量化线程的主循环'''
+        # 本线程与进程池交换帧数据用的共享内存，按需创建和扩大
+        block = None
+        while True:
+            item = self.work_queue.get()
+            # 收到结束标志，释放共享内存并通知写入线程本线程已结束
+            if item is None:
+                if block is not None:
+                    block.close()
+                    block.unlink()
+                self.result_queue.put(None)
+                return
+            index, offset, arr, timestamp, mapper, slot = item
+            frame = None
+            # 出错后只消费队列不再处理，避免上游阻塞
+            if self.error is None:
+                try:
+                    start = time.perf_counter()
+                    if not self.backend.paletted:
+                        # 全彩格式：由后端编码
+                        frame = self.backend.encode(arr, **self.backend_options)
+                    elif self.pool is not None:
+                        # 在进程池中量化（出错时共享内存已被释放，之后的帧重新创建）
+                        try:
+                            frame, block = self._quantizeInPool(arr, mapper, block, offset)
+                        except Exception:
+                            block = None
+                            raise
+                    else:
+                        # 有共享调色板时查表映射，否则单独生成调色板
+                        frame = quantize_frame(arr, mapper, self.dither, self.dither_size, offset, self.colors)
+                    end = time.perf_counter()
+                    with self.stats_lock:
+                        self.quantize_seconds += end - start
+                        self.quantized_frames += 1
+                    if self.instrumentation is not None:
+                        self.instrumentation.record('quantize', start, end)
+                except Exception as e:
+                    self.error = e
+            # 量化和编码的结果都不再引用原帧，槽可以归还
+            self._releaseSlot(slot)
+            self.result_queue.put((index, offset, frame, timestamp))
+
+    def _quantizeInPool(self, arr, mapper, block, offset):
+        """
+        通过共享内存把一帧交给进程池量化，返回 (调色板图像, 共享内存块)。
+        出错（如进程池损坏、子进程抛出异常）时先关闭并删除共享内存再抛出，调用方不能再使用传入的 block。
+        """
+        from multiprocessing import shared_memory  # 用共享内存在进程间传递帧数据
+        # 共享内存不够大时重新创建
+        if block is None or block.size < arr.nbytes:
+            if block is not None:
+                block.close()
+                block.unlink()
+            block = shared_memory.SharedMemory(create=True, size=arr.nbytes)
+        try:
+            # 把帧数据复制进共享内存（按行跨度读取，写入紧凑排列）
+            np.ndarray(arr.shape, np.uint8, buffer=block.buf)[...] = arr
+            # 只传递共享内存名、形状和调色板
+            palette = mapper.palette if mapper is not None else None
+            bits = mapper.bits if mapper is not None else 0
+            result_palette = self.pool.submit(_quantize_shared, block.name, arr.shape, palette, bits, self.dither,
+                                              self.dither_size, offset, self.colors).result()
+            # 子进程已把调色板索引写回共享内存开头，复制出来（共享内存会被下一帧复用）
+            indices = np.ndarray(arr.shape[:2], np.uint8, buffer=block.buf).copy()
+        except BaseException:
+            block.close()
+            block.unlink()
+            raise
+        frame = Image.fromarray(indices, 'P')
+        frame.putpalette(result_palette)
+        return frame, block
+
+    def _writeLoop(self):
+        '''函数功能:写入线程的主循环,按顺序把帧追加到临时文件'''
+        # 乱序到达、尚未轮到写入的帧
+        pending = {}
+        # 下一个应写入的帧序号
+        next_index = 0
+        # 已就绪但还在等待下一帧时间戳（以确定时长）的帧，元素为 (偏移, 调色板图像, 时间戳)
+        held = None
+        # held 的输入序号
+        held_input = 0
+        # 逐帧计算时长
+        rounder = DurationRounder(self.speed_multiplier, self.backend.duration_step, self.backend.min_duration)
+        # 后端写入器在收到第一帧时创建（第一帧总是整帧，其尺寸即画布尺寸）
+        writer = None
+        # 已结束的量化线程数
+        finished_workers = 0
+
+        while finished_workers < self.workers:
+            item = self.result_queue.get()
+            if item is None:
+                finished_workers += 1
+                continue
+            pending[item[0]] = item[1:]
+            # 按序号依次取出可以写入的帧
+            while next_index in pending:
+                current = pending.pop(next_index)
+                position = self.input_positions.pop(next_index)
+                next_index += 1
+                if self.error is not None:
+                    continue
+                try:
+                    if held is not None:
+                        # 当前帧的时间戳确定了上一帧的时长
+                        offset, frame, timestamp = held
+                        start = time.perf_counter()
+                        writer.append(frame, rounder.round(current[2] - timestamp), offset)
+                        if self.instrumentation is not None:
+                            self.instrumentation.record('write', start)
+                        if self.frame_sizes is not None:
+                            self.frame_sizes.append((held_input, writer.tell()))
+                        # 当前帧之前的输入帧都已写完（重复帧合并在上一帧中）
+                        if self.progress is not None:
+                            self.progress(position - 1)
+                    elif writer is None:
+                        writer = self.backend(self.temp_path, self.canvas_size, current[1], **self.backend_options)
+                    held, held_input = current, position - 1
+                except Exception as e:
+                    self.error = e
+
+        try:
+            try:
+                # 写入最后一帧，它持续到录制结束
+                if self.error is None and held is not None:
+                    offset, frame, timestamp = held
+                    writer.append(frame, rounder.round(max(self.end_time - timestamp, 0.0)), offset)
+                    if self.frame_sizes is not None:
+                        self.frame_sizes.append((held_input, writer.tell()))
+            finally:
+                # 出错时也要关闭写入器（MP4需要结束ffmpeg进程）
+                if writer is not None:
+                    writer.close()
+            if self.error is None and self.progress is not None:
+                self.progress(self.submitted)
+        except Exception as e:
+            self.error = self.error or e
+
+    def finish(self, end_time):
+        """
+        录制结束后调用：等待队列中剩余的帧编码并写入完毕。
+        返回提交的帧数；流水线中发生过异常时重新抛出该异常。
+        """
+        # 记录录制结束时间，用于计算最后一帧的时长
+        self.end_time = end_time
+        start = time.perf_counter()
+        # 向差异线程发送结束标志，它会依次通知量化线程和写入线程
+        self.input_queue.put(None)
+        # 等待所有线程结束
+        self.diff_thread.join()
+        for thread in self.worker_threads:
+            thread.join()
+        self.writer_thread.join()
+        if self.instrumentation is not None:
+            self.instrumentation.record('finish', start)
+        # 流水线出错时抛出异常
+        if self.error is not None:
+            raise self.error
+        return self.submitted
+
+    def cancel(self):
+        '''函数功能:取消编码,各阶段丢弃剩余的帧,之后 finish 抛出 EncodingCancelled'''
+        if self.error is None:
+            self.error = EncodingCancelled('编码已取消')
+
+    def summary(self):
+        '''函数功能:返回差异检测省去的帧数、像素比例和量化速度的说明文字'''
+        differ = self.differ
+        ratio = differ.pixels_skipped / differ.pixels_total if differ.pixels_total else 0.0
+        # 每个量化线程的平均量化速度（帧/秒）
+        speed = self.quantized_frames / self.quantize_seconds if self.quantize_seconds else 0.0
+        # 不接受子图的格式总是编码整帧，不统计省去的像素
+        skipped = f'省去像素 {ratio:.0%}，' if self.backend.offsets else ''
+        return (f'合并重复帧 {differ.frames_merged}/{differ.frames_total}，{skipped}'
+                f'{"量化" if self.backend.paletted else "编码"} {speed:.1f} 帧/秒')
+
+    def save(self, path):
+        '''函数功能:把编码完成的临时文件移动(重命名)到目标路径'''
+        start = time.perf_counter()
+        shutil.move(self.temp_path, path)
+        if self.instrumentation is not None:
+            self.instrumentation.record('save', start)
+
+    def discard(self):
+        '''函数功能:删除临时文件'''
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
@@ -0,0 +1,351 @@
+# 导入必要的模块
+import json  # 用于解析请求和编码回复
+import os  # 用于处理输出路径、获取进程号和文件大小
+import signal  # 用于在收到 SIGINT/SIGTERM 时退出
+import tempfile  # 用于预热编码流水线的临时目录
+import time  # 用于统计启动延迟和运行时间
+import numpy as np  # 用于生成预热用的帧
+from PyQt5 import QtCore, QtNetwork, QtWidgets  # 事件循环和本地套接字服务
+from backends import BACKENDS, backend_for_path, backend_options  # 输出格式
+from dither import DEFAULT_MATRIX_SIZE, DITHER_MODES, DITHER_NONE, MATRIX_SIZES  # 抖动方式
+from frame_pool import FramePool  # 可复用的帧缓冲池
+from frame_scale import FrameScaler  # 截图后缩小到输出尺寸
+from main import (RecorderThread, SaveThread, abandon_encoder, headless_application, parse_rect,  # 录制与保存
+                  positive_float)
+from palette import PALETTE_ADAPTIVE, PALETTE_GLOBAL, PALETTE_SCENE  # 调色板模式
+from pipeline import StreamingEncoder, warm_process_pool  # 编码流水线
+from recorderctl import default_socket_path  # 与客户端相同的默认套接字路径
+
+'''
+常驻录制守护进程（python main.py daemon）。
+
+脚本中反复启动 main.py 时，每次都要先导入 PyQt5、NumPy、Pillow，创建 QApplication，
+第一帧之前就花掉了几百毫秒到几秒。守护进程只做一次这些事，并预热截图、编码流水线和量化进程池，
+然后在本地套接字（QLocalServer，Unix 上为套接字文件，Windows 上为命名管道）上接受
+start / stop / status / shutdown 命令（协议见 recorderctl 模块），
+每次 start 只需要创建录制线程和编码流水线，几毫秒内就能截下第一帧。
+录制结束后由 SaveThread 在后台保存，保存期间可以开始下一次录制。
+'''
+
+# 可以接受的调色板模式
+PALETTE_MODES = (PALETTE_ADAPTIVE, PALETTE_GLOBAL, PALETTE_SCENE)
+
+
+class RecordingSession:
+    """
+    守护进程中的一次录制：录制线程、编码流水线、保存线程，以及等待回复的连接。
+    """
+
+    def __init__(self, recorder, encoder, output, request_time):
+        # 录制线程和编码流水线
+        self.recorder = recorder
+        self.encoder = encoder
+        # 输出文件路径
+        self.output = output
+        # 收到 start 请求的时间（time.perf_counter），用于计算到第一帧的延迟
+        self.request_time = request_time
+        # 等待第一帧后回复的 start 连接
+        self.start_waiter = None
+        # 等待保存完成后回复的 stop 连接
+        self.stop_waiters = []
+        # 保存线程，录制结束后创建
+        self.saveThread = None
+        # 保存结果，保存结束后设置
+        self.result = None
+
+
+class RecorderDaemon(QtCore.QObject):
+    """
+    在本地套接字上接受录制命令的常驻服务。
+
+    listen() 开始监听（已有守护进程在运行时抛出 RuntimeError），warmUp() 预热，
+    之后由 Qt 事件循环驱动：每个连接读取一行JSON请求，回复一行JSON后关闭。
+    同一时间只有一个正在进行的录制，但可以有多个正在保存的录制。
+    """
+
+    def __init__(self, path, processes=0):
+        # 调用父类的初始化方法
+        super().__init__()
+        # 套接字路径（或 Windows 上的管道名）
+        self.path = path
+        # 量化进程数，预热时启动进程池
+        self.processes = processes
+        # 启动时间和预热耗时（秒）
+        self.started = time.time()
+        self.warmup_seconds = 0.0
+        # 正在进行的录制，以及尚未保存完毕的所有录制（包括正在进行的）
+        self.current = None
+        self.sessions = []
+        # 最近一次保存的结果
+        self.last_result = None
+        # 正在退出，不再开始新的保存
+        self.closing = False
+        # 本地套接字服务
+        self.server = QtNetwork.QLocalServer(self)
+        self.server.newConnection.connect(self.acceptConnections)
+
+    def listen(self):
+        '''函数功能:开始监听本地套接字,已有守护进程在运行时抛出RuntimeError'''
+        probe = QtNetwork.QLocalSocket()
+        probe.connectToServer(self.path)
+        if probe.waitForConnected(200):
+            probe.abort()
+            raise RuntimeError(f'守护进程已在运行：{self.path}')
+        # 删除上次异常退出时留下的套接字文件
+        QtNetwork.QLocalServer.removeServer(self.path)
+        # 只允许当前用户连接
+        self.server.setSocketOptions(QtNetwork.QLocalServer.UserAccessOption)
+        if not self.server.listen(self.path):
+            raise RuntimeError(f'无法监听 {self.path}：{self.server.errorString()}')
+
+    def warmUp(self):
+        """
+        预热第一次录制会用到的代码路径：截一次图（加载平台插件的截图实现），
+        用几帧小图跑一遍GIF编码流水线（加载 Pillow 的编码器和 NumPy 的代码路径），
+        导入输出MP4时才需要的 imageio，并启动和预热量化进程池。
+        """
+        start = time.perf_counter()
+        QtWidgets.QApplication.primaryScreen().grabWindow(0, 0, 0, 1, 1)
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as directory:
+            encoder = StreamingEncoder(directory=directory)
+            for i in range(3):
+                encoder.submit(rng.integers(0, 255, (16, 16, 4), dtype=np.uint8), i * 0.1)
+            encoder.finish(0.3)
+            encoder.discard()
+        try:
+            import imageio  # noqa: F401  只为预先导入
+        except ImportError:
+            pass
+        if self.processes > 0:
+            warm_process_pool(self.processes)
+        self.warmup_seconds = time.perf_counter() - start
+
+    def acceptConnections(self):
+        '''函数功能:接受新的连接,收到完整的一行后处理请求'''
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.disconnected.connect(connection.deleteLater)
+            connection.readyRead.connect(lambda connection=connection: self.readRequest(connection))
+
+    def readRequest(self, connection):
+        '''函数功能:读取并执行一行JSON请求,出错时回复错误说明'''
+        if not connection.canReadLine():
+            return
+        try:
+            request = json.loads(bytes(connection.readLine()).decode('utf-8'))
+            handler = {
+                'start': self.startRecording,
+                'stop': self.stopRecording,
+                'status': self.status,
+                'shutdown': self.shutdown,
+            }.get(request.get('command'))
+            if handler is None:
+                raise ValueError(f'未知命令：{request.get("command")}')
+            handler(connection, request)
+        except Exception as e:
+            self.reply(connection, {'ok': False, 'error': str(e) or type(e).__name__})
+
+    def reply(self, connection, response):
+        '''函数功能:回复一行JSON并关闭连接(写完后才断开)'''
+        connection.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+        connection.flush()
+        connection.disconnectFromServer()
+
+    def startRecording(self, connection, request):
+        '''函数功能:按请求参数开始录制,截下第一帧后回复'''
+        if self.current is not None:
+            raise RuntimeError('已有录制正在进行')
+        rect = parse_rect(str(request['rect']))
+        output = os.path.abspath(request['out'])
+        fps = positive_float(request.get('fps', 10.0))
+        speed = positive_float(request.get('speed', 1.0))
+        palette_mode = request.get('palette') or PALETTE_ADAPTIVE
+        if palette_mode not in PALETTE_MODES:
+            raise ValueError(f'未知的调色板模式：{palette_mode}')
+        dither = request.get('dither') or DITHER_NONE
+        dither_size = int(request.get('dither_size', DEFAULT_MATRIX_SIZE))
+        if dither not in DITHER_MODES or dither_size not in MATRIX_SIZES:
+            raise ValueError(f'未知的抖动方式：{dither} {dither_size}')
+        # 输出格式：请求中指定优先，否则按输出文件的扩展名选择
+        if request.get('format') and request['format'] not in BACKENDS:
+            raise ValueError(f'未知的输出格式：{request["format"]}')
+        backend = BACKENDS[request['format']] if request.get('format') else backend_for_path(output)
+        duration = float(request.get('duration', 0))
+        adaptive = bool(request.get('adaptive'))
+        idle_rate = positive_float(request.get('idle_fps', 2.0))
+        # 截图后的缩小，录制线程和编码流水线共用
+        scaler = FrameScaler(positive_float(request.get('scale', 1.0)), int(request.get('max_size', 0)))
+        # 所有参数都检查完才创建流水线（它会启动线程并在输出目录中创建临时文件）
+        request_time = time.perf_counter()
+        encoder = StreamingEncoder(speed, directory=os.path.dirname(output), palette_mode=palette_mode,
+                                   processes=self.processes, backend=backend,
+                                   backend_options=backend_options(backend, fps, speed),
+                                   scaler=scaler, frame_pool=FramePool(), dither=dither, dither_size=dither_size)
+        try:
+            recorder = RecorderThread(rect, fps, duration, encoder, scaler=scaler, adaptive=adaptive,
+                                      idle_rate=idle_rate)
+        except Exception:
+            # 守护进程常驻：创建录制线程失败时停止流水线的线程并删除临时文件
+            abandon_encoder(encoder, time.perf_counter())
+            raise
+        session = RecordingSession(recorder, encoder, output, request_time)
+        session.start_waiter = connection
+        # 信号在录制线程中发出，排队到本对象所在的主线程处理
+        recorder.frameCaptured.connect(lambda count, session=session: self.onFrameCaptured(session, count))
+        recorder.finished.connect(lambda session=session: self.onRecordingFinished(session))
+        self.current = session
+        self.sessions.append(session)
+        recorder.start()
+
+    def onFrameCaptured(self, session, count):
+        '''函数功能:截下第一帧后回复 start 请求,附上从收到请求到第一帧的延迟'''
+        if count == 1 and session.start_waiter is not None:
+            latency = (session.recorder.timestamps[0] - session.request_time) * 1000
+            self.reply(session.start_waiter, {'ok': True, 'output': session.output,
+                                              'format': session.encoder.backend.name,
+                                              'latency_ms': round(latency, 3)})
+            session.start_waiter = None
+
+    def onRecordingFinished(self, session):
+        '''函数功能:录制线程结束(stop或达到最长时长)后在后台保存'''
+        recorder = session.recorder
+        if self.current is session:
+            self.current = None
+        # 退出时录制已被取消，由 close 清理
+        if self.closing:
+            return
+        # 截图出错时录制提前结束：丢弃流水线，向等待中的连接报告错误
+        if recorder.error is not None:
+            self.onRecordingFailed(session, f'录制失败：{recorder.error}')
+            return
+        if session.start_waiter is not None:
+            self.reply(session.start_waiter, {'ok': False, 'error': '录制没有截到任何帧'})
+            session.start_waiter = None
+        summary = (f'录制完成：{len(recorder.timestamps)}帧，'
+                   f'实际 {recorder.achievedFrameRate():.1f}/{recorder.frame_rate} f/s，'
+                   f'跳过 {recorder.dropped_ticks} 次')
+        session.saveThread = SaveThread(session.encoder, session.output, recorder.timestamps, recorder.end_time,
+                                        summary=summary)
+        session.saveThread.saveFinished.connect(
+            lambda ok, message, session=session: self.onSaveFinished(session, ok, message))
+        session.saveThread.start()
+
+    def onRecordingFailed(self, session, error):
+        '''函数功能:录制出错时删除临时文件,记录结果并回复等待中的 start 和 stop 请求'''
+        abandon_encoder(session.encoder, session.recorder.end_time)
+        result = {'ok': False, 'output': session.output, 'frames': len(session.recorder.timestamps), 'error': error}
+        session.result = self.last_result = result
+        waiters = session.stop_waiters + ([session.start_waiter] if session.start_waiter is not None else [])
+        for connection in waiters:
+            self.reply(connection, result)
+        session.start_waiter, session.stop_waiters = None, []
+        self.sessions.remove(session)
+
+    def onSaveFinished(self, session, ok, message):
+        '''函数功能:保存结束后记录结果并回复等待中的 stop 请求'''
+        recorder = session.recorder
+        result = {
+            'ok': ok,
+            'output': session.output,
+            'frames': len(recorder.timestamps),
+            'achieved_fps': round(recorder.achievedFrameRate(), 3),
+            'dropped_ticks': recorder.dropped_ticks,
+        }
+        if ok:
+            result.update({'output_bytes': os.path.getsize(session.output), 'summary': message})
+        else:
+            result['error'] = message
+        # 自适应帧率时附上与固定帧率相比省去的截图次数比例
+        if recorder.motion is not None:
+            result['grab_skip_ratio'] = round(recorder.grabSkipRatio(), 3)
+        session.result = self.last_result = result
+        for connection in session.stop_waiters:
+            self.reply(connection, result)
+        session.stop_waiters = []
+        session.saveThread.wait()
+        self.sessions.remove(session)
+
+    def stopRecording(self, connection, request):
+        '''函数功能:结束当前录制;默认保存完成后回复,wait为false时立即回复'''
+        # 没有正在进行的录制时，等待最近一次仍在保存的录制
+        session = self.current or (self.sessions[-1] if self.sessions else None)
+        if session is None:
+            raise RuntimeError('没有正在进行的录制')
+        if session.recorder.isRunning():
+            # 最多等待一个截图间隔，录制线程的 finished 信号随后开始保存
+            session.recorder.stop()
+        if request.get('wait', True):
+            session.stop_waiters.append(connection)
+        else:
+            self.reply(connection, {'ok': True, 'output': session.output, 'saving': True})
+
+    def status(self, connection, request):
+        '''函数功能:回复守护进程和当前录制的状态'''
+        response = {
+            'ok': True,
+            'pid': os.getpid(),
+            'socket': self.path,
+            'uptime': round(time.time() - self.started, 3),
+            'warmup_seconds': round(self.warmup_seconds, 3),
+            'recording': self.current is not None,
+            'saving': sum(1 for session in self.sessions if session is not self.current),
+            'last': self.last_result,
+        }
+        if self.current is not None:
+            recorder = self.current.recorder
+            response.update({
+                'output': self.current.output,
+                'frames': len(recorder.timestamps),
+                'elapsed': round(time.perf_counter() - recorder.start_time, 3) if recorder.start_time else 0.0,
+            })
+        self.reply(connection, response)
+
+    def shutdown(self, connection, request):
+        '''函数功能:取消未完成的录制和保存,回复后退出事件循环'''
+        self.close()
+        self.reply(connection, {'ok': True})
+        QtCore.QTimer.singleShot(0, QtWidgets.QApplication.quit)
+
+    def close(self):
+        '''函数功能:停止录制、取消所有保存并停止监听'''
+        self.closing = True
+        for session in list(self.sessions):
+            session.encoder.cancel()
+            if session.recorder.isRunning():
+                session.recorder.stop()
+            if session.saveThread is not None:
+                session.saveThread.cancel()
+                session.saveThread.wait()
+            else:
+                # 还没开始保存的录制直接结束流水线并删除临时文件
+                abandon_encoder(session.encoder, session.recorder.end_time or time.perf_counter())
+        self.sessions = []
+        self.current = None
+        self.server.close()
+
+
+def serve(path=None, processes=0, platform=None):
+    """
+    运行守护进程直到收到 shutdown 命令或 SIGINT/SIGTERM。
+    就绪后向标准输出打印一行JSON（套接字路径、进程号、预热耗时），脚本可以等待这一行再发送命令。
+    """
+    try:
+        app = headless_application(platform)
+        daemon = RecorderDaemon(path or default_socket_path(), processes)
+        daemon.listen()
+    except RuntimeError as e:
+        print(json.dumps({'ok': False, 'error': str(e)}, ensure_ascii=False), flush=True)
+        return 1
+    daemon.warmUp()
+    # Qt 事件循环中 Python 不会执行信号处理函数，定时器让解释器定期有机会处理信号
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    signal.signal(signal.SIGTERM, lambda *_: app.quit())
+    timer = QtCore.QTimer()
+    timer.timeout.connect(lambda: None)
+    timer.start(200)
+    print(json.dumps({'ok': True, 'socket': daemon.path, 'pid': os.getpid(),
+                      'warmup_seconds': round(daemon.warmup_seconds, 3)}, ensure_ascii=False), flush=True)
+    app.exec_()
+    daemon.close()
+    return 0
@@ -0,0 +1,102 @@
+# 导入必要的模块
+import argparse  # 用于解析命令行参数
+import getpass  # 用于按用户区分默认的套接字路径
+import json  # 用于编码请求和解码回复
+import os  # 用于判断操作系统和处理输出路径
+import socket  # 用于连接守护进程的本地套接字
+import sys  # 用于设置退出码
+import tempfile  # 用于获取临时目录
+
+'''
+常驻录制守护进程（python main.py daemon）的命令行客户端。
+
+守护进程已经导入了 PyQt5、NumPy、Pillow，创建好了 QApplication 并预热了编码流水线和量化进程池，
+本客户端只使用标准库，每次调用只需要启动 Python 解释器本身的时间，从发出 start 到截下第一帧只需几毫秒。
+
+协议：每个连接发送一行JSON请求，守护进程回复一行JSON后关闭连接。
+    {"command": "start", "rect": "x,y,w,h", "out": "a.gif", "fps": 20, ...}  截下第一帧后回复
+    {"command": "stop"}                                                      保存完成后回复（"wait": false 时立即回复）
+    {"command": "status"}
+    {"command": "shutdown"}
+回复中 "ok" 为 false 时带 "error" 字段。
+
+用法：
+    python main.py daemon &
+    python recorderctl.py start --rect 0,0,800,600 --fps 20 --out capture.gif
+    python recorderctl.py stop
+'''
+
+
+def default_socket_path():
+    '''函数功能:返回默认的本地套接字路径(Unix为临时目录中按用户区分的套接字文件,Windows为命名管道)'''
+    name = f'screen-recorder-{getpass.getuser()}'
+    if os.name == 'nt':
+        return '\\\\.\\pipe\\' + name
+    return os.path.join(tempfile.gettempdir(), name + '.sock')
+
+
+def send_request(request, path=None, timeout=None):
+    '''函数功能:向守护进程发送一个请求并返回解码后的回复,无法连接时抛出OSError'''
+    path = path or default_socket_path()
+    data = (json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8')
+    if os.name == 'nt':
+        # Windows 上 QLocalServer 使用命名管道，可以像文件一样读写
+        with open(path, 'r+b', buffering=0) as pipe:
+            pipe.write(data)
+            reply = pipe.readline()
+    else:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(timeout)
+            connection.connect(path)
+            connection.sendall(data)
+            reply = connection.makefile('rb').readline()
+    if not reply:
+        raise OSError('守护进程没有回复就关闭了连接')
+    return json.loads(reply.decode('utf-8'))
+
+
+def build_arg_parser():
+    '''函数功能:创建命令行参数解析器'''
+    parser = argparse.ArgumentParser(prog='recorderctl.py', description='控制常驻录制守护进程（python main.py daemon）')
+    parser.add_argument('--socket', default=None, help='守护进程的套接字路径，默认与守护进程的默认值相同')
+    commands = parser.add_subparsers(dest='command', required=True)
+    # start：开始录制，截下第一帧后返回
+    start = commands.add_parser('start', help='开始录制，截下第一帧后返回（回复中的 latency_ms 为请求到第一帧的耗时）')
+    start.add_argument('--rect', required=True, help='录制区域 x,y,w,h（全局坐标）')
+    start.add_argument('--out', required=True, help='输出文件路径')
+    start.add_argument('--fps', type=float, default=10.0, help='帧率，默认10')
+    start.add_argument('--duration', type=float, default=0.0, help='最长录制时长（秒），默认0表示直到 stop')
+    start.add_argument('--speed', type=float, default=1.0, help='播放速度倍数，默认1.0')
+    start.add_argument('--format', default=None, help='输出格式（gif/mp4/webp/apng），默认按 --out 的扩展名选择')
+    start.add_argument('--palette', default=None, help='调色板模式（adaptive/global/scene），默认每帧自适应')
+    start.add_argument('--dither', default=None, help='抖动方式（none/ordered/floyd-steinberg），默认不抖动')
+    start.add_argument('--dither-size', type=int, default=None, help='有序抖动的 Bayer 矩阵边长（2/4/8/16），默认4')
+    start.add_argument('--scale', type=float, default=1.0, help='输出尺寸相对于录制区域的比例，默认1.0')
+    start.add_argument('--max-size', type=int, default=0, help='输出的最大边长（像素），0表示不限制')
+    start.add_argument('--adaptive', action='store_true', help='自适应帧率：画面静止时降低截图频率')
+    start.add_argument('--idle-fps', type=float, default=2.0, help='自适应帧率时画面静止的截图帧率，默认2')
+    # stop：结束录制，默认等待保存完成
+    stop = commands.add_parser('stop', help='结束当前录制，保存完成后返回统计信息')
+    stop.add_argument('--no-wait', dest='wait', action='store_false', help='不等待保存完成，立即返回')
+    commands.add_parser('status', help='查询守护进程和当前录制的状态')
+    commands.add_parser('shutdown', help='取消未完成的录制并退出守护进程')
+    return parser
+
+
+def main(argv=None):
+    '''函数功能:命令行入口,打印守护进程的JSON回复,成功返回0,失败返回1'''
+    args = build_arg_parser().parse_args(argv)
+    request = {key: value for key, value in vars(args).items() if key != 'socket' and value is not None}
+    # 输出路径按客户端的当前目录解析（守护进程的当前目录可能不同）
+    if args.command == 'start':
+        request['out'] = os.path.abspath(args.out)
+    try:
+        reply = send_request(request, args.socket)
+    except (OSError, ValueError) as e:
+        reply = {'ok': False, 'error': f'无法与守护进程通信：{e}'}
+    print(json.dumps(reply, ensure_ascii=False))
+    return 0 if reply.get('ok') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
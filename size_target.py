@@ -0,0 +1,275 @@
+# 导入必要的模块
+import os  # 用于获取采样编码输出的文件大小
+import time  # 用于统计估计耗时
+import numpy as np  # 用于按画面变化量挑选采样片段
+from frame_diff import count_changed  # 相邻帧之间变化的像素数
+from pipeline import EncodingCancelled  # 估计过程中被取消时抛出
+
+'''
+目标文件大小模式。
+
+很多场合（如问题跟踪系统的上传限制）要求输出不超过固定大小，原来只能录制、保存、检查，不合适再手动重来。
+SizeTarget.plan 在录制结束后、正式编码之前，按候选设置（抽帧步长、输出缩放比例、颜色数）
+只编码少量采样帧，由采样结果推算整段录制的输出大小，选出放得下的画质最好的设置，之后正式编码只运行一次。
+
+估计方法：第一帧是整帧，之后每帧只编码与上一帧不同的区域，与上一帧相同的帧直接合并，
+一帧的大小大致是固定开销（帧头、最短的压缩数据）加上与变化像素数成正比的部分。
+一段录制中静止、光标闪烁、滚动、整屏切换往往交替出现，均匀挑几帧来平均会严重偏离，所以：
+  1. 对按抽帧步长保留的全部帧做一遍逐像素比较（远比量化便宜），得到每两帧之间变化的像素数；
+  2. 挑选若干段、每段 WINDOW_FRAMES 个连续帧：第一段从第一帧开始，其余各段一半按变化像素数的累计分布、
+     一半按有变化的帧数的累计分布挑选，大变化和数量多的小变化都能被采到；
+  3. 各段首尾相接交给一条按候选的缩放比例和颜色数创建的流水线编码一次，记录每帧写完后的字节数，
+     段内每一帧（不含段首，它接在另一段之后）给出一组 (变化像素数, 字节数)，
+     用全部样本的最小二乘拟合 字节数 = 固定开销 + 每像素字节数 × 变化像素数 得到固定开销，
+     每段再单独算出自己的每像素字节数（文字、照片、噪点的压缩率相差数倍，同一类画面往往连续出现）；
+  4. 估计值 = 第一帧的字节数 + 有变化的帧数 × 固定开销 + Σ 时间上最近的采样段的每像素字节数 × 该次变化的像素数。
+拟合结果只取决于缩放比例和颜色数，抽帧步长不同的候选共用同一次采样编码，只需各做一遍像素比较。
+保留的帧数不超过采样帧数时直接编码全部帧，估计值就是准确值。
+需要后端提供 tell（逐帧写入文件的 GIF、WebP、APNG），MP4 由 ffmpeg 写入，无法得知每帧的大小。
+候选设置按画质从好到差排成 SIZE_LADDER，每一级的各项参数都不比上一级高，输出大小沿阶梯单调递减：
+先估计画质最好的一级，放不下时二分查找第一个放得下的一级。
+'''
+
+# 候选设置 (抽帧步长, 输出缩放比例, 颜色数)，按画质从好到差排列
+SIZE_LADDER = (
+    (1, 1.0, 255),
+    (1, 1.0, 128),
+    (1, 1.0, 64),
+    (2, 1.0, 64),
+    (2, 0.75, 64),
+    (3, 0.75, 64),
+    (3, 0.75, 32),
+    (3, 0.5, 32),
+    (4, 0.5, 32),
+    (6, 0.5, 32),
+    (6, 0.25, 16),
+)
+# 除第一段外按变化量挑选的采样段数和每段的帧数
+SAMPLE_WINDOWS = 6
+WINDOW_FRAMES = 4
+
+
+def candidate_settings(paletted=True):
+    '''函数功能:返回候选设置阶梯,不需要调色板的格式去掉颜色数(记为None)并合并相同的候选'''
+    if paletted:
+        return SIZE_LADDER
+    ladder = []
+    for step, scale, _ in SIZE_LADDER:
+        if (step, scale, None) not in ladder:
+            ladder.append((step, scale, None))
+    return tuple(ladder)
+
+
+def frame_activity(frames, indices, cancelled=None):
+    '''函数功能:返回indices中相邻两个保留帧之间变化的像素数数组(长度为帧数-1)'''
+    activity = np.zeros(max(0, len(indices) - 1), np.int64)
+    previous = None
+    for position, index in enumerate(indices):
+        if cancelled is not None and cancelled():
+            raise EncodingCancelled('编码已取消')
+        arr = frames[index]
+        if previous is not None:
+            activity[position - 1] = count_changed(arr, previous)
+        previous = arr
+    return activity
+
+
+def sample_windows(activity):
+    """
+    按帧间变化量挑选采样片段，返回按位置排序、互不重叠的 [(起始位置, 结束位置), ...]（不含结束位置）。
+    第一段从第一帧开始；其余各段以变化像素数和有变化帧数的累计分布的分位点为中心，重叠的段合并。
+    """
+    count = len(activity) + 1
+    starts = {0}
+    changed = np.cumsum(activity > 0)
+    if changed[-1]:
+        half = SAMPLE_WINDOWS // 2
+        quantiles = (np.arange(half) + 0.5) / half
+        pixels = np.cumsum(activity)
+        # 每个分位点落在使累计量首次达到它的那一次帧间变化上（一定是有变化的一次）
+        centers = np.concatenate([np.searchsorted(pixels, quantiles * pixels[-1]),
+                                  np.searchsorted(changed, quantiles * changed[-1])])
+        starts.update(int(start) for start in np.clip(centers - (WINDOW_FRAMES - 2) // 2, 0, count - WINDOW_FRAMES))
+    windows = []
+    for start in sorted(starts):
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], min(count, start + WINDOW_FRAMES))
+        else:
+            windows.append((start, min(count, start + WINDOW_FRAMES)))
+    return windows
+
+
+class SizePlan:
+    """
+    SizeTarget.plan 的结果。
+    settings 为选中的 (抽帧步长, 输出缩放比例, 颜色数)，estimate 为估计的输出字节数；
+    fits 为估计值是否不超过目标（阶梯上最差的一级也放不下时为 False，仍按该级编码）；
+    seconds 为估计耗时，estimates 为每个估计过的候选设置及其估计值。
+    """
+
+    def __init__(self, settings, estimate, target_bytes, seconds, estimates):
+        # 选中的设置和估计的输出字节数
+        self.settings = settings
+        self.estimate = estimate
+        # 目标字节数
+        self.target_bytes = target_bytes
+        # 估计值是否放得下
+        self.fits = estimate <= target_bytes
+        # 估计耗时（秒）
+        self.seconds = seconds
+        # 估计过的候选设置 → 估计字节数
+        self.estimates = estimates
+
+    def indices(self, count):
+        '''函数功能:返回按选中的抽帧步长从count帧中保留的帧序号'''
+        return range(0, count, self.settings[0])
+
+    def error(self, actual_bytes):
+        '''函数功能:返回估计值相对实际输出大小的误差(正数表示估计偏大)'''
+        return (self.estimate - actual_bytes) / actual_bytes if actual_bytes else 0.0
+
+    def describe(self, actual_bytes, encode_seconds=None):
+        '''函数功能:返回选中的设置以及估计值与实际大小的说明文字'''
+        step, scale, colors = self.settings
+        text = f'目标 {self.target_bytes >> 10} KB：抽帧 1/{step}，缩放 {scale:.0%}'
+        if colors is not None:
+            text += f'，{colors} 色'
+        text += (f'，估计 {self.estimate >> 10} KB，实际 {actual_bytes >> 10} KB'
+                 f'（误差 {self.error(actual_bytes):+.1%}），估计耗时 {self.seconds:.1f} 秒')
+        if encode_seconds is not None:
+            text += f'（编码 {encode_seconds:.1f} 秒）'
+        if not self.fits:
+            text += '，最低设置仍超出目标'
+        return text
+
+
+class SizeTarget:
+    """
+    目标文件大小：target_bytes 为目标字节数；make_encoder(设置, 目录=None, instrumentation=None)
+    按 (抽帧步长, 输出缩放比例, 颜色数) 创建一条新的编码流水线（抽帧由调用方按步长挑选帧，
+    流水线只需要据此设置帧率等参数）；paletted 为输出格式是否需要调色板，否则颜色数不参与候选。
+    """
+
+    def __init__(self, target_bytes, make_encoder, paletted=True):
+        # 目标字节数
+        self.target_bytes = target_bytes
+        # 按设置创建编码流水线的工厂
+        self.make_encoder = make_encoder
+        # 候选设置阶梯
+        self.ladder = candidate_settings(paletted)
+        # 当前录制的估计缓存（plan 开始时清空）：抽帧步长 → 帧间变化量，(缩放比例, 颜色数) → 拟合的大小模型
+        self.activity = {}
+        self.models = {}
+
+    def plan(self, frames, timestamps, end_time, cancelled=None):
+        """
+        估计候选设置的输出大小，返回 SizePlan。
+        frames 为可按序号取帧的帧序列（如 FrameStore），timestamps 为每帧的时间戳，end_time 为录制结束时间；
+        cancelled 为返回是否已取消的函数，取消时抛出 EncodingCancelled。
+        """
+        start = time.perf_counter()
+        self.activity, self.models = {}, {}
+        estimates = {}
+        # 先估计画质最好的一级；放不下时在其余各级中二分查找第一个放得下的（都放不下时落在最后一级）
+        low, high = 0, len(self.ladder) - 1
+        if self._estimate(0, estimates, frames, timestamps, end_time, cancelled) > self.target_bytes:
+            low = 1
+            while low < high:
+                middle = (low + high) // 2
+                if self._estimate(middle, estimates, frames, timestamps, end_time, cancelled) <= self.target_bytes:
+                    high = middle
+                else:
+                    low = middle + 1
+        else:
+            high = 0
+        estimate = self._estimate(high, estimates, frames, timestamps, end_time, cancelled)
+        return SizePlan(self.ladder[high], estimate, self.target_bytes, time.perf_counter() - start,
+                        {self.ladder[position]: value for position, value in sorted(estimates.items())})
+
+    def _estimate(self, position, estimates, frames, timestamps, end_time, cancelled):
+        '''函数功能:返回阶梯上第position级设置的估计字节数,结果记录在estimates中,每级只估计一次'''
+        if position not in estimates:
+            estimates[position] = self.estimateSize(frames, timestamps, end_time, self.ladder[position], cancelled)
+        return estimates[position]
+
+    def estimateSize(self, frames, timestamps, end_time, settings, cancelled=None):
+        '''函数功能:返回按settings编码整段录制的估计字节数(帧数不多时为准确值)'''
+        step, scale, colors = settings
+        indices = range(0, len(timestamps), step)
+        if len(indices) <= (SAMPLE_WINDOWS + 1) * WINDOW_FRAMES:
+            # 采样帧数已经覆盖全部保留帧，直接编码
+            return self._encodedBytes(frames, timestamps, indices, end_time, settings, cancelled)
+        activity = self._activity(frames, timestamps, step, cancelled)
+        model = self.models.get((scale, colors))
+        if model is None:
+            model = self.models[(scale, colors)] = self._fitModel(frames, timestamps, settings, cancelled)
+        key, overhead, centers, ratios = model
+        # 每次帧间变化使用时间上最近的采样段的每像素字节数（同一类画面往往连续出现）
+        later = (np.arange(len(activity)) + 1) * step
+        nearest = np.searchsorted((centers[1:] + centers[:-1]) / 2, later)
+        return round(key + overhead * np.count_nonzero(activity) + float(np.dot(ratios[nearest], activity)))
+
+    def _activity(self, frames, timestamps, step, cancelled):
+        '''函数功能:返回按抽帧步长step保留的帧之间的变化量,同一步长只计算一次'''
+        activity = self.activity.get(step)
+        if activity is None:
+            activity = self.activity[step] = frame_activity(frames, range(0, len(timestamps), step), cancelled)
+        return activity
+
+    def _fitModel(self, frames, timestamps, settings, cancelled):
+        """
+        把采样片段首尾相接编码一次，拟合输出大小的模型，
+        返回 (第一帧的字节数, 每帧固定开销, 各采样段中心的帧序号数组, 各采样段每个变化像素的字节数数组)。
+        """
+        # 采样片段从不抽帧的全部帧中挑选，各抽帧步长共用
+        activity = self._activity(frames, timestamps, 1, cancelled)
+        windows = sample_windows(activity)
+        indices = [index for first, last in windows for index in range(first, last)]
+        if cancelled is not None and cancelled():
+            raise EncodingCancelled('编码已取消')
+        encoder = self.make_encoder(settings)
+        encoder.frame_sizes = []
+        try:
+            for index in indices:
+                encoder.submit(frames[index], timestamps[index])
+            # 最后一帧的显示时长不影响大小
+            encoder.finish(timestamps[indices[-1]] + 1.0)
+        finally:
+            encoder.discard()
+        # 每个采样帧的字节数（与上一帧合并的帧为0），第一帧含文件头
+        sizes = np.zeros(len(indices))
+        written = 0
+        for position, total in encoder.frame_sizes:
+            sizes[position], written = total - written, total
+        # 各段段内有变化的帧的 (变化像素数, 字节数)；段首接在另一段之后，不参与拟合
+        samples, position = [], 0
+        for first, last in windows:
+            pairs = np.array([(activity[index - 1], sizes[position + index - first])
+                              for index in range(first + 1, last)], float).reshape(-1, 2)
+            samples.append(pairs[pairs[:, 0] > 0])
+            position += last - first
+        pixels, counts = np.concatenate(samples).T
+        if not len(pixels):
+            return sizes[0], 0.0, np.zeros(1), np.zeros(1)
+        # 固定开销由全部样本最小二乘拟合 字节数 = 固定开销 + 每像素字节数 × 变化像素数 得到（不能为负）
+        overhead, _ = np.linalg.lstsq(np.stack([np.ones_like(pixels), pixels], axis=1), counts, rcond=None)[0]
+        overhead = min(max(overhead, 0.0), counts.min())
+        # 每段的每像素字节数单独计算，没有变化的段使用全部样本的平均值
+        average = max(counts.sum() - overhead * len(counts), 0.0) / pixels.sum()
+        ratios = np.array([max(pairs[:, 1].sum() - overhead * len(pairs), 0.0) / pairs[:, 0].sum() if len(pairs)
+                           else average for pairs in samples])
+        centers = np.array([(first + last - 1) / 2 for first, last in windows])
+        return sizes[0], overhead, centers, ratios
+
+    def _encodedBytes(self, frames, timestamps, indices, end_time, settings, cancelled):
+        '''函数功能:按settings编码frames中indices指定的帧(写入临时文件),返回输出的字节数'''
+        if cancelled is not None and cancelled():
+            raise EncodingCancelled('编码已取消')
+        encoder = self.make_encoder(settings)
+        try:
+            for index in indices:
+                encoder.submit(frames[index], timestamps[index])
+            encoder.finish(end_time)
+            return os.path.getsize(encoder.temp_path)
+        finally:
+            encoder.discard()
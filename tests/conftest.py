@@ -0,0 +1,57 @@
+# 导入必要的模块
+import os  # 用于定位仓库根目录和选择Qt平台
+import sys  # 用于把仓库根目录加入模块搜索路径
+import numpy as np  # 用于生成合成截图
+import pytest  # 用于定义共享的测试夹具
+
+# 各模块都在仓库根目录下（没有安装包），测试直接按模块名导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    '''函数功能:返回整个测试会话共用的QApplication(没有显示器时使用offscreen平台)'''
+    # 测试不需要真实屏幕，截图由各测试提供的假屏幕生成
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5 import QtWidgets  # 用于创建Qt应用（用到时才导入）
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def moving_square(index, width, height):
+    '''函数功能:返回灰色背景上一个白色方块逐帧右移的BGRX帧数组(第index次截图)'''
+    arr = np.full((height, width, 4), 64, np.uint8)
+    size = max(1, min(width, height) // 4)
+    left = index % max(1, width - size + 1)
+    arr[:size, left:left + size] = 255
+    return arr
+
+
+class FakeScreen:
+    """
+    代替 QScreen 的假屏幕：offscreen 平台上 grabWindow 只返回空图像，
+    这里由 frame(第几次截图, 宽, 高) 生成BGRX帧数组并包装为 QPixmap，grabs 记录截图次数。
+    """
+
+    def __init__(self, frame=moving_square):
+        # 生成合成画面的函数
+        self.frame = frame
+        # 已截图的次数
+        self.grabs = 0
+
+    def grabWindow(self, window, x, y, width, height):
+        '''函数功能:返回第grabs次截图的合成画面'''
+        from PyQt5 import QtGui  # 用于包装截图（用到时才导入）
+        arr = np.ascontiguousarray(self.frame(self.grabs, width, height))
+        self.grabs += 1
+        image = QtGui.QImage(arr.data, width, height, width * 4, QtGui.QImage.Format_RGB32)
+        # copy 让图像持有自己的缓冲区，之后 arr 可以释放
+        return QtGui.QPixmap.fromImage(image.copy())
+
+
+@pytest.fixture
+def fake_screen(qapp, monkeypatch):
+    '''函数功能:用FakeScreen代替QApplication.primaryScreen,返回假屏幕'''
+    from PyQt5 import QtWidgets  # 用于替换主屏幕（用到时才导入）
+    screen = FakeScreen()
+    monkeypatch.setattr(QtWidgets.QApplication, 'primaryScreen', staticmethod(lambda: screen))
+    return screen
@@ -0,0 +1,115 @@
+# 导入必要的模块
+import numpy as np  # 用于构造测试帧
+import pytest  # 测试框架
+from PIL import Image  # 用于解码写出的动画
+from backends import (ApngBackend, GifBackend, Mp4Backend, WebPBackend, backend_for_filter, backend_for_path,
+                      backend_options)  # 被测试的输出后端
+from pipeline import DurationRounder, StreamingEncoder  # 编码流水线和帧时长取整
+
+
+def make_frames():
+    '''函数功能:返回一段逐帧局部变化的BGRX帧序列,变化区域的偏移量有奇数也有偶数'''
+    rng = np.random.default_rng(0)
+    frame = np.full((21, 30, 4), 255, np.uint8)
+    frame[..., :3] = rng.integers(0, 256, (21, 30, 3), np.uint8)
+    frames = [frame]
+    for x, y in ((3, 5), (8, 2), (11, 7), (0, 0)):
+        frame = frame.copy()
+        frame[y:y + 5, x:x + 7, :3] = rng.integers(0, 256, (5, 7, 3), np.uint8)
+        frames.append(frame)
+    # 与上一帧相同的帧被合并
+    frames.append(frame.copy())
+    return frames
+
+
+def encode(backend, frames, tmp_path, **options):
+    '''函数功能:用指定后端编码帧序列(每帧0.1秒),返回编码器和输出路径'''
+    encoder = StreamingEncoder(directory=str(tmp_path), backend=backend, backend_options=options)
+    for index, frame in enumerate(frames):
+        encoder.submit(frame, index * 0.1)
+    encoder.finish(len(frames) * 0.1)
+    path = str(tmp_path / ('out' + backend.extension))
+    encoder.save(path)
+    return encoder, path
+
+
+def decode(path):
+    '''函数功能:用Pillow解码动画,返回每帧合成后的BGR数组列表和每帧的时长'''
+    frames, durations = [], []
+    with Image.open(path) as image:
+        for position in range(image.n_frames):
+            image.seek(position)
+            frames.append(np.asarray(image.convert('RGB'))[..., ::-1])
+            durations.append(image.info['duration'])
+    return frames, durations
+
+
+@pytest.mark.parametrize('backend, options', [(ApngBackend, {}), (WebPBackend, {'lossless': True})])
+def test_lossless_round_trip(tmp_path, backend, options):
+    '''APNG和无损WebP写入带偏移量的子图,解码得到的每帧画面与输入完全一致,重复帧延长上一帧的时长'''
+    frames = make_frames()
+    encoder, path = encode(backend, frames, tmp_path, **options)
+    decoded, durations = decode(path)
+    assert encoder.differ.frames_merged == 1
+    assert durations == [100, 100, 100, 100, 200]
+    for result, frame in zip(decoded, frames):
+        np.testing.assert_array_equal(result, frame[..., :3])
+
+
+def test_lossy_webp(tmp_path):
+    frames = make_frames()
+    _, path = encode(WebPBackend, frames, tmp_path, quality=90)
+    decoded, _ = decode(path)
+    assert len(decoded) == 5
+    assert decoded[-1].shape == (21, 30, 3)
+
+
+def test_webp_offsets_are_aligned(tmp_path):
+    '''WebP的偏移量必须为偶数:奇数偏移的变化区域向左上扩展一个像素,右下边界不变'''
+    encoder = StreamingEncoder(directory=str(tmp_path), backend=WebPBackend)
+    arr = np.zeros((20, 20, 4), np.uint8)
+    x, y, sub = encoder._alignRegion(arr, 3, 5, arr[5:9, 3:10])
+    assert (x, y) == (2, 4)
+    assert sub.shape[:2] == (5, 8)
+    assert encoder._alignRegion(arr, 4, 6, arr[6:9, 4:10])[:2] == (4, 6)
+    encoder.finish(0.0)
+    encoder.discard()
+
+
+def test_mp4_encodes_whole_frames(tmp_path):
+    '''MP4不接受子图:编码整帧,奇数宽高补齐为偶数,按时长重复帧'''
+    frames = make_frames()
+    encoder, path = encode(Mp4Backend, frames, tmp_path, fps=10)
+    import imageio  # 用于读取MP4（用到时才导入）
+    with imageio.get_reader(path, format='FFMPEG') as reader:
+        decoded = [frame for frame in reader]
+    assert len(decoded) == 6
+    assert decoded[0].shape == (22, 30, 3)
+
+
+def test_mp4_encode_pads_odd_sizes():
+    arr = np.arange(3 * 5 * 4, dtype=np.uint8).reshape(3, 5, 4)
+    out = Mp4Backend.encode(arr)
+    assert out.shape == (4, 6, 3)
+    np.testing.assert_array_equal(out[:3, :5], arr[..., 2::-1])
+    np.testing.assert_array_equal(out[3, :5], out[2, :5])
+    np.testing.assert_array_equal(out[:, 5], out[:, 4])
+
+
+def test_backend_selection():
+    assert backend_for_path('a.GIF') is GifBackend
+    assert backend_for_path('a.apng') is ApngBackend
+    assert backend_for_path('a.webp') is WebPBackend
+    assert backend_for_path('a.unknown') is GifBackend
+    assert backend_for_filter(Mp4Backend.file_filter) is Mp4Backend
+    assert backend_options(Mp4Backend, 20, 4.0) == {'fps': 60}
+    assert backend_options(GifBackend, 20, 1.0) == {}
+
+
+@pytest.mark.parametrize('step, minimum', [(1, 1), (40, 40)])
+def test_rounder_step(step, minimum):
+    '''其他输出格式的取整步长和最小时长'''
+    rounder = DurationRounder(1.0, step, minimum)
+    durations = [rounder.round(1 / 24) for _ in range(24)]
+    assert all(ms % step == 0 and ms >= minimum for ms in durations)
+    assert abs(sum(durations) - 1000) <= step
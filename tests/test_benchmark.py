@@ -0,0 +1,52 @@
+# 导入必要的模块
+import copy  # 用于构造退化的基准数据
+import json  # 用于读取保存的基准数据
+import numpy as np  # 用于比较合成帧
+import pytest  # 测试框架
+import benchmark  # 被测试的性能基准测试
+from frame_convert import qimage_to_frame  # 用于读取合成帧的像素
+
+
+@pytest.mark.parametrize('kind', benchmark.SEQUENCES)
+def test_sequences_are_reproducible(qapp, kind):
+    first = benchmark.make_sequence(kind, 48, 40, 3)
+    second = benchmark.make_sequence(kind, 48, 40, 3)
+    assert len(first) == 3
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(qimage_to_frame(a), qimage_to_frame(b))
+    # 静止画面每帧相同，其他序列相邻帧不同
+    same = np.array_equal(qimage_to_frame(first[0]), qimage_to_frame(first[1]))
+    assert same == (kind == 'static')
+
+
+def test_compare_conversions(qapp):
+    result = benchmark.compare_conversions(65, 33, repeat=1)
+    assert result['stride_correct'] is True
+    assert result['zero_copy_bytes_copied'] == 0
+    assert result['copy_bytes_copied'] == 2 * 65 * 33 * 4
+
+
+def test_suite_and_regressions(qapp, tmp_path, capsys):
+    '''保存基准后与之比较:同一结果没有退化,吞吐量或输出大小变差时报告退化,退出码为1'''
+    baseline_path = str(tmp_path / 'baseline.json')
+    argv = ['--sequences', 'cursor', '--sizes', '64x48', '--frames', '4']
+    assert benchmark.main(argv + ['--out', str(tmp_path / 'out.json'), '--save-baseline', baseline_path]) == 0
+    with open(baseline_path, encoding='utf-8') as f:
+        result = json.load(f)
+    case = result['cases']['cursor@64x48']
+    assert {'convert', 'diff', 'quantize', 'gif_write', 'end_to_end'} <= set(case['stages'])
+    assert case['output_bytes'] > 0
+    assert benchmark.compare(result, result) == []
+
+    faster = copy.deepcopy(result)
+    faster['cases']['cursor@64x48']['stages']['diff']['fps'] = case['stages']['diff']['fps'] * 10
+    faster['cases']['cursor@64x48']['output_bytes'] = case['output_bytes'] // 2
+    regressions = benchmark.compare(result, faster)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('cursor@64x48 diff')
+
+    with open(baseline_path, 'w', encoding='utf-8') as f:
+        json.dump(faster, f)
+    capsys.readouterr()
+    assert benchmark.main(argv + ['--baseline', baseline_path]) == 1
+    assert '退化' in capsys.readouterr().err
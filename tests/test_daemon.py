@@ -0,0 +1,153 @@
+# 导入必要的模块
+import json  # 用于发送无效请求和解析客户端输出
+import os  # 用于检查输出文件和临时文件
+import shutil  # 用于删除套接字目录
+import socket  # 用于发送原始请求
+import tempfile  # 用于创建较短的套接字路径
+import threading  # 用于在后台线程中等待守护进程的回复
+import time  # 用于等待录制进行一段时间
+import pytest  # 测试框架
+from PyQt5 import QtCore  # 用于在等待回复时处理守护进程的事件
+import recorderctl  # 被测试的客户端
+from recorder_daemon import RecorderDaemon  # 被测试的守护进程
+
+
+def pump(target, timeout=20):
+    '''函数功能:在后台线程中执行target,同时处理Qt事件(守护进程在本线程中运行),返回它的结果'''
+    outcome = {}
+
+    def run():
+        try:
+            outcome['value'] = target()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    timer = QtCore.QElapsedTimer()
+    timer.start()
+    while thread.is_alive():
+        assert timer.elapsed() < timeout * 1000, '等待守护进程回复超时'
+        QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.AllEvents, 20)
+        thread.join(0.002)
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['value']
+
+
+def wait_until(condition, timeout=20):
+    '''函数功能:处理Qt事件直到condition()为真'''
+    timer = QtCore.QElapsedTimer()
+    timer.start()
+    while not condition():
+        assert timer.elapsed() < timeout * 1000, '等待守护进程超时'
+        QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.AllEvents, 20)
+
+
+@pytest.fixture
+def daemon(fake_screen):
+    '''函数功能:在本进程中启动一个已预热的守护进程,测试结束后关闭'''
+    # Unix 套接字路径有长度限制，不放在 pytest 的临时目录中
+    directory = tempfile.mkdtemp(prefix='recorder-')
+    daemon = RecorderDaemon(os.path.join(directory, 'daemon.sock'))
+    daemon.listen()
+    daemon.warmUp()
+    yield daemon
+    daemon.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def call(daemon, **request):
+    '''函数功能:通过客户端发送一个请求并返回回复'''
+    return pump(lambda: recorderctl.send_request(request, daemon.path, timeout=20))
+
+
+def test_status_when_idle(daemon):
+    reply = call(daemon, command='status')
+    assert reply['ok'] is True
+    assert reply['pid'] == os.getpid()
+    assert reply['recording'] is False
+    assert reply['saving'] == 0
+    assert reply['last'] is None
+
+
+def test_invalid_requests(daemon):
+    assert call(daemon, command='pause') == {'ok': False, 'error': '未知命令：pause'}
+    assert call(daemon, command='stop') == {'ok': False, 'error': '没有正在进行的录制'}
+
+    def send_garbage():
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(daemon.path)
+            connection.sendall(b'not json\n')
+            return json.loads(connection.makefile('rb').readline())
+
+    assert pump(send_garbage)['ok'] is False
+
+
+@pytest.mark.parametrize('field', [{'palette': 'bogus'}, {'format': 'bmp'}, {'fps': -1}, {'rect': '0,0'}])
+def test_bad_start_request_creates_nothing(daemon, tmp_path, field):
+    '''参数不合法的 start 在创建流水线之前就被拒绝,输出目录中不留下临时文件'''
+    request = dict({'rect': '0,0,40,30', 'out': str(tmp_path / 'out.gif')}, **field)
+    reply = call(daemon, command='start', **request)
+    assert reply['ok'] is False
+    assert os.listdir(tmp_path) == []
+    assert daemon.current is None and daemon.sessions == []
+
+
+def test_start_status_stop(daemon, tmp_path, fake_screen):
+    '''start 截下第一帧后回复,录制期间不能再次 start,stop 保存完成后回复统计信息'''
+    out = str(tmp_path / 'out.gif')
+    reply = call(daemon, command='start', rect='0,0,40,30', out=out, fps=20)
+    assert reply['ok'] is True, reply
+    assert reply['output'] == out
+    assert reply['format'] == 'gif'
+    assert reply['latency_ms'] >= 0
+
+    assert call(daemon, command='start', rect='0,0,40,30', out=out) == {'ok': False, 'error': '已有录制正在进行'}
+    status = call(daemon, command='status')
+    assert status['recording'] is True
+    assert status['output'] == out
+    pump(lambda: time.sleep(0.3))
+
+    reply = call(daemon, command='stop')
+    assert reply['ok'] is True, reply
+    assert reply['frames'] >= 2
+    assert reply['output_bytes'] == os.path.getsize(out)
+    assert os.listdir(tmp_path) == ['out.gif']
+    status = call(daemon, command='status')
+    assert status['recording'] is False
+    assert status['last'] == reply
+
+
+def test_stop_without_waiting(daemon, tmp_path):
+    out = str(tmp_path / 'out.webp')
+    assert call(daemon, command='start', rect='0,0,40,30', out=out)['ok'] is True
+    assert call(daemon, command='stop', wait=False) == {'ok': True, 'output': out, 'saving': True}
+    # 等待后台保存结束
+    wait_until(lambda: not daemon.sessions)
+    assert daemon.last_result['ok'] is True
+    assert os.path.exists(out)
+
+
+def test_shutdown_cancels_recording(daemon, tmp_path):
+    '''shutdown 取消正在进行的录制,删除临时文件,停止监听'''
+    assert call(daemon, command='start', rect='0,0,40,30', out=str(tmp_path / 'out.gif'))['ok'] is True
+    assert call(daemon, command='shutdown') == {'ok': True}
+    assert daemon.sessions == []
+    assert os.listdir(tmp_path) == []
+    assert not daemon.server.isListening()
+
+
+def test_second_daemon_refuses_to_start(daemon):
+    with pytest.raises(RuntimeError):
+        RecorderDaemon(daemon.path).listen()
+
+
+def test_client_prints_reply(daemon, capsys):
+    assert pump(lambda: recorderctl.main(['--socket', daemon.path, 'status'])) == 0
+    assert json.loads(capsys.readouterr().out)['ok'] is True
+
+
+def test_client_reports_missing_daemon(tmp_path, capsys):
+    assert recorderctl.main(['--socket', str(tmp_path / 'missing.sock'), 'status']) == 1
+    assert json.loads(capsys.readouterr().out)['error'].startswith('无法与守护进程通信')
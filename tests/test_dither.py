@@ -0,0 +1,96 @@
+# 导入必要的模块
+import numpy as np  # 用于构造测试帧和比较矩阵
+import pytest  # 测试框架
+from dither import DITHER_ORDERED, DITHER_SPREAD, MATRIX_SIZES, bayer_matrix, ordered_dither  # 被测试的Bayer矩阵和有序抖动
+from palette import PALETTE_GLOBAL  # 共享调色板模式
+from pipeline import StreamingEncoder  # 用于检查流水线中的抖动
+from test_pipeline import decode  # 解码写出的GIF
+
+
+def test_small_matrices():
+    np.testing.assert_array_equal(bayer_matrix(1), [[0]])
+    np.testing.assert_array_equal(bayer_matrix(2), [[0, 2], [3, 1]])
+    np.testing.assert_array_equal(bayer_matrix(4), [[0, 8, 2, 10],
+                                                    [12, 4, 14, 6],
+                                                    [3, 11, 1, 9],
+                                                    [15, 7, 13, 5]])
+
+
+@pytest.mark.parametrize('size', [2, 4, 8, 16])
+def test_matrix_is_permutation(size):
+    '''矩阵包含 0 ~ size²-1 的每个阈值序号各一次,四个象限为上一级矩阵的 4M、4M+2、4M+3、4M+1'''
+    matrix = bayer_matrix(size)
+    assert matrix.shape == (size, size)
+    np.testing.assert_array_equal(np.sort(matrix.ravel()), np.arange(size * size))
+    half = size // 2
+    smaller = bayer_matrix(half)
+    np.testing.assert_array_equal(matrix[:half, :half], 4 * smaller)
+    np.testing.assert_array_equal(matrix[:half, half:], 4 * smaller + 2)
+    np.testing.assert_array_equal(matrix[half:, :half], 4 * smaller + 3)
+    np.testing.assert_array_equal(matrix[half:, half:], 4 * smaller + 1)
+
+
+@pytest.mark.parametrize('size', [0, 3, 6, -4])
+def test_invalid_size(size):
+    with pytest.raises(ValueError):
+        bayer_matrix(size)
+
+
+def reference_dither(arr, size, offset=(0, 0)):
+    '''函数功能:逐像素按定义计算有序抖动:加上画布位置对应的偏移后限制在0~255'''
+    offsets = (bayer_matrix(size) * 2 + 1) * DITHER_SPREAD // (2 * size * size) - DITHER_SPREAD // 2
+    height, width = arr.shape[:2]
+    rows = (np.arange(height) + offset[1]) % size
+    cols = (np.arange(width) + offset[0]) % size
+    return np.clip(arr.astype(np.int16) + offsets[rows[:, None], cols[None, :], None], 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize('size', MATRIX_SIZES)
+@pytest.mark.parametrize('shape', [(1, 1), (7, 13), (37, 50)])
+def test_ordered_dither_matches_definition(size, shape):
+    rng = np.random.default_rng(size)
+    arr = rng.integers(0, 256, shape + (4,), np.uint8)
+    # 包含两端的值，检查限幅
+    arr[0, 0] = 0
+    arr[-1, -1] = 255
+    np.testing.assert_array_equal(ordered_dither(arr, size), reference_dither(arr, size))
+
+
+def test_sub_image_is_aligned_to_canvas():
+    '''子图按自己在画布中的偏移抖动,结果与整帧抖动后裁剪的结果相同'''
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 256, (40, 48, 4), np.uint8)
+    whole = ordered_dither(arr, 8)
+    np.testing.assert_array_equal(ordered_dither(arr[5:31, 11:42], 8, (11, 5)), whole[5:31, 11:42])
+
+
+def test_flat_area_keeps_mean():
+    '''平坦区域抖动后的平均值基本不变,每个矩阵周期内的图案相同'''
+    arr = np.full((16, 16, 4), 100, np.uint8)
+    out = ordered_dither(arr, 4).astype(np.int32)
+    assert abs(out[..., :3].mean() - 100) < 1
+    np.testing.assert_array_equal(out[:4, :4], out[12:, 8:12])
+
+
+def test_pipeline_dither_is_stable_between_frames(tmp_path):
+    '''有序抖动只取决于画布位置:子图中未变化的像素与上一帧抖动得到的颜色完全相同'''
+    gradient = np.zeros((24, 64, 4), np.uint8)
+    gradient[..., :3] = np.linspace(0, 255, 64, dtype=np.uint8)[None, :, None]
+    # 只改变两个像素（用渐变中已有的颜色），变化区域的外接矩形中其余像素都未变化
+    changed = gradient.copy()
+    changed[9, 21] = gradient[0, 50]
+    changed[14, 30] = gradient[0, 5]
+    encoder = StreamingEncoder(directory=str(tmp_path), palette_mode=PALETTE_GLOBAL, dither=DITHER_ORDERED,
+                               dither_size=8, colors=16)
+    encoder.submit(gradient, 0.0)
+    encoder.submit(changed, 0.1)
+    encoder.finish(0.2)
+    assert encoder.palettes_built == 1
+    path = str(tmp_path / 'out.gif')
+    encoder.save(path)
+    first, second = decode(path)[0]
+    unchanged = np.ones((24, 64), bool)
+    unchanged[9, 21] = unchanged[14, 30] = False
+    np.testing.assert_array_equal(first[unchanged], second[unchanged])
+    # 16色的调色板表示不了整个渐变，抖动后同一列中交替使用相邻的颜色
+    assert len(np.unique(first[:, 40], axis=0)) > 1
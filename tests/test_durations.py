@@ -0,0 +1,37 @@
+# 导入必要的模块
+import pytest  # 测试框架
+from pipeline import DurationRounder, compute_frame_durations  # 被测试的帧时长计算
+
+
+def test_empty():
+    assert compute_frame_durations([], 1.0, 1.0) == []
+
+
+def test_rounding_error_is_carried():
+    '''30帧/秒的时间戳逐帧取整到10毫秒,误差带到下一帧,总时长不偏移'''
+    timestamps = [i / 30 for i in range(30)]
+    durations = compute_frame_durations(timestamps, 1.0, 1.0)
+    assert len(durations) == 30
+    assert all(ms % 10 == 0 for ms in durations)
+    assert set(durations) == {30, 40}
+    assert sum(durations) == 1000
+
+
+def test_last_frame_lasts_until_end_time():
+    assert compute_frame_durations([0.0, 0.5], 2.0, 1.0) == [500, 1500]
+    # 结束时间早于最后一帧时按0秒处理，仍不短于最小时长
+    assert compute_frame_durations([0.0, 0.5], 0.4, 1.0) == [500, 20]
+
+
+def test_speed_multiplier():
+    assert compute_frame_durations([0.0, 0.2, 0.4], 0.6, 2.0) == [100, 100, 100]
+    assert compute_frame_durations([0.0, 0.2, 0.4], 0.6, 0.5) == [400, 400, 400]
+
+
+def test_minimum_duration():
+    '''短于最小时长的帧按最小时长输出,多出的时间从后面的帧中扣除'''
+    durations = compute_frame_durations([0.0, 0.005, 0.01, 0.1], 0.2, 1.0)
+    assert durations[:2] == [20, 20]
+    assert min(durations) >= 20
+    assert sum(durations) == pytest.approx(200, abs=10)
+
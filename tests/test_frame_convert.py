@@ -0,0 +1,66 @@
+# 导入必要的模块
+import numpy as np  # 用于构造测试图像数据
+import pytest  # 测试框架
+from PyQt5 import QtGui  # 用于构造QImage
+from frame_convert import frame_to_image, qimage_to_frame  # 被测试的帧转换
+
+
+def make_pixels(height, width):
+    '''函数功能:返回每个像素都不同的(高, 宽, 4) BGRX数组(X通道为255)'''
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (height, width, 4), np.uint8)
+    pixels[..., 3] = 255
+    return pixels
+
+
+def padded_image(pixels, padding):
+    '''函数功能:把BGRX数组包装为每行末尾有padding字节填充的Format_RGB32 QImage,同时返回它引用的缓冲区'''
+    height, width = pixels.shape[:2]
+    stride = width * 4 + padding
+    buffer = np.full((height, stride), 0xAB, np.uint8)
+    buffer[:, :width * 4] = pixels.reshape(height, -1)
+    # QImage 直接引用 buffer（copy 会去掉行尾填充），调用方需要在使用期间保留 buffer
+    return QtGui.QImage(buffer.data, width, height, stride, QtGui.QImage.Format_RGB32), buffer
+
+
+@pytest.mark.parametrize('width, padding', [(7, 12), (13, 4), (16, 0)])
+def test_stride_is_respected(width, padding):
+    '''行尾有填充字节时按真实行跨度读取,填充字节不会被当成像素'''
+    pixels = make_pixels(5, width)
+    image, buffer = padded_image(pixels, padding)
+    frame = qimage_to_frame(image)
+    assert frame.shape == (5, width, 4)
+    assert frame.strides[0] == image.bytesPerLine() == width * 4 + padding
+    np.testing.assert_array_equal(frame, pixels)
+
+
+def test_native_format_is_not_copied():
+    image, buffer = padded_image(make_pixels(4, 6), 8)
+    frame = qimage_to_frame(image)
+    assert frame.qimage is image
+    assert frame.ctypes.data == buffer.ctypes.data
+    assert not frame.flags.writeable
+
+
+def test_other_formats_are_converted():
+    '''非原生格式(这里是每行3字节的奇数宽度RGB888)先转换为RGB32'''
+    pixels = make_pixels(3, 5)
+    rgb = np.ascontiguousarray(pixels[..., 2::-1])
+    image = QtGui.QImage(rgb.data, 5, 3, 15, QtGui.QImage.Format_RGB888).copy()
+    frame = qimage_to_frame(image)
+    np.testing.assert_array_equal(frame[..., :3], pixels[..., :3])
+
+
+def test_null_image_raises():
+    with pytest.raises(ValueError):
+        qimage_to_frame(QtGui.QImage())
+
+
+def test_frame_to_image_on_cropped_views():
+    '''裁剪得到的子视图按原有行跨度转换,得到去掉X通道的RGB图像'''
+    pixels = make_pixels(9, 11)
+    image, buffer = padded_image(pixels, 20)
+    view = qimage_to_frame(image)[2:7, 3:10]
+    result = np.asarray(frame_to_image(view))
+    assert result.shape == (5, 7, 3)
+    np.testing.assert_array_equal(result, pixels[2:7, 3:10, 2::-1])
@@ -0,0 +1,98 @@
+# 导入必要的模块
+import numpy as np  # 用于构造测试帧
+from frame_diff import FrameDiffer, MotionDetector, count_changed  # 被测试的相邻帧差异检测、运动检测和变化计数
+
+
+def test_first_frame_is_kept_whole():
+    differ = FrameDiffer()
+    arr = np.zeros((6, 8, 4), np.uint8)
+    x, y, sub = differ.diff(arr)
+    assert (x, y) == (0, 0)
+    assert sub is arr
+
+
+def test_duplicate_is_merged():
+    differ = FrameDiffer()
+    arr = np.zeros((6, 8, 4), np.uint8)
+    differ.diff(arr)
+    assert differ.diff(arr.copy()) is None
+    assert differ.frames_total == 2
+    assert differ.frames_merged == 1
+    assert differ.pixels_skipped == 6 * 8
+
+
+def test_changed_region_is_cropped():
+    '''变化帧裁剪到变化像素的外接矩形,偏移为矩形左上角'''
+    differ = FrameDiffer()
+    first = np.zeros((6, 8, 4), np.uint8)
+    second = first.copy()
+    second[1, 2, 0] = 1
+    second[3, 5, 3] = 1
+    differ.diff(first)
+    x, y, sub = differ.diff(second)
+    assert (x, y) == (2, 1)
+    np.testing.assert_array_equal(sub, second[1:4, 2:6])
+    assert differ.pixels_skipped == 6 * 8 - 3 * 4
+    # 之后与最新的保留帧比较
+    assert differ.diff(second.copy()) is None
+
+
+def test_size_change_keeps_whole_frame():
+    differ = FrameDiffer()
+    differ.diff(np.zeros((6, 8, 4), np.uint8))
+    arr = np.zeros((4, 4, 4), np.uint8)
+    assert differ.diff(arr)[:2] == (0, 0)
+    assert differ.frames_merged == 0
+
+
+def test_motion_detector_first_frame_and_size_change():
+    detector = MotionDetector()
+    assert detector.changed(np.zeros((8, 8, 4), np.uint8))
+    assert not detector.changed(np.zeros((8, 8, 4), np.uint8))
+    assert detector.changed(np.zeros((4, 8, 4), np.uint8))
+
+
+def test_motion_detector_cycles_grid_phase():
+    '''单个像素的变化只在网格相位经过它时被发现,step²次之内一定会被发现'''
+    detector = MotionDetector(step=4)
+    still = np.zeros((16, 16, 4), np.uint8)
+    moved = still.copy()
+    moved[6, 9, 0] = 1
+    detector.changed(still)
+    results = []
+    for _ in range(16):
+        results.append(detector.changed(moved))
+        # 每次都与静止画面比较
+        detector.previous = still
+    assert results.count(True) == 1
+    # 相位 (dy, dx) = (2, 1) 是第 2*4+1 次检测
+    assert results.index(True) == 9
+
+
+def test_motion_detector_sees_large_changes_immediately():
+    detector = MotionDetector(step=4)
+    still = np.zeros((16, 16, 4), np.uint8)
+    moved = still.copy()
+    moved[4:8, 8:12] = 255
+    detector.changed(still)
+    assert detector.changed(moved)
+
+
+def test_count_changed():
+    previous = np.full((10, 12, 4), 255, np.uint8)
+    arr = previous.copy()
+    assert count_changed(arr, previous) == 0
+    # 同一像素的多个通道变化只计一次
+    arr[0, 0, :3] = 0
+    arr[5, 7, 1] = 0
+    arr[9, 11, 2] = 254
+    assert count_changed(arr, previous) == 3
+
+
+def test_count_changed_on_cropped_views():
+    '''裁剪得到的不连续视图按原有行跨度比较'''
+    previous = np.zeros((10, 12, 4), np.uint8)
+    arr = previous.copy()
+    arr[2:4, 3:6, 0] = 1
+    arr[0, 0, 0] = 1
+    assert count_changed(arr[1:5, 2:8], previous[1:5, 2:8]) == 6
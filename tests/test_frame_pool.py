@@ -0,0 +1,100 @@
+# 导入必要的模块
+import threading  # 用于检查没有空闲槽时的等待
+import numpy as np  # 用于构造测试帧
+import pytest  # 测试框架
+from PyQt5 import QtGui  # 用于构造截图
+from frame_pool import FramePool, copy_pixmap  # 被测试的帧缓冲池
+from pipeline import EncodingCancelled, StreamingEncoder  # 编码流水线
+from test_pipeline import decode, make_frame  # 生成测试帧和解码GIF
+
+# 测试帧的形状
+SHAPE = (20, 32, 4)
+
+
+def test_refcount_and_reuse():
+    '''引用计数减到0时槽回到空闲列表,最近归还的槽最先复用,缓冲区只分配一次'''
+    pool = FramePool(3)
+    first = pool.acquire(SHAPE)
+    second = pool.acquire(SHAPE)
+    assert first != second
+    assert pool.frame(first).shape == SHAPE
+    pool.retain(first)
+    pool.release(first)
+    assert first not in pool.free
+    pool.release(first)
+    assert pool.free[-1] == first
+    assert pool.acquire(SHAPE) == first
+    assert pool.stats() == {'slots': 3, 'allocations': 1, 'waits': 0}
+
+
+def test_shape_change_requires_free_slots():
+    pool = FramePool(2)
+    slot = pool.acquire(SHAPE)
+    with pytest.raises(ValueError):
+        pool.acquire((10, 10, 4))
+    pool.release(slot)
+    pool.acquire((10, 10, 4))
+    assert pool.stats()['allocations'] == 2
+
+
+def test_acquire_waits_for_release():
+    pool = FramePool(1)
+    slot = pool.acquire(SHAPE)
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(pool.acquire(SHAPE)))
+    thread.start()
+    thread.join(0.2)
+    assert acquired == []
+    pool.release(slot)
+    thread.join(5)
+    assert acquired == [slot]
+    assert pool.stats()['waits'] == 1
+
+
+def test_copy_pixmap(qapp):
+    arr = make_frame(0)
+    pixmap = QtGui.QPixmap.fromImage(QtGui.QImage(arr.data, 32, 20, QtGui.QImage.Format_RGB32).copy())
+    pool = FramePool(1)
+    frame = copy_pixmap(pixmap, pool.frame(pool.acquire(SHAPE)))
+    np.testing.assert_array_equal(frame[..., :3], arr[..., :3])
+    with pytest.raises(ValueError):
+        copy_pixmap(QtGui.QPixmap(), frame)
+
+
+def submit_pooled(encoder, pool, frames):
+    '''函数功能:像录制线程一样把每帧复制进缓冲池的槽,连同槽号提交给流水线'''
+    for index, arr in enumerate(frames):
+        slot = pool.acquire(arr.shape)
+        pool.frame(slot)[...] = arr
+        encoder.submit(pool.frame(slot), index * 0.1, slot)
+
+
+def test_slots_are_released_after_encoding(tmp_path):
+    '''槽数少于帧数时槽被反复复用,编码结果不受影响,重复帧的槽也被归还'''
+    frames = [make_frame(0), make_frame(0), make_frame(1), make_frame(2), make_frame(2), make_frame(3)]
+    pool = FramePool(3)
+    encoder = StreamingEncoder(directory=str(tmp_path), frame_pool=pool)
+    submit_pooled(encoder, pool, frames)
+    encoder.finish(0.6)
+    assert encoder.differ.frames_merged == 2
+    assert sorted(pool.free) == [0, 1, 2]
+    assert pool.stats()['allocations'] == 1
+
+    path = str(tmp_path / 'out.gif')
+    encoder.save(path)
+    decoded, durations = decode(path)
+    assert durations == [200, 100, 200, 100]
+    for result, index in zip(decoded, (0, 2, 3, 5)):
+        np.testing.assert_array_equal(result, frames[index][..., :3])
+
+
+def test_slots_are_released_on_cancel(tmp_path):
+    pool = FramePool(3)
+    encoder = StreamingEncoder(directory=str(tmp_path), frame_pool=pool)
+    submit_pooled(encoder, pool, [make_frame(index) for index in range(3)])
+    encoder.cancel()
+    submit_pooled(encoder, pool, [make_frame(index) for index in range(3, 8)])
+    with pytest.raises(EncodingCancelled):
+        encoder.finish(1.0)
+    encoder.discard()
+    assert sorted(pool.free) == [0, 1, 2]
@@ -0,0 +1,66 @@
+# 导入必要的模块
+import numpy as np  # 用于构造测试帧
+import pytest  # 测试框架
+from frame_scale import FrameScaler, box_downscale, resample_frame  # 被测试的截图后缩小
+from pipeline import StreamingEncoder  # 用于检查流水线按缩小后的尺寸编码
+
+
+def make_frame(height, width):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (height, width, 4), np.uint8)
+
+
+@pytest.mark.parametrize('factor', [2, 3, 4])
+def test_box_downscale_averages_blocks(factor):
+    '''整数倍缩小的结果等于每个k×k块的四舍五入平均值,多余的右侧列和底部行被丢弃'''
+    arr = make_frame(5 * factor - 1, 6 * factor - 1)
+    blocks = arr[:4 * factor, :5 * factor].reshape(4, factor, 5, factor, 4).astype(np.uint32).sum(axis=(1, 3))
+    expected = (blocks + factor * factor // 2) // (factor * factor)
+    np.testing.assert_array_equal(box_downscale(arr, factor), expected)
+
+
+def test_box_matches_pillow():
+    '''整数倍时 NumPy 快速路径与 Pillow 的 BOX 重采样结果相同(允许1级舍入误差)'''
+    arr = make_frame(30, 40)
+    fast = box_downscale(arr, 2).astype(np.int16)
+    slow = resample_frame(arr, (20, 15)).astype(np.int16)
+    assert np.abs(fast - slow).max() <= 1
+
+
+def test_resample_frame_reads_strided_views():
+    arr = make_frame(30, 40)
+    view = arr[3:27, 5:35]
+    np.testing.assert_array_equal(resample_frame(view, (20, 16)), resample_frame(np.ascontiguousarray(view), (20, 16)))
+
+
+def test_scaler_paths():
+    arr = make_frame(30, 40)
+    # 50%：整数倍，走 NumPy 快速路径
+    np.testing.assert_array_equal(FrameScaler(0.5)(arr), box_downscale(arr, 2))
+    # 75%：其他比例交给 Pillow
+    out = FrameScaler(0.75)(arr)
+    assert out.shape == (22, 30, 4)
+    np.testing.assert_array_equal(out, resample_frame(arr, (30, 22)))
+
+
+def test_scaler_identity_returns_same_array():
+    arr = make_frame(30, 40)
+    assert FrameScaler()(arr) is arr
+    # 只缩小不放大
+    assert FrameScaler(2.0)(arr) is arr
+
+
+def test_target_size():
+    assert FrameScaler(max_dimension=20).targetSize(40, 30) == (20, 15)
+    assert FrameScaler(0.5, max_dimension=10).targetSize(40, 30) == (10, 8)
+    # HiDPI 截图先换算回逻辑尺寸
+    assert FrameScaler(device_pixel_ratio=2.0).targetSize(80, 60) == (40, 30)
+
+
+def test_pipeline_encodes_scaled_frames(tmp_path):
+    encoder = StreamingEncoder(directory=str(tmp_path), scaler=FrameScaler(0.5))
+    for index in range(3):
+        encoder.submit(make_frame(30, 40) // (index + 1), index * 0.1)
+    encoder.finish(0.3)
+    encoder.discard()
+    assert encoder.canvas_size == (20, 15)
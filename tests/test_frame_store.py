@@ -0,0 +1,72 @@
+# 导入必要的模块
+import os  # 用于检查暂存文件
+import numpy as np  # 用于构造测试帧
+import pytest  # 测试框架
+from frame_store import FrameRange, FrameStore  # 被测试的帧存储
+
+
+def make_frame(value, shape=(6, 8)):
+    '''函数功能:返回每个字节都由value和位置决定的BGRX帧数组'''
+    return (np.arange(shape[0] * shape[1] * 4, dtype=np.uint32).reshape(shape + (4,)) + value).astype(np.uint8)
+
+
+def test_spill_and_readback(tmp_path):
+    '''超过内存上限的旧帧转存到磁盘,按序号读回的内容与写入时相同'''
+    frame_bytes = make_frame(0).nbytes
+    store = FrameStore(memory_budget=3 * frame_bytes, directory=str(tmp_path))
+    frames = [make_frame(i) for i in range(40)]
+    for frame in frames:
+        store.append(frame)
+
+    assert len(store) == 40
+    assert store.spooled == 37
+    assert store.spool_bytes == 37 * frame_bytes
+    assert os.path.dirname(store.spool_path) == str(tmp_path)
+    for index, frame in enumerate(frames):
+        np.testing.assert_array_equal(store[index], frame)
+    np.testing.assert_array_equal(store[-1], frames[-1])
+    assert len(list(store)) == 40
+    with pytest.raises(IndexError):
+        store[40]
+
+    spool_path = store.spool_path
+    store.close()
+    assert not os.path.exists(spool_path)
+
+
+def test_no_spill_within_budget():
+    store = FrameStore(memory_budget=1 << 20)
+    for i in range(4):
+        store.append(make_frame(i))
+    assert store.spooled == 0
+    assert store.spool_path is None
+    np.testing.assert_array_equal(store[2], make_frame(2))
+    store.close()
+
+
+def test_spill_rejects_different_size(tmp_path):
+    store = FrameStore(memory_budget=1, directory=str(tmp_path))
+    store.append(make_frame(0))
+    store.append(make_frame(1))
+    store.append(make_frame(2, (4, 4)))
+    # 尺寸不同的帧在被转存时才会发现
+    with pytest.raises(ValueError):
+        store.append(make_frame(3))
+    store.close()
+
+
+def test_frame_range(tmp_path):
+    '''FrameRange 按选中的序号访问底层存储,close 释放整个存储'''
+    store = FrameStore(memory_budget=make_frame(0).nbytes, directory=str(tmp_path))
+    for i in range(10):
+        store.append(make_frame(i))
+    view = FrameRange(store, range(3, 7))
+
+    assert len(view) == 4
+    np.testing.assert_array_equal(view[0], make_frame(3))
+    for frame, i in zip(view, range(3, 7)):
+        np.testing.assert_array_equal(frame, make_frame(i))
+
+    spool_path = store.spool_path
+    view.close()
+    assert not os.path.exists(spool_path)
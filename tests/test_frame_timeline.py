@@ -0,0 +1,82 @@
+# 导入必要的模块
+import numpy as np  # 用于构造测试帧
+from PyQt5.QtCore import Qt  # 用于模型的数据角色
+from frame_timeline import ThumbnailCache, TimelineModel, TrimDialog, frame_thumbnail  # 被测试的剪辑时间线
+
+
+class CountingFrames:
+    '''按序号生成帧的假帧存储,记录每一帧被读取的次数'''
+
+    def __init__(self, count, shape=(90, 160)):
+        self.count = count
+        self.shape = shape
+        self.reads = [0] * count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        self.reads[index] += 1
+        return np.full(self.shape + (4,), index % 256, np.uint8)
+
+
+def test_frame_thumbnail_keeps_aspect_ratio(qapp):
+    frame = np.zeros((90, 160, 4), np.uint8)
+    frame[:, 80:, 2] = 255
+    image = frame_thumbnail(frame, (96, 54))
+    assert (image.width(), image.height()) == (96, 54)
+    # 左半边黑色，右半边红色
+    assert image.pixelColor(10, 27).red() == 0
+    assert image.pixelColor(85, 27).red() == 255
+    # 不放大
+    small = frame_thumbnail(frame[:9, :16], (96, 54))
+    assert (small.width(), small.height()) == (16, 9)
+
+
+def test_thumbnail_cache_is_lazy_lru(qapp):
+    '''只在未命中时读取帧,超过容量时淘汰最久未使用的一张'''
+    frames = CountingFrames(10)
+    cache = ThumbnailCache(frames, (32, 18), capacity=3)
+    assert len(cache) == 0 and sum(frames.reads) == 0
+    for index in (0, 1, 2, 0, 3):
+        cache.get(index)
+    # 0 被再次使用过，淘汰的是 1
+    assert list(cache.items) == [2, 0, 3]
+    assert (cache.hits, cache.misses) == (1, 4)
+    cache.get(1)
+    assert frames.reads[1] == 2
+    assert frames.reads[4:] == [0] * 6
+    assert cache.get(1).size().width() == 32
+
+
+def test_timeline_model(qapp):
+    frames = CountingFrames(5)
+    model = TimelineModel(ThumbnailCache(frames, (32, 18)), [1.0, 1.5, 2.0, 2.25, 3.0])
+    assert model.rowCount() == 5
+    assert model.data(model.index(2)) == '1.00s'
+    model.setRange(1, 3)
+    assert model.data(model.index(0), Qt.BackgroundRole) is not None
+    assert model.data(model.index(1), Qt.BackgroundRole) is None
+    # 只有请求图标的行才生成缩略图
+    model.data(model.index(4), Qt.DecorationRole)
+    assert frames.reads[4] == 1 and frames.reads[3] == 0
+
+
+def test_trim_dialog_selection(qapp):
+    '''设为起点/终点选定保留的一段,最后一帧的结束时间为下一帧的时间戳'''
+    timestamps = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5]
+    dialog = TrimDialog(CountingFrames(6), timestamps, 0.65)
+    assert dialog.selection() == range(0, 6)
+    assert dialog.endTime() == 0.65
+    dialog.slider.setValue(2)
+    dialog.setStart()
+    dialog.slider.setValue(4)
+    dialog.setStop()
+    assert dialog.selection() == range(2, 5)
+    assert dialog.endTime() == 0.5
+    # 终点在起点之前时起点一并移动
+    dialog.slider.setValue(1)
+    dialog.setStop()
+    assert dialog.selection() == range(1, 2)
+    dialog.resetRange()
+    assert dialog.selection() == range(0, 6)
@@ -0,0 +1,93 @@
+# 导入必要的模块
+import io  # 用于在内存中写入和读取GIF
+import numpy as np  # 用于构造测试帧和比较像素
+import pytest  # 测试框架
+from PIL import Image  # 用于构造调色板图像和解码写出的GIF
+from gif_writer import DISPOSAL_NONE, GifWriter  # 被测试的增量GIF写入器
+
+# 测试用的调色板：8种颜色
+COLORS = np.array([(0, 0, 0), (255, 255, 255), (255, 0, 0), (0, 255, 0),
+                   (0, 0, 255), (255, 255, 0), (0, 255, 255), (255, 0, 255)], np.uint8)
+PALETTE = COLORS.flatten().tolist()
+
+
+def paletted(indices):
+    '''函数功能:把调色板索引数组包装为使用测试调色板的P模式图像'''
+    image = Image.fromarray(indices.astype(np.uint8), 'P')
+    image.putpalette(PALETTE)
+    return image
+
+
+def decode(data):
+    '''函数功能:用Pillow解码GIF,返回每帧合成后的RGB数组列表和每帧的时长'''
+    frames, durations = [], []
+    with Image.open(io.BytesIO(data)) as image:
+        for position in range(image.n_frames):
+            image.seek(position)
+            frames.append(np.asarray(image.convert('RGB')))
+            durations.append(image.info['duration'])
+    return frames, durations
+
+
+@pytest.mark.parametrize('optimize', [True, False])
+def test_round_trip(optimize):
+    '''写入整帧和带偏移量的子图后,解码得到的每帧画面与逐帧叠加的结果完全一致'''
+    rng = np.random.default_rng(0)
+    width, height = 24, 16
+    first = rng.integers(0, len(COLORS), (height, width))
+    # 第二帧只有一块区域变化，以带偏移量的子图写入；第三帧整帧变化
+    patch = rng.integers(0, len(COLORS), (5, 7))
+    second = first.copy()
+    second[3:8, 10:17] = patch
+    third = rng.integers(0, len(COLORS), (height, width))
+
+    fp = io.BytesIO()
+    writer = GifWriter(fp, (width, height), palette=PALETTE, optimize=optimize)
+    writer.append(paletted(first), 100, (0, 0), DISPOSAL_NONE)
+    writer.append(paletted(patch), 50, (10, 3), DISPOSAL_NONE)
+    writer.append(paletted(third), 230, (0, 0), DISPOSAL_NONE)
+    writer.close()
+
+    frames, durations = decode(fp.getvalue())
+    assert writer.frame_count == 3
+    assert durations == [100, 50, 230]
+    for decoded, expected in zip(frames, (first, second, third)):
+        np.testing.assert_array_equal(decoded, COLORS[expected])
+
+
+def test_optimize_replaces_unchanged_pixels():
+    '''帧间透明优化把与上一帧相同的像素替换为透明色,画面不变'''
+    indices = np.arange(16 * 16).reshape(16, 16) % len(COLORS)
+    changed = indices.copy()
+    changed[0, 0] = (changed[0, 0] + 1) % len(COLORS)
+
+    fp = io.BytesIO()
+    writer = GifWriter(fp, (16, 16), palette=PALETTE)
+    writer.append(paletted(indices), 100, (0, 0), DISPOSAL_NONE)
+    writer.append(paletted(changed), 100, (0, 0), DISPOSAL_NONE)
+    writer.close()
+
+    assert writer.transparent_pixels == 16 * 16 - 1
+    frames, _ = decode(fp.getvalue())
+    np.testing.assert_array_equal(frames[1], COLORS[changed])
+
+
+def test_optimize_compares_colors_across_palettes():
+    '''每帧调色板不同(自适应调色板)时按颜色而不是索引比较,带局部颜色表的帧画面不变'''
+    indices = np.arange(12 * 12).reshape(12, 12) % len(COLORS)
+    # 第二帧用倒序的调色板表示同一画面，只有一个像素的颜色变化
+    reversed_palette = COLORS[::-1].flatten().tolist()
+    second = len(COLORS) - 1 - indices
+    second[5, 5] = (second[5, 5] + 1) % len(COLORS)
+    image = Image.fromarray(second.astype(np.uint8), 'P')
+    image.putpalette(reversed_palette)
+
+    fp = io.BytesIO()
+    writer = GifWriter(fp, (12, 12), palette=PALETTE)
+    writer.append(paletted(indices), 100, (0, 0), DISPOSAL_NONE)
+    writer.append(image, 100, (0, 0), DISPOSAL_NONE)
+    writer.close()
+
+    assert writer.transparent_pixels == 12 * 12 - 1
+    frames, _ = decode(fp.getvalue())
+    np.testing.assert_array_equal(frames[1], COLORS[::-1][second])
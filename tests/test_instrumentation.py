@@ -0,0 +1,65 @@
+# 导入必要的模块
+import json  # 用于读取导出的时间线
+import numpy as np  # 用于构造测试帧
+import pytest  # 测试框架
+from instrumentation import Instrumentation, StageStats  # 被测试的分阶段计时
+from pipeline import StreamingEncoder  # 用于检查流水线记录的阶段
+
+
+def test_stage_stats():
+    stats = StageStats()
+    for ms in (1, 2, 3, 4, 90):
+        stats.add(ms / 1000)
+    summary = stats.summary()
+    assert summary['count'] == 5
+    assert summary['mean_ms'] == pytest.approx(20.0)
+    assert summary['max_ms'] == pytest.approx(90.0)
+    assert sum(summary['histogram'].values()) == 5
+    # 分位数在所在格子内插值，不超过最大值
+    assert 2 <= summary['p50_ms'] <= 5
+    assert 50 <= summary['p95_ms'] <= 90
+    assert stats.takeRecent() == pytest.approx(20.0)
+    assert stats.takeRecent() is None
+
+
+def test_gauges_keep_peak():
+    instrumentation = Instrumentation()
+    for value in (3, 7, 2):
+        instrumentation.gauge('queue', value)
+    assert instrumentation.snapshot()['gauges'] == {'queue': {'current': 2, 'max': 7}}
+
+
+def test_export_trace(tmp_path):
+    '''导出的Chrome trace中阶段耗时为X事件,数值为C事件,附带统计快照'''
+    instrumentation = Instrumentation()
+    instrumentation.record('grab', 1.0 + instrumentation.origin, 1.002 + instrumentation.origin)
+    instrumentation.gauge('queue', 4)
+    path = str(tmp_path / 'trace.json')
+    instrumentation.exportTrace(path)
+    with open(path, encoding='utf-8') as f:
+        trace = json.load(f)
+    phases = {event['name']: event for event in trace['traceEvents'] if event['ph'] != 'M'}
+    assert phases['grab']['ph'] == 'X'
+    assert phases['grab']['ts'] == pytest.approx(1e6)
+    assert phases['grab']['dur'] == pytest.approx(2000)
+    assert phases['queue']['ph'] == 'C'
+    assert trace['otherData']['stages']['grab']['count'] == 1
+
+
+def test_disabled_trace_keeps_stats():
+    instrumentation = Instrumentation(trace=False)
+    instrumentation.record('grab', 0.0, 0.001)
+    assert instrumentation.events == []
+    assert instrumentation.snapshot()['stages']['grab']['count'] == 1
+
+
+def test_pipeline_records_stages(tmp_path):
+    instrumentation = Instrumentation()
+    encoder = StreamingEncoder(directory=str(tmp_path), instrumentation=instrumentation)
+    for index in range(3):
+        encoder.submit(np.full((8, 8, 4), index, np.uint8), index * 0.1)
+    encoder.finish(0.3)
+    encoder.save(str(tmp_path / 'out.gif'))
+    stages = instrumentation.snapshot()['stages']
+    assert {'submit_wait', 'quantize', 'finish', 'save'} <= set(stages)
+    assert stages['quantize']['count'] == 3
@@ -0,0 +1,114 @@
+# 导入必要的模块
+import numpy as np  # 用于构造测试帧
+from palette import (PALETTE_GLOBAL, PALETTE_SCENE, PaletteMapper, PaletteSampler, build_palette,
+                     color_histogram, sample_frames, scene_distance)  # 被测试的共享调色板
+from pipeline import StreamingEncoder  # 用于检查流水线中调色板的重新生成
+from test_pipeline import decode  # 解码写出的GIF
+
+# 测试用的颜色（B,G,R 排列），彼此相差很远
+COLORS = np.array([(0, 0, 0), (255, 255, 255), (0, 0, 255), (0, 255, 0), (255, 0, 0), (0, 128, 255)], np.uint8)
+
+
+def make_frame(colors, seed=0, shape=(16, 24)):
+    '''函数功能:返回由给定颜色随机组成的BGRX帧数组'''
+    rng = np.random.default_rng(seed)
+    frame = np.full(shape + (4,), 255, np.uint8)
+    frame[..., :3] = colors[rng.integers(0, len(colors), shape)]
+    return frame
+
+
+def test_build_palette_pads_to_256_colors():
+    palette = build_palette([make_frame(COLORS[:3])], 255)
+    assert len(palette) == 768
+    colors = {tuple(palette[i:i + 3]) for i in range(0, 768, 3)}
+    assert colors == {(0, 0, 0), (255, 255, 255), (255, 0, 0)}
+
+
+def test_mapper_maps_palette_colors_exactly():
+    '''帧中只有调色板中的颜色时查表映射没有误差,补齐的重复颜色不会被用到'''
+    frame = make_frame(COLORS)
+    mapper = PaletteMapper(build_palette([frame], 255))
+    indices = mapper.indices(frame)
+    assert indices.max() < len(COLORS)
+    np.testing.assert_array_equal(mapper.colors[indices], frame[..., :3])
+    assert mapper.distortion(frame) == 0.0
+    image = mapper.quantize(frame)
+    assert image.mode == 'P'
+    np.testing.assert_array_equal(np.asarray(image.convert('RGB'))[..., ::-1], frame[..., :3])
+
+
+def test_mapper_accepts_strided_views():
+    frame = make_frame(COLORS)
+    mapper = PaletteMapper(build_palette([frame], 255))
+    view = frame[3:11, 5:19]
+    np.testing.assert_array_equal(mapper.indices(view), mapper.indices(np.ascontiguousarray(view)))
+
+
+def test_distortion_detects_missing_colors():
+    '''调色板中没有的颜色(这里是红色)被映射到相差很远的颜色,计为失真'''
+    mapper = PaletteMapper(build_palette([make_frame(COLORS[:2])], 255))
+    red = np.zeros((16, 16, 4), np.uint8)
+    red[..., 2] = 255
+    assert mapper.distortion(red) == 1.0
+
+
+def test_sampler_doubles_stride():
+    '''超过数量上限时隔一个丢弃一个并把步长加倍,采样始终均匀覆盖见过的帧'''
+    sampler = PaletteSampler(count=4, step=2)
+    for value in range(20):
+        sampler.add(np.full((4, 6, 4), value, np.uint8))
+    assert sampler.stride == 8
+    assert [int(frame[0, 0, 0]) for frame in sampler.frames] == [0, 8, 16]
+    assert sampler.frames[0].shape == (2, 3, 4)
+
+    sampler.reset()
+    assert sampler.frames == [] and sampler.stride == 1 and sampler.seen == 0
+
+
+def test_sample_frames():
+    assert sample_frames(list(range(5)), 8) == list(range(5))
+    assert sample_frames(list(range(100)), 3) == [0, 50, 99]
+
+
+def test_scene_distance():
+    black = np.zeros((8, 8, 4), np.uint8)
+    white = np.full((8, 8, 4), 255, np.uint8)
+    assert scene_distance(color_histogram(black), color_histogram(black)) == 0.0
+    assert scene_distance(color_histogram(black), color_histogram(white)) == 1.0
+
+
+def encode(frames, tmp_path, palette_mode):
+    '''函数功能:用共享调色板编码帧序列,返回编码器和解码得到的各帧'''
+    encoder = StreamingEncoder(directory=str(tmp_path), palette_mode=palette_mode)
+    for index, frame in enumerate(frames):
+        encoder.submit(frame, index * 0.1)
+    encoder.finish(len(frames) * 0.1)
+    path = str(tmp_path / 'out.gif')
+    encoder.save(path)
+    return encoder, decode(path)[0]
+
+
+def test_global_palette_is_rebuilt_for_new_colors(tmp_path):
+    '''录制中途出现新颜色时重新生成共享调色板,新颜色不会一直被映射到错误的颜色上'''
+    frames = [make_frame(COLORS[:2], seed) for seed in range(3)] + [make_frame(COLORS, seed) for seed in range(3)]
+    encoder, decoded = encode(frames, tmp_path, PALETTE_GLOBAL)
+    assert encoder.palettes_built == 2
+    for result, frame in zip(decoded, frames):
+        np.testing.assert_array_equal(result, frame[..., :3])
+
+
+def test_global_palette_is_kept_without_new_colors(tmp_path):
+    frames = [make_frame(COLORS, seed) for seed in range(5)]
+    encoder, decoded = encode(frames, tmp_path, PALETTE_GLOBAL)
+    assert encoder.palettes_built == 1
+    np.testing.assert_array_equal(decoded[-1], frames[-1][..., :3])
+
+
+def test_scene_palette_starts_on_scene_change(tmp_path):
+    dark = np.array([(0, 0, 0), (64, 64, 64)], np.uint8)
+    light = np.array([(255, 255, 255), (0, 255, 255)], np.uint8)
+    frames = [make_frame(dark, seed) for seed in range(3)] + [make_frame(light, seed) for seed in range(3)]
+    encoder, decoded = encode(frames, tmp_path, PALETTE_SCENE)
+    assert encoder.palettes_built == 2
+    for result, frame in zip(decoded, frames):
+        np.testing.assert_array_equal(result, frame[..., :3])
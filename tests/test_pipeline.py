@@ -0,0 +1,114 @@
+# 导入必要的模块
+import io  # 用于在内存中解码写出的GIF
+import os  # 用于检查临时文件
+import numpy as np  # 用于构造测试帧
+import pytest  # 测试框架
+from PIL import Image  # 用于解码写出的GIF
+from pipeline import EncodingCancelled, StreamingEncoder  # 被测试的边录制边编码流水线
+
+# 测试用的颜色（B,G,R 排列），颜色很少，自适应调色板可以精确表示
+COLORS = np.array([(0, 0, 0), (255, 255, 255), (0, 0, 255), (0, 255, 0), (255, 0, 0)], np.uint8)
+
+
+def make_frame(seed, shape=(20, 32)):
+    '''函数功能:返回由若干测试颜色组成的BGRX帧数组'''
+    rng = np.random.default_rng(seed)
+    frame = np.full(shape + (4,), 255, np.uint8)
+    frame[..., :3] = COLORS[rng.integers(0, len(COLORS), shape)]
+    return frame
+
+
+def decode(path):
+    '''函数功能:解码GIF文件,返回每帧合成后的BGR数组列表和每帧的时长'''
+    frames, durations = [], []
+    with open(path, 'rb') as f:
+        data = f.read()
+    with Image.open(io.BytesIO(data)) as image:
+        for position in range(image.n_frames):
+            image.seek(position)
+            frames.append(np.asarray(image.convert('RGB'))[..., ::-1])
+            durations.append(image.info['duration'])
+    return frames, durations
+
+
+def test_stream_to_gif(tmp_path):
+    '''边提交边编码,保存的GIF逐帧与提交的帧像素一致,时长由时间戳决定'''
+    frames = [make_frame(i) for i in range(6)]
+    encoder = StreamingEncoder(directory=str(tmp_path))
+    for index, frame in enumerate(frames):
+        encoder.submit(frame, index * 0.1)
+    assert encoder.finish(0.8) == 6
+    assert encoder.canvas_size == (32, 20)
+
+    path = str(tmp_path / 'out.gif')
+    encoder.save(path)
+    assert not os.path.exists(encoder.temp_path)
+    decoded, durations = decode(path)
+    assert durations == [100, 100, 100, 100, 100, 300]
+    for result, frame in zip(decoded, frames):
+        np.testing.assert_array_equal(result, frame[..., :3])
+
+
+def test_speed_multiplier(tmp_path):
+    encoder = StreamingEncoder(speed_multiplier=2.0, directory=str(tmp_path))
+    for index in range(3):
+        encoder.submit(make_frame(index), index * 0.2)
+    encoder.finish(0.6)
+    path = str(tmp_path / 'out.gif')
+    encoder.save(path)
+    assert decode(path)[1] == [100, 100, 100]
+
+
+def test_progress_reports_every_input_frame(tmp_path):
+    encoder = StreamingEncoder(directory=str(tmp_path))
+    reported = []
+    encoder.progress = reported.append
+    for index in range(5):
+        encoder.submit(make_frame(index), index * 0.1)
+    encoder.finish(0.5)
+    encoder.discard()
+    assert reported == [1, 2, 3, 4, 5]
+
+
+def test_cancel(tmp_path):
+    '''取消后 finish 抛出 EncodingCancelled,discard 删除临时文件'''
+    encoder = StreamingEncoder(directory=str(tmp_path))
+    encoder.submit(make_frame(0), 0.0)
+    encoder.cancel()
+    # 取消后提交的帧被直接丢弃，不会阻塞
+    for index in range(1, 20):
+        encoder.submit(make_frame(index), index * 0.1)
+    with pytest.raises(EncodingCancelled):
+        encoder.finish(2.0)
+    assert os.path.exists(encoder.temp_path)
+    encoder.discard()
+    assert not os.path.exists(encoder.temp_path)
+
+
+def test_error_is_raised_by_finish(tmp_path):
+    '''流水线中的异常(这里是无法解码的3通道帧)由 finish 重新抛出'''
+    encoder = StreamingEncoder(directory=str(tmp_path))
+    encoder.submit(np.zeros((4, 4, 3), np.uint8), 0.0)
+    with pytest.raises(ValueError):
+        encoder.finish(1.0)
+    encoder.discard()
+
+
+def test_duplicates_extend_previous_frame(tmp_path):
+    '''重复帧与上一帧合并,上一帧的时长延长到下一个不同帧;局部变化的帧以子图写入,画面不变'''
+    first = make_frame(0)
+    second = first.copy()
+    second[5:9, 10:14] = make_frame(1, (4, 4))
+    submitted = [first, first.copy(), first.copy(), second, second.copy()]
+    encoder = StreamingEncoder(directory=str(tmp_path))
+    for index, frame in enumerate(submitted):
+        encoder.submit(frame, index * 0.1)
+    encoder.finish(0.5)
+    assert encoder.differ.frames_merged == 3
+
+    path = str(tmp_path / 'out.gif')
+    encoder.save(path)
+    decoded, durations = decode(path)
+    assert durations == [300, 200]
+    np.testing.assert_array_equal(decoded[0], first[..., :3])
+    np.testing.assert_array_equal(decoded[1], second[..., :3])
@@ -0,0 +1,87 @@
+# 导入必要的模块
+import os  # 用于检查共享内存和结束子进程
+import signal  # 用于模拟子进程异常退出
+from concurrent.futures.process import BrokenProcessPool  # 子进程异常退出后进程池抛出的异常
+import numpy as np  # 用于构造测试帧
+import pytest  # 测试框架
+import pipeline  # 被测试的进程池量化
+from backends import ApngBackend  # 不需要量化的输出格式
+from dither import DITHER_NONE, DITHER_ORDERED  # 抖动方式
+from palette import PALETTE_ADAPTIVE, PALETTE_GLOBAL  # 调色板模式
+from pipeline import StreamingEncoder, warm_process_pool  # 被测试的流水线
+
+
+def shared_blocks():
+    '''函数功能:返回当前存在的 multiprocessing 共享内存块名'''
+    if not os.path.isdir('/dev/shm'):
+        return set()
+    return {name for name in os.listdir('/dev/shm') if name.startswith('psm_')}
+
+
+@pytest.fixture(scope='module', autouse=True)
+def process_pool():
+    '''函数功能:本模块的测试共用一个单进程的进程池,结束后关闭'''
+    yield warm_process_pool(1)
+    pipeline._process_pool.shutdown()
+    pipeline._process_pool = None
+
+
+def make_frames(count, shape=(24, 40)):
+    '''函数功能:返回一段画面逐帧局部变化的BGRX帧序列'''
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, shape + (4,), np.uint8)
+    frames = []
+    for index in range(count):
+        frame = frame.copy()
+        frame[index:index + 5, 2 * index:2 * index + 7] = rng.integers(0, 256, (5, 7, 4), np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def encode(frames, path, **options):
+    '''函数功能:编码帧序列并保存到path,返回文件内容'''
+    encoder = StreamingEncoder(directory=os.path.dirname(path), **options)
+    for index, frame in enumerate(frames):
+        encoder.submit(frame, index * 0.1)
+    encoder.finish(len(frames) * 0.1)
+    encoder.save(path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('palette_mode', [PALETTE_ADAPTIVE, PALETTE_GLOBAL])
+@pytest.mark.parametrize('dither', [DITHER_NONE, DITHER_ORDERED])
+def test_pool_output_matches_threads(tmp_path, palette_mode, dither):
+    '''在进程池中量化与在线程中量化得到完全相同的文件,共享内存全部释放'''
+    frames = make_frames(6)
+    before = shared_blocks()
+    threaded = encode(frames, str(tmp_path / 'threads.gif'), palette_mode=palette_mode, dither=dither)
+    pooled = encode(frames, str(tmp_path / 'pool.gif'), palette_mode=palette_mode, dither=dither,
+                    processes=1)
+    assert pooled == threaded
+    assert shared_blocks() == before
+
+
+def test_pool_is_not_used_for_full_colour_backends(tmp_path):
+    encoder = StreamingEncoder(directory=str(tmp_path), processes=1, backend=ApngBackend)
+    assert encoder.pool is None
+    encoder.finish(0.0)
+    encoder.discard()
+
+
+def test_broken_pool_is_replaced(tmp_path, process_pool):
+    '''子进程异常退出时 finish 抛出异常且不遗留共享内存,下一次录制使用新的进程池'''
+    before = shared_blocks()
+    for process in list(process_pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    encoder = StreamingEncoder(directory=str(tmp_path), processes=1)
+    for index, frame in enumerate(make_frames(4)):
+        encoder.submit(frame, index * 0.1)
+    with pytest.raises(BrokenProcessPool):
+        encoder.finish(0.4)
+    encoder.discard()
+    assert shared_blocks() == before
+
+    frames = make_frames(3)
+    assert encode(frames, str(tmp_path / 'pool.gif'), processes=1) == encode(frames, str(tmp_path / 'threads.gif'))
+    assert pipeline._process_pool is not process_pool
@@ -0,0 +1,88 @@
+# 导入必要的模块
+import json  # 用于解析命令输出的统计信息
+import os  # 用于检查输出文件
+import sys  # 用于模拟Linux平台
+import numpy as np  # 用于生成静止画面
+import pytest  # 测试框架
+from PIL import Image  # 用于检查保存的GIF
+import main  # 被测试的命令行录制
+
+
+def record(capsys, *argv):
+    '''函数功能:运行 record 子命令,返回退出码和输出的JSON统计信息'''
+    args = main.build_arg_parser().parse_args(['record'] + list(argv))
+    exit_code = main.record_command(args)
+    return exit_code, json.loads(capsys.readouterr().out)
+
+
+@pytest.mark.parametrize('streaming', [[], ['--no-streaming']])
+def test_record_gif(tmp_path, capsys, fake_screen, streaming):
+    '''无界面录制指定区域,保存GIF并输出统计信息,不留下临时文件'''
+    out = str(tmp_path / 'out.gif')
+    exit_code, result = record(capsys, '--rect', '0,0,40,30', '--fps', '20', '--duration', '0.5',
+                               '--out', out, *streaming)
+    assert exit_code == 0, result.get('error')
+    assert result['output'] == out
+    assert result['size'] == [40, 30]
+    assert result['frames'] == fake_screen.grabs >= 2
+    assert result['output_bytes'] == os.path.getsize(out)
+    with Image.open(out) as image:
+        assert image.size == (40, 30)
+        assert image.n_frames == result['encoded_frames']
+    assert os.listdir(tmp_path) == ['out.gif']
+
+
+@pytest.mark.parametrize('streaming', [[], ['--no-streaming']])
+def test_record_reports_capture_errors(tmp_path, capsys, fake_screen, monkeypatch, streaming):
+    '''截图失败(空截图)时退出码为1,JSON中带 error 字段,不留下临时文件'''
+    from PyQt5 import QtGui  # 用于构造空截图
+    monkeypatch.setattr(fake_screen, 'grabWindow', lambda *args: QtGui.QPixmap())
+    exit_code, result = record(capsys, '--rect', '0,0,40,30', '--duration', '0.2',
+                               '--out', str(tmp_path / 'out.gif'), *streaming)
+    assert exit_code == 1
+    assert result['error'].startswith('录制失败')
+    assert os.listdir(tmp_path) == []
+
+
+def test_no_display_fails_fast(monkeypatch):
+    '''Linux上没有显示器又没有指定平台时立即报错,而不是退回截不到图的offscreen平台'''
+    monkeypatch.setattr(sys, 'platform', 'linux')
+    for name in ('QT_QPA_PLATFORM', 'DISPLAY', 'WAYLAND_DISPLAY'):
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(RuntimeError):
+        main.headless_application()
+
+
+def test_adaptive_rate_idles_on_static_screen(tmp_path, capsys, fake_screen):
+    '''画面静止时自适应帧率降到低频轮询,省去大部分截图,输出仍覆盖整段时长'''
+    fake_screen.frame = lambda index, width, height: np.full((height, width, 4), 128, np.uint8)
+    out = str(tmp_path / 'out.gif')
+    exit_code, result = record(capsys, '--rect', '0,0,40,30', '--fps', '30', '--duration', '1.5',
+                               '--adaptive', '--idle-fps', '2', '--out', out)
+    assert exit_code == 0, result.get('error')
+    assert result['idle_polls'] > 0
+    # 前 0.5 秒按30帧/秒截图，之后约每0.5秒一次
+    assert result['grab_skip_ratio'] > 0.4
+    assert result['frames'] < 30
+    with Image.open(out) as image:
+        assert image.n_frames == 1
+        assert image.info['duration'] == pytest.approx(1500, abs=100)
+
+
+def test_adaptive_rate_keeps_up_with_motion(tmp_path, capsys, fake_screen):
+    out = str(tmp_path / 'out.gif')
+    exit_code, result = record(capsys, '--rect', '0,0,40,30', '--fps', '20', '--duration', '1.0',
+                               '--adaptive', '--out', out)
+    assert exit_code == 0, result.get('error')
+    assert result['idle_polls'] == 0
+    assert result['grab_skip_ratio'] == 0.0
+
+
+def test_frame_pool_is_allocated_once(tmp_path, capsys, fake_screen):
+    exit_code, result = record(capsys, '--rect', '0,0,40,30', '--fps', '20', '--duration', '0.5',
+                               '--out', str(tmp_path / 'out.gif'))
+    assert exit_code == 0, result.get('error')
+    assert result['frame_pool']['allocations'] == 1
+    _, result = record(capsys, '--rect', '0,0,40,30', '--duration', '0.2', '--no-frame-pool',
+                       '--out', str(tmp_path / 'out.gif'))
+    assert 'frame_pool' not in result
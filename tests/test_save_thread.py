@@ -0,0 +1,52 @@
+# 导入必要的模块
+import os  # 用于检查输出文件和临时文件
+import numpy as np  # 用于构造测试帧
+from PyQt5 import QtCore  # 用于处理排队的信号
+from frame_store import FrameStore  # 录制结束后才编码时的帧存储
+from main import SaveThread  # 被测试的后台保存线程
+from pipeline import StreamingEncoder  # 编码流水线
+
+
+def stored_frames(count):
+    '''函数功能:返回保存了count个不同帧的帧存储'''
+    store = FrameStore()
+    for index in range(count):
+        store.append(np.full((8, 10, 4), index * 20, np.uint8))
+    return store
+
+
+def run_save(thread):
+    '''函数功能:在后台线程中运行保存并等待结束,返回进度信号和结束信号的参数'''
+    progress, finished = [], []
+    thread.progress.connect(lambda done, total: progress.append((done, total)))
+    thread.saveFinished.connect(lambda ok, message: finished.append((ok, message)))
+    thread.start()
+    assert thread.wait(30000)
+    # 信号从后台线程排队送到本线程，处理掉排队的事件
+    QtCore.QCoreApplication.processEvents()
+    return progress, finished
+
+
+def test_save_stored_frames(qapp, tmp_path):
+    '''录制结束后才编码:后台提交帧并保存,逐帧报告进度,结束后释放帧存储'''
+    path = str(tmp_path / 'out.gif')
+    timestamps = [index * 0.1 for index in range(5)]
+    encoder = StreamingEncoder(directory=str(tmp_path))
+    thread = SaveThread(encoder, path, timestamps, 0.5, frames=stored_frames(5))
+    progress, finished = run_save(thread)
+    assert finished[0][0] is True
+    assert progress[-1] == (5, 5)
+    assert os.path.getsize(path) > 0
+    assert not os.path.exists(encoder.temp_path)
+
+
+def test_cancel_leaves_no_file(qapp, tmp_path):
+    '''取消后不生成目标文件,临时文件被删除'''
+    path = str(tmp_path / 'out.gif')
+    timestamps = [index * 0.1 for index in range(5)]
+    encoder = StreamingEncoder(directory=str(tmp_path))
+    thread = SaveThread(encoder, path, timestamps, 0.5, frames=stored_frames(5))
+    thread.cancel()
+    _, finished = run_save(thread)
+    assert finished == [(False, '已取消保存，未生成文件。')]
+    assert os.listdir(tmp_path) == []
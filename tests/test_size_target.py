@@ -0,0 +1,123 @@
+# 导入必要的模块
+import argparse  # 用于检查参数解析的错误类型
+import json  # 用于解析命令输出的统计信息
+import os  # 用于检查输出文件
+import numpy as np  # 用于生成难以压缩的画面
+import pytest  # 测试框架
+import main  # 用于检查命令行的目标文件大小模式
+from size_target import SIZE_LADDER, SizeTarget, candidate_settings  # 被测试的目标文件大小模式
+
+
+def fake_target(target_bytes, sizes, paletted=True):
+    '''函数功能:返回估计值按阶梯位置取自sizes的SizeTarget,以及记录估计过哪些设置的列表'''
+    size_target = SizeTarget(target_bytes, make_encoder=None, paletted=paletted)
+    estimated = []
+
+    def estimate_size(frames, timestamps, end_time, settings, cancelled=None):
+        estimated.append(settings)
+        return sizes[size_target.ladder.index(settings)]
+
+    size_target.estimateSize = estimate_size
+    return size_target, estimated
+
+
+def ladder_sizes(count):
+    '''函数功能:返回沿阶梯单调递减的估计大小(第i级为 (count - i) × 1000)'''
+    return [(count - position) * 1000 for position in range(count)]
+
+
+def test_ladder_is_monotonic():
+    '''阶梯上每一级的各项参数都不比上一级高'''
+    for (step, scale, colors), (next_step, next_scale, next_colors) in zip(SIZE_LADDER, SIZE_LADDER[1:]):
+        assert next_step >= step and next_scale <= scale and next_colors <= colors
+        assert (next_step, next_scale, next_colors) != (step, scale, colors)
+
+
+def test_candidates_without_palette():
+    ladder = candidate_settings(paletted=False)
+    assert all(colors is None for _, _, colors in ladder)
+    assert len(set(ladder)) == len(ladder)
+    assert [(step, scale) for step, scale, _ in ladder] == \
+        sorted({(step, scale) for step, scale, _ in SIZE_LADDER}, key=lambda item: (item[0], -item[1]))
+
+
+def test_best_setting_fits():
+    '''最好的一级放得下时只估计这一级'''
+    sizes = ladder_sizes(len(SIZE_LADDER))
+    size_target, estimated = fake_target(sizes[0], sizes)
+    plan = size_target.plan([], [], 0.0)
+    assert plan.settings == SIZE_LADDER[0]
+    assert plan.fits
+    assert estimated == [SIZE_LADDER[0]]
+
+
+@pytest.mark.parametrize('position', range(1, len(SIZE_LADDER)))
+def test_selects_first_fitting_setting(position):
+    '''选中第一个放得下的一级,二分查找只估计少数几级'''
+    sizes = ladder_sizes(len(SIZE_LADDER))
+    size_target, estimated = fake_target(sizes[position], sizes)
+    plan = size_target.plan([], [], 0.0)
+    assert plan.settings == SIZE_LADDER[position]
+    assert plan.estimate == sizes[position]
+    assert plan.fits
+    assert len(set(estimated)) == len(estimated) <= 1 + (len(SIZE_LADDER) - 1).bit_length()
+    assert plan.estimates == {settings: sizes[SIZE_LADDER.index(settings)] for settings in estimated}
+
+
+def test_nothing_fits():
+    '''最差的一级也放不下时仍选中它,fits 为 False'''
+    sizes = ladder_sizes(len(SIZE_LADDER))
+    size_target, _ = fake_target(sizes[-1] - 1, sizes)
+    plan = size_target.plan([], [], 0.0)
+    assert plan.settings == SIZE_LADDER[-1]
+    assert not plan.fits
+    assert plan.indices(10) == range(0, 10, SIZE_LADDER[-1][0])
+
+
+def noisy_frames(index, width, height):
+    '''函数功能:每三次截图换一幅随机噪声画面(很难压缩,文件大小对设置敏感)'''
+    rng = np.random.default_rng(index // 3)
+    return rng.integers(0, 256, (height, width, 4), np.uint8)
+
+
+def record(capsys, *argv):
+    '''函数功能:运行 record 子命令,返回退出码和输出的JSON统计信息'''
+    exit_code = main.record_command(main.build_arg_parser().parse_args(['record'] + list(argv)))
+    return exit_code, json.loads(capsys.readouterr().out)
+
+
+@pytest.mark.parametrize('target', ['10K', '40K', '1M'])
+def test_recording_fits_target(tmp_path, capsys, fake_screen, target):
+    '''按采样帧选出放得下的设置:输出不超过目标大小,更好的一级(若估计过)放不下'''
+    fake_screen.frame = noisy_frames
+    out = str(tmp_path / 'out.gif')
+    exit_code, result = record(capsys, '--rect', '0,0,96,64', '--fps', '20', '--duration', '1', '--out', out,
+                               '--target-size', target)
+    assert exit_code == 0, result.get('error')
+    plan = result['target_size']
+    assert plan['fits']
+    assert result['output_bytes'] == os.path.getsize(out) <= plan['target_bytes']
+    chosen = SIZE_LADDER.index((plan['step'], plan['scale'], plan['colors']))
+    for candidate in plan['candidates']:
+        settings = (candidate['step'], candidate['scale'], candidate['colors'])
+        if SIZE_LADDER.index(settings) < chosen:
+            assert candidate['estimated_bytes'] > plan['target_bytes']
+    assert result['size'] == [round(96 * plan['scale']), round(64 * plan['scale'])]
+
+
+def test_target_size_needs_byte_counts(tmp_path, capsys, fake_screen):
+    '''MP4 后端不报告已写入的字节数,不支持目标文件大小'''
+    exit_code, result = record(capsys, '--rect', '0,0,40,30', '--duration', '0.2', '--format', 'mp4',
+                               '--target-size', '100K', '--out', str(tmp_path / 'out.mp4'))
+    assert exit_code == 1
+    assert 'error' in result
+    assert os.listdir(tmp_path) == []
+
+
+def test_parse_byte_size():
+    assert main.parse_byte_size('500') == 500
+    assert main.parse_byte_size('500K') == 500 * 1024
+    assert main.parse_byte_size('1.5m') == 3 << 19
+    for text in ('', 'K', '0', '-1M', 'abc'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            main.parse_byte_size(text)